@@ -1,10 +1,36 @@
+import time
+
+APP_STARTED = time.perf_counter()
+
 import streamlit as st
-import openai
 import os
 import json
-import re
+import tempfile
+import uuid
 from datetime import datetime
 
+from plan_cache import PlanCache, plan_cache_key
+from plan_export import (EXPORT_FORMATS, ExportCache, export_filename, export_key, next_monday, plan_content_hash,
+                         purge_exports, run_bulk_export_job, run_export_job)
+from plan_hedging import HEDGE_QUANTILE as DEFAULT_HEDGE_QUANTILE, HedgeBudget, hedge_deadline
+from plan_jobs import DONE, FAILED, QUEUED, JobQueue, run_plan_job
+from plan_metrics import MetricsStore
+from plan_prompts import STYLE_INSTRUCTIONS, build_system_prompt, build_user_prompt
+from plan_store import PlanStore
+from plan_tokens import EXACT as TOKENS_EXACT, completion_budget, message_tokens
+from plan_reuse import index_from_store
+from rate_limiter import DEFAULT_RATE_LIMITS, TokenScheduler, parse_rate_limits, rate_limited_client
+from startup_audit import import_times, slowest_imports
+
+IMPORTS_DONE = time.perf_counter()
+
+# Modules the startup audit measures. openai is imported on first generation only: it is the slowest
+# import here and most reruns never need it
+EAGER_MODULES = ["streamlit", "numpy", "plan_cache", "plan_export", "plan_hedging", "plan_jobs", "plan_metrics", "plan_prompts", "plan_store",
+                 "plan_reuse", "plan_tokens", "rate_limiter"]
+LAZY_MODULES = ["openai"]
+STARTUP_AUDIT = os.getenv("STARTUP_AUDIT", "") not in ("", "0")
+
 # --- Streamlit Page Configuration ---
 st.set_page_config(page_title="AI Onboarding Plan Generator", page_icon="📅", layout="wide")
 
@@ -128,53 +154,486 @@ if preset_choice != "Custom (enter manually)":
         st.session_state["preset_constraints"] = preset["constraints"]
         st.session_state["last_preset"] = preset_choice
 
-def analyze_plan_quality(plan_text):
-    """Comprehensive analysis of the generated plan quality"""
-    if not plan_text:
-        return {}
-    
-    # Basic metrics
-    word_count = len(plan_text.split())
-    milestones = len(re.findall(r'✅', plan_text))
-    red_flags = len(re.findall(r'🚩', plan_text))
-    coaching_notes = len(re.findall(r'🧭', plan_text))
-    learning_objectives = len(re.findall(r'📚', plan_text))
-    weekly_sections = len(re.findall(r'Week \d+', plan_text, re.IGNORECASE))
-    
-    # Content quality checks
-    has_executive_summary = any(phrase in plan_text.lower() for phrase in ['executive summary', 'philosophy', 'overview'])
-    has_phase_headers = len(re.findall(r'Phase \d+|PHASE \d+', plan_text)) >= 3
-    has_specific_tools = any(tool in plan_text for tool in ['Salesforce', 'HubSpot', 'Slack', 'Notion', 'Zendesk', 'Gainsight'])
-    has_progression = 'Week 1' in plan_text and 'Week 12' in plan_text
-    
-    # Calculate quality score
-    quality_factors = {
-        "Has 12 weekly sections": weekly_sections >= 12,
-        "Sufficient milestones": milestones >= 24,  # 2+ per week
-        "Red flags present": red_flags >= 12,  # 1 per week
-        "Coaching guidance": coaching_notes >= 12,  # 1 per week  
-        "Learning objectives": learning_objectives >= 12,  # 1 per week
-        "Executive summary": has_executive_summary,
-        "Phase structure": has_phase_headers,
-        "Specific tools mentioned": has_specific_tools,
-        "Shows progression": has_progression,
-        "Adequate length": word_count >= 2000
-    }
-    
-    quality_score = sum(quality_factors.values()) / len(quality_factors) * 100
-    
-    metrics = {
-        "Word Count": word_count,
-        "Weekly Sections": weekly_sections,
-        "Milestones": milestones,
-        "Red Flags": red_flags,
-        "Coaching Notes": coaching_notes,
-        "Learning Objectives": learning_objectives,
-        "Quality Score": f"{quality_score:.0f}%",
-        "Quality Factors": quality_factors
-    }
-    
-    return metrics
+@st.cache_resource
+def get_plan_cache():
+    """Process-wide plan cache shared by all sessions (disk tier enabled via PLAN_CACHE_DB)"""
+    return PlanCache(
+        max_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "128")),
+        ttl_seconds=int(os.getenv("PLAN_CACHE_TTL_SECONDS", str(24 * 3600))),
+        db_path=os.getenv("PLAN_CACHE_DB") or None,
+    )
+
+plan_cache = get_plan_cache()
+
+@st.cache_resource
+def get_metrics_store():
+    """Process-wide request metrics (persisted to SQLite when PLAN_METRICS_DB is set)"""
+    return MetricsStore(db_path=os.getenv("PLAN_METRICS_DB") or None)
+
+metrics_store = get_metrics_store()
+
+@st.cache_resource
+def get_plan_store():
+    """Every generated plan with its context and metrics, kept across reruns and restarts"""
+    return PlanStore(os.getenv("PLAN_STORE_DB", "plans.sqlite3"))
+
+plan_store = get_plan_store()
+
+@st.cache_resource(max_entries=8)
+def get_scheduler(api_key):
+    """Rate and token budget shared by every session using this API key (limits from OPENAI_RATE_LIMITS)"""
+    return TokenScheduler(parse_rate_limits(os.getenv("OPENAI_RATE_LIMITS", DEFAULT_RATE_LIMITS)),
+                          max_wait=float(os.getenv("OPENAI_MAX_QUEUE_SECONDS", "5")))
+
+@st.cache_resource(max_entries=8)
+def get_openai_client(api_key):
+    """One client per API key for the whole process, with every request admitted by that key's scheduler.
+
+    The client's HTTP pool keeps connections alive, so reusing it lets reruns
+    and sessions skip the TCP/TLS handshake that a fresh client pays.
+    """
+    import openai
+
+    return rate_limited_client(openai.OpenAI(api_key=api_key), get_scheduler(api_key))
+
+@st.cache_resource
+def get_reuse_index():
+    """Similarity index over the contexts of saved plans, built once per process"""
+    return index_from_store(plan_store)
+
+reuse_index = get_reuse_index()
+
+@st.cache_resource
+def get_job_queue():
+    """Process-wide generation queue: PLAN_JOB_WORKERS plans at a time, PLAN_JOB_PER_USER per browser session"""
+    return JobQueue(workers=int(os.getenv("PLAN_JOB_WORKERS", "4")),
+                    max_running_per_user=int(os.getenv("PLAN_JOB_PER_USER", "1")))
+
+job_queue = get_job_queue()
+
+@st.cache_resource
+def get_hedge_budget():
+    """Backup requests allowed across all sessions, as a share of hedge-eligible requests (PLAN_HEDGE_BUDGET)"""
+    return HedgeBudget(max_fraction=float(os.getenv("PLAN_HEDGE_BUDGET", "0.05")))
+
+hedge_budget = get_hedge_budget()
+
+@st.cache_resource
+def get_export_queue():
+    """Renders exports off the request path: PLAN_EXPORT_WORKERS at a time, one per browser session"""
+    return JobQueue(workers=int(os.getenv("PLAN_EXPORT_WORKERS", "2")), max_running_per_user=1)
+
+@st.cache_resource
+def get_export_cache():
+    """Rendered export files shared by all sessions, up to PLAN_EXPORT_CACHE_MB"""
+    return ExportCache(max_bytes=int(os.getenv("PLAN_EXPORT_CACHE_MB", "64")) * 1024 * 1024)
+
+export_queue = get_export_queue()
+export_cache = get_export_cache()
+# Bulk export zips are written here and deleted after an hour
+EXPORT_DIR = os.getenv("PLAN_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "plan_exports"))
+BULK_EXPORT_LIMIT = 500
+BULK_EXPORT_FORMATS = ["docx", "pdf", "csv", "ics"]
+HEDGE_QUANTILE = float(os.getenv("PLAN_HEDGE_QUANTILE", str(DEFAULT_HEDGE_QUANTILE)))
+
+# The session and its current job live in the URL, so a reload finds the same job again
+if "sid" not in st.query_params:
+    st.query_params["sid"] = uuid.uuid4().hex[:12]
+session_user = st.query_params["sid"]
+
+FUNCTIONS = ["Customer Success", "Revenue Operations", "Support", "Sales", "Other"]
+STAGES = ["Seed", "Series A", "Series B", "Growth", "Enterprise"]
+
+def render_plan_library():
+    """Search saved plans and open one instead of generating a new plan"""
+    with st.expander(f"📚 Plan Library ({plan_store.count():,} saved plans)"):
+        query = st.text_input("Search plans", placeholder="e.g. churn playbook Salesforce", key="library_query")
+        col_f, col_s, col_q = st.columns(3)
+        with col_f:
+            lib_function = st.selectbox("Function", ["Any"] + FUNCTIONS, key="library_function")
+        with col_s:
+            lib_stage = st.selectbox("Stage", ["Any"] + STAGES, key="library_stage")
+        with col_q:
+            lib_min_score = st.slider("Min quality", 0, 100, 70, step=5, key="library_min_score")
+
+        filters = {"function": None if lib_function == "Any" else lib_function,
+                   "company_stage": None if lib_stage == "Any" else lib_stage, "min_score": lib_min_score or None}
+        started = time.perf_counter()
+        results = plan_store.search(query, limit=10, **filters)
+        st.caption(f"{len(results)} plans in {(time.perf_counter() - started) * 1000:.0f} ms")
+        for plan in results:
+            col_info, col_open = st.columns([4, 1])
+            with col_info:
+                company = f" @ {plan['company_name']}" if plan["company_name"] else ""
+                st.write(f"**{plan['role']}**{company} — {plan['seniority']} {plan['function']}, {plan['company_stage']}  \n"
+                         f"{plan['quality_score']}% quality • {plan['word_count']:,} words • "
+                         f"{datetime.fromtimestamp(plan['created_at']).strftime('%b %d, %Y')}")
+            with col_open:
+                st.button("Open", key=f"open_plan_{plan['id']}", on_click=open_saved_plan, args=(plan["id"],))
+        if results:
+            render_bulk_export(query, filters)
+
+def render_bulk_export(query, filters):
+    """Zip every plan matching the library search, written by an export worker straight to disk"""
+    col_formats, col_button = st.columns([3, 1])
+    with col_formats:
+        formats = st.multiselect("Bulk export formats", list(EXPORT_FORMATS), default=BULK_EXPORT_FORMATS,
+                                 format_func=lambda fmt: EXPORT_FORMATS[fmt][0], key="bulk_formats")
+    with col_button:
+        if st.button("📦 Export matching plans", disabled=not formats):
+            purge_exports(EXPORT_DIR, 3600)
+            plan_ids = [plan["id"] for plan in plan_store.search(query, limit=BULK_EXPORT_LIMIT, **filters)]
+            path = os.path.join(EXPORT_DIR, f"onboarding-plans-{session_user}-{int(time.time())}.zip")
+            job = export_queue.submit(session_user, run_bulk_export_job, plan_store, plan_ids, formats, next_monday(),
+                                      export_cache, path)
+            st.session_state["bulk_export_job"] = job.id
+
+    job = export_queue.get(st.session_state.get("bulk_export_job"))
+    if job is None:
+        return
+    if not job.finished:
+        render_export_progress(job.id)
+    elif job.status == FAILED:
+        st.error(f"❌ Bulk export failed: {job.error}")
+    elif job.result and os.path.exists(job.result["path"]):
+        # The zip can be hundreds of MB: read it only on the run where the user asked for it, not every rerun
+        if st.button(f"📥 Prepare download: {job.result['plans']} plans ({job.result['bytes'] / 1e6:.1f} MB zip)"):
+            with open(job.result["path"], "rb") as archive:
+                st.download_button("⬇️ Download zip", archive, file_name=os.path.basename(job.result["path"]),
+                                   mime="application/zip", on_click="ignore")
+
+def set_session_value(key, value):
+    st.session_state[key] = value
+
+def open_saved_plan(plan_id):
+    """Show a stored plan in place of the current job's result"""
+    st.session_state["active_plan_id"] = plan_id
+    st.query_params.pop("job", None)
+
+def render_reuse_offer(matches):
+    """Offer saved plans for near-identical inputs; generating a new plan stays one click away.
+
+    The offer is only drawn on the submitting run, so the buttons act through
+    callbacks, which Streamlit runs even though the next run does not redraw them.
+    """
+    st.info(f"♻️ Found {len(matches)} saved plan{'s' if len(matches) > 1 else ''} for a very similar hire. "
+            "Open one as-is, or adapt it with a single short request instead of generating a full new plan.")
+    for match in matches:
+        plan = plan_store.get(match["id"])
+        if plan is None:
+            continue
+        col_info, col_open, col_adapt = st.columns([3, 1, 1])
+        with col_info:
+            company = f" @ {plan['company_name']}" if plan["company_name"] else ""
+            st.write(f"**{plan['role']}**{company} — {match['similarity']:.0%} similar, {plan['quality_score']}% quality  \n"
+                     f"_{plan['manager_priorities']}_")
+        with col_open:
+            st.button("Open", key=f"reuse_open_{plan['id']}", on_click=open_saved_plan, args=(plan["id"],))
+        with col_adapt:
+            st.button("Adapt", key=f"reuse_adapt_{plan['id']}", on_click=set_session_value,
+                      args=("reuse_action", {"adapt": plan["id"]}))
+    st.button("🚀 Generate a new plan anyway", on_click=set_session_value, args=("reuse_action", {"generate": True}))
+
+@st.fragment(run_every=0.5)
+def render_export_progress(job_id):
+    """Progress of an export job; reruns the page once its files are ready"""
+    job = export_queue.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    st.caption(job.progress or "📄 Preparing downloads...")
+
+def render_export_downloads(plan):
+    """Download buttons for every export format, rendered once per plan content by an export worker.
+
+    The files are served from the export cache; while any are missing a
+    background job renders them and the buttons appear when it is done. What
+    the cache could not keep is taken from the finished job's result, so a
+    small cache never sends the page into a loop of re-rendering.
+    """
+    start_date = st.date_input("📅 Hire start date (for the calendar and milestone due dates)", value=next_monday(),
+                               key=f"export_start_{plan['id']}")
+    content_hash = plan_content_hash(plan)
+    artifacts = {fmt: export_cache.get(export_key(content_hash, fmt, start_date)) for fmt in EXPORT_FORMATS}
+    missing = [fmt for fmt, data in artifacts.items() if data is None]
+    if missing:
+        jobs = st.session_state.setdefault("export_jobs", {})
+        job = export_queue.get(jobs.get((content_hash, start_date)))
+        if job is not None and job.status == FAILED:
+            st.error(f"❌ Export failed: {job.error}")
+            return
+        if job is not None and job.status == DONE:
+            # The job returns every format, so its result covers whatever the cache has evicted since
+            artifacts = job.result["artifacts"]
+        else:
+            if job is None or job.finished:
+                job = export_queue.submit(session_user, run_export_job, plan, list(EXPORT_FORMATS), start_date,
+                                          export_cache)
+                jobs[(content_hash, start_date)] = job.id
+            render_export_progress(job.id)
+            return
+    for column, (fmt, (label, _, mime, _)) in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS.items()):
+        column.download_button(f"⬇️ {label}", artifacts[fmt], file_name=export_filename(plan, fmt), mime=mime,
+                               key=f"download_{plan['id']}_{fmt}", on_click="ignore")
+
+def render_export_options(plan):
+    """Export buttons for a stored plan; they work on later reruns because the plan comes from the store"""
+    context = plan["context"]
+    st.subheader("📤 Export Options")
+    render_export_downloads(plan)
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        if st.button("📋 Copy to Clipboard"):
+            st.code(plan["body"], language="markdown")
+            st.success("Plan ready to copy!")
+
+    with col2:
+        if st.button("📧 Email Template"):
+            email_body = f"""Subject: Onboarding Plan for {context['role']}
+
+Hi [Manager Name],
+
+Here's the AI-generated onboarding plan for our new {context['role']}:
+
+{plan['body']}
+
+This plan is customized for our {context['company_stage']} stage company and includes weekly milestones, red flags to watch for, and coaching guidance.
+
+Best regards,
+[Your Name]"""
+            st.text_area("Email Draft:", email_body, height=200)
+
+    with col3:
+        if st.button("🔄 Generate Variation"):
+            st.info("Tip: Try adjusting the creativity level or style in Advanced Options above, then regenerate! Tick \"♻️ Bypass cache\" to force a fresh plan for identical inputs.")
+
+    with col4:
+        if st.button("✏️ Adapt These Inputs"):
+            for key, value in context.items():
+                st.session_state[key] = value
+            st.rerun()
+
+@st.cache_data(show_spinner="Measuring cold imports...")
+def cold_import_report():
+    """-X importtime breakdown of the eager and lazily loaded modules, measured once per process"""
+    return {"Loaded at startup": import_times(EAGER_MODULES), "Loaded on first generation": import_times(LAZY_MODULES)}
+
+def render_startup_audit():
+    """Startup audit (STARTUP_AUDIT=1 or ?audit=startup): where cold-start and per-run time goes"""
+    with st.sidebar.expander("⏱️ Startup audit", expanded=True):
+        st.caption(f"This run: imports {(IMPORTS_DONE - APP_STARTED) * 1000:,.0f} ms • "
+                   f"script {(time.perf_counter() - APP_STARTED) * 1000:,.0f} ms "
+                   "(modules stay loaded after the first run)")
+        for label, rows in cold_import_report().items():
+            errors = [row["error"] for row in rows if "error" in row]
+            total = sum(row["cumulative_ms"] for row in rows if row["depth"] == 0)
+            st.markdown(f"**{label}**: {total:,.0f} ms in a fresh interpreter")
+            if errors:
+                st.warning(errors[0])
+            st.dataframe([{"Module": row["module"], "Cumulative ms": row["cumulative_ms"], "Self ms": row["self_ms"]}
+                          for row in slowest_imports(rows, limit=10)], hide_index=True)
+
+def render_demo_analytics(container):
+    """Fill the analytics column from the metrics store (called last so it includes this run)"""
+    stats = metrics_store.dashboard()
+    with container:
+        st.subheader("📊 Demo Analytics")
+        delta = stats["plans_today"] - stats["plans_yesterday"]
+        st.metric("Plans Generated Today", stats["plans_today"], f"{delta:+d} vs yesterday")
+        st.metric("Most Popular Role", stats["top_function"] or "—", "")
+        st.metric("Avg Plan Length", f"{stats['avg_words']:,.0f} words" if stats["avg_words"] else "—", "")
+        if stats["latency"]:
+            latency = stats["latency"]
+            st.metric("Latency p50 / p95 / p99", f"{latency['p50']:.1f}s / {latency['p95']:.1f}s / {latency['p99']:.1f}s")
+        if stats["ttft"]:
+            st.caption(f"Time to first token p50 {stats['ttft']['p50']:.1f}s • "
+                       f"{stats['failures_today']} failed • {stats['cache_hits_today']} cache hits • "
+                       f"${stats['cost_today']:.2f} spent today")
+        if stats["cached_share"] is not None:
+            st.caption(f"♻️ {stats['cached_share']:.0%} of today's prompt tokens came from the provider's prompt cache")
+        hedges = hedge_budget.summary()
+        if hedges["requests"]:
+            st.caption(f"⏱️ {hedges['hedges']} backup requests for {hedges['requests']} hedge-enabled plans "
+                       f"(budget {hedges['max_fraction']:.0%})")
+        budget = get_scheduler(openai_api_key).summary() if openai_api_key else None
+        if budget and budget["requests"]:
+            st.caption(f"🚦 Rate budget: {budget['queued']} of {budget['requests']} requests queued "
+                       f"({budget['wait_seconds']:.0f}s in total) • "
+                       f"{budget['fallback']} moved to a cheaper model • "
+                       f"{budget['rate_limit_retries']} retried after a rate limit")
+
+        if stats["function_counts"]:
+            # A plain Vega-Lite spec: no plotly or pandas import just to draw a pie
+            st.vega_lite_chart({
+                "title": "Role Distribution",
+                "height": 300,
+                "data": {"values": [{"Role": role, "Count": count} for role, count in stats["function_counts"].items()]},
+                "mark": {"type": "arc"},
+                "encoding": {"theta": {"field": "Count", "type": "quantitative"},
+                             "color": {"field": "Role", "type": "nominal", "legend": None},
+                             "tooltip": [{"field": "Role"}, {"field": "Count"}]},
+            }, use_container_width=True)
+        else:
+            st.caption("No plans generated yet today.")
+
+        with st.expander("📈 Prometheus metrics"):
+            metrics_text = metrics_store.prometheus_text()
+            st.code(metrics_text, language="text")
+            st.download_button("Download metrics.prom", metrics_text, file_name="metrics.prom", mime="text/plain")
+
+OUTCOME_ERRORS = {
+    "auth_error": "🔑 **Authentication Error**: Invalid API key. Please check your OpenAI API key.",
+    "rate_limited": "🚫 **Rate Limit**: Too many requests. Please wait a moment and try again.",
+    "timeout": "⏱️ **Timeout**: Request took too long. Please try again.",
+    "connection_error": "🌐 **Connection Error**: Cannot reach OpenAI. Check your internet connection.",
+}
+
+@st.fragment(run_every=1.0)
+def render_job_progress(job_id):
+    """Live view of a queued or running job, redrawn every second without rerunning the whole page"""
+    job = job_queue.get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    if job.status == QUEUED:
+        stats = job_queue.stats()
+        st.info(f"⏳ Queued — {job_queue.position(job)} plans ahead of yours • "
+                f"{stats['running']} of {stats['workers']} generators busy")
+    else:
+        st.caption(job.progress or "🤖 Starting...")
+        for section in list(job.sections):
+            st.markdown(section)
+    st.button("✖️ Cancel", key=f"cancel_job_{job_id}", on_click=job_queue.cancel, args=(job_id,))
+
+def render_job_result(job):
+    """The finished job's plan with its analysis, or what went wrong"""
+    result = job.result
+    if result is None:
+        if job.status == FAILED:
+            st.error(f"❌ **Unexpected Error**: {job.error}")
+        else:
+            st.info("✖️ Generation cancelled.")
+        return
+    outcome = result["outcome"]
+    if outcome == "aborted":
+        st.error(f"🛑 **Generation stopped early**: {result['error']}. The request was cancelled to avoid paying for an unusable plan — please regenerate.")
+        with st.expander("Partial output"):
+            st.markdown(result["partial_text"])
+        return
+    if outcome in OUTCOME_ERRORS:
+        st.error(OUTCOME_ERRORS[outcome])
+        return
+    if outcome == "error":
+        st.error(f"❌ **Unexpected Error**: {result['error']}")
+        st.info("💡 **Troubleshooting**: Try using a demo scenario or check your API key. Contact support if the issue persists.")
+        return
+
+    if result["cache_hit"]:
+        st.caption("⚡ Served from plan cache — tick \"Bypass cache\" to generate a fresh plan")
+    if result["downgraded"]:
+        st.info("🚦 The selected model was at its rate limit, so a fallback model wrote some of this plan. "
+                "It was saved to the library but not to the plan cache.")
+    adapt_report, phase_report, repair_report = result["adapt_report"], result["phase_report"], result["repair_report"]
+    if adapt_report is not None:
+        st.info(f"♻️ Adapted saved plan #{result['adapt_base_id']}: rewrote the executive summary and "
+                f"{len(adapt_report['rewritten_weeks'])} of 12 weeks in one request")
+    repaired = result["repaired"]
+    if repaired:
+        st.info(f"🩹 Repaired week{'s' if len(repaired) > 1 else ''} {', '.join(map(str, repaired))} "
+                f"with {repair_report['requests']} targeted request{'s' if repair_report['requests'] > 1 else ''}")
+    if result["validation_error"]:
+        st.error(f"⚠️ {result['validation_error']}")
+        return
+
+    if not result["mentions_tools"]:
+        st.warning("⚠️ Plan may be missing specific tool references. Consider regenerating for more detailed guidance.")
+        st.markdown("### 🧾 Your AI-Generated 30/60/90-Day Onboarding Plan")
+        st.markdown(result["output"])
+        return
+
+    # Display the plan
+    st.markdown("### 🧾 Your AI-Generated 30/60/90-Day Onboarding Plan")
+    st.markdown(result["output"])
+
+    # Plan quality analysis
+    metrics = result["metrics"]
+    with st.expander("📊 Plan Quality Analysis"):
+        if metrics:
+            # Main metrics
+            col1, col2, col3, col4, col5, col6 = st.columns(6)
+            with col1: st.metric("Word Count", metrics["Word Count"])
+            with col2: st.metric("Weekly Sections", metrics["Weekly Sections"])
+            with col3: st.metric("Milestones", metrics["Milestones"])
+            with col4: st.metric("Red Flags", metrics["Red Flags"])
+            with col5: st.metric("Coaching Notes", metrics["Coaching Notes"])
+            with col6: st.metric("Quality Score", metrics["Quality Score"])
+
+            # Quality factors breakdown
+            st.subheader("Quality Checklist")
+            for factor, passed in metrics["Quality Factors"].items():
+                status = "✅" if passed else "❌"
+                st.write(f"{status} {factor}")
+
+    # Content structure analysis
+    with st.expander("📋 Content Structure Analysis"):
+        st.write(f"**Phases Detected**: {result['phases']}")
+        for i, week_count in enumerate(result["weeks_by_phase"]):
+            st.write(f"- Phase {i+1}: {week_count} weeks")
+
+        if result["balanced"]:
+            st.success("✅ Well-balanced phase distribution")
+        else:
+            st.warning("⚠️ Uneven phase distribution detected")
+
+    # Technical implementation details
+    with st.expander("⚙️ Technical Implementation Details"):
+        cache_hit, usage_totals = result["cache_hit"], result["usage"]
+        st.write("**AI Integration**: OpenAI API with structured prompting and context management")
+        st.write("**Prompt Engineering**: Dynamic assembly based on 8+ user input variables")
+        st.write("**Quality Validation**: Automated analysis of output completeness and structure")
+        st.write(f"**Response Time**: Generated in {result['seconds']:.1f} seconds"
+                 + (" (served from cache)" if cache_hit else "")
+                 + f", after {job.started_at - job.submitted_at:.1f}s in the queue")
+        st.write(f"**Token Usage**: {usage_totals['prompt_tokens']:,} prompt + "
+                 f"{usage_totals['completion_tokens']:,} completion tokens"
+                 + (" (reported by the API)" if not cache_hit else ""))
+        if usage_totals["prompt_tokens"]:
+            st.write(f"**Prompt Cache**: {usage_totals['cached_tokens']:,} of {usage_totals['prompt_tokens']:,} "
+                     f"prompt tokens served from the provider's cache "
+                     f"({usage_totals['cached_tokens'] / usage_totals['prompt_tokens']:.0%})")
+        hedge_report = result["hedge_report"]
+        if hedge_report is not None:
+            if hedge_report["hedged"]:
+                st.write(f"**Hedged Request**: no first token after {hedge_report['deadline']:.1f}s, so a backup was sent; "
+                         f"the {hedge_report['winner']} ({hedge_report['winner_model']}) won"
+                         + (f" and the {', '.join(hedge_report['cancelled'])} was cancelled" if hedge_report["cancelled"] else "")
+                         + f" • ~{hedge_report['wasted_completion_tokens']:,} completion tokens spent on the loser")
+            else:
+                st.write(f"**Hedged Request**: first token within the {hedge_report['deadline']:.1f}s deadline, no backup needed")
+        if result["stream"] is not None and result["stream"]["first_week"] is not None:
+            st.write(f"**Streaming**: first token after {result['stream']['ttft']:.1f}s, "
+                     f"first complete week after {result['stream']['first_week']:.1f}s")
+        if phase_report is not None:
+            st.write(f"**Parallel Phases**: {phase_report['seconds']:.1f}s wall clock")
+            for label, part in phase_report["parts"].items():
+                retried = f", {part['attempts'] - 1} retried" if part["attempts"] > 1 else ""
+                st.write(f"- {label}: {part['seconds']:.1f}s{retried}"
+                         + ("" if part["complete"] else " ⚠️ still incomplete"))
+        if adapt_report is not None:
+            st.write(f"**Adapted Plan**: based on saved plan #{result['adapt_base_id']}, rewrote weeks "
+                     f"{', '.join(map(str, adapt_report['rewritten_weeks'])) or 'none'} "
+                     f"in {adapt_report['seconds']:.1f}s")
+        if repair_report is not None:
+            st.write(f"**Repair Pass**: {len(repair_report['defects'])} defective weeks, "
+                     f"{repair_report['rounds']} rounds, {repair_report['requests']} requests, "
+                     f"{repair_report['completion_tokens']} completion tokens, {repair_report['seconds']:.1f}s"
+                     + (f" • still incomplete: {', '.join(map(str, sorted(repair_report['remaining'])))}"
+                        if repair_report["remaining"] else ""))
+        cache_stats = plan_cache.summary()
+        st.write(f"**Plan Cache**: {'hit' if cache_hit else 'miss'} • "
+                 f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                 f"({cache_stats['hit_rate']:.0%} hit rate) • "
+                 f"{cache_stats['memory_entries']} plans in memory"
+                 + (f", {cache_stats['disk_entries']} on disk" if cache_stats['disk_entries'] is not None else ""))
 
 # --- Main Form ---
 col1, col2 = st.columns([2, 1])
@@ -264,8 +723,24 @@ with col1:
                 model_choice = st.selectbox("AI Model", ["gpt-4", "gpt-3.5-turbo"], help="GPT-4 provides more detailed plans")
                 temperature = st.slider("Creativity Level", 0.0, 1.0, 0.7, help="Higher = more creative, Lower = more structured")
             with col_h:
-                max_tokens = st.number_input("Max Response Length", 1000, 8000, 4000, help="Higher values allow more complete plans")
-                plan_style = st.selectbox("Plan Style", ["Detailed", "Concise", "Bullet Points"])
+                max_tokens = st.number_input("Max Response Length", 0, 8000, 0, step=500,
+                                             help="0 = everything the model's context window leaves after the prompt. "
+                                                  "Higher values allow more complete plans")
+                plan_style = st.selectbox("Plan Style", list(STYLE_INSTRUCTIONS))
+            generation_mode = st.radio("Generation Mode", ["Single request", "Parallel phases"], horizontal=True,
+                                       help="Parallel phases writes the summary and each 4-week phase concurrently and retries only truncated phases")
+            auto_repair = st.checkbox("🩹 Auto-repair incomplete weeks", value=True,
+                                      help="Regenerate only the missing or malformed weeks instead of asking you to regenerate the whole plan")
+            stream_output = st.checkbox("⚡ Stream plan as it is written", value=True,
+                                        help="Show each week as soon as it is generated and stop early if the output goes off the rails (single request mode)")
+            col_hedge, col_hedge_model = st.columns(2)
+            with col_hedge:
+                hedge_requests = st.checkbox("⏱️ Hedge slow requests", value=False,
+                                             help="If the first token is later than for 95% of recent plans, send a backup "
+                                                  "request and keep whichever valid plan finishes first (streaming only)")
+            with col_hedge_model:
+                hedge_fast_model = st.checkbox("Send the backup to gpt-3.5-turbo", value=False,
+                                               help="Faster model for the backup request")
 
         # Input validation and error handling
         input_errors = []
@@ -282,30 +757,22 @@ with col1:
             for error in input_errors:
                 st.error(f"⚠️ {error}")
 
-        submitted = st.form_submit_button("🚀 Generate Plan", 
-                                        use_container_width=True,
-                                        disabled=bool(input_errors))
+        col_submit, col_bypass = st.columns([3, 1])
+        with col_submit:
+            submitted = st.form_submit_button("🚀 Generate Plan", 
+                                            use_container_width=True,
+                                            disabled=bool(input_errors))
+        with col_bypass:
+            bypass_cache = st.checkbox("♻️ Bypass cache", help="Always call the model, even if an identical plan is cached")
 
-with col2:
-    st.subheader("📊 Demo Analytics")
-    st.metric("Plans Generated Today", "47", "↑12")
-    st.metric("Most Popular Role", "CS Manager", "")
-    st.metric("Avg Plan Length", "2,847 words", "")
-    
-    # Fake usage chart
-    try:
-        import plotly.express as px
-        import pandas as pd
-        
-        chart_data = pd.DataFrame({
-            'Role': ['Customer Success', 'Sales', 'RevOps', 'Support', 'Other'],
-            'Count': [23, 18, 12, 8, 6]
-        })
-        fig = px.pie(chart_data, values='Count', names='Role', title="Role Distribution")
-        fig.update_layout(height=300, showlegend=False)
-        st.plotly_chart(fig, use_container_width=True)
-    except ImportError:
-        st.write("📊 Install plotly for charts")
+    render_plan_library()
+
+# Filled in at the end of the script so the numbers include plans that finished before this run
+analytics_panel = col2.container()
+
+# A choice made on the "similar plan" offer re-runs the submission with the same form values
+reuse_action = st.session_state.pop("reuse_action", None)
+submitted = submitted or reuse_action is not None
 
 # --- Generate Plan ---
 if submitted:
@@ -314,6 +781,26 @@ if submitted:
     elif not role.strip() or not manager_priorities.strip():
         st.error("📝 Please fill in at least the role and manager priorities.")
     else:
+        plan_context = {
+            "company_name": company_name,
+            "role": role,
+            "seniority": seniority,
+            "function": function,
+            "company_size": company_size,
+            "company_stage": company_stage,
+            "team_size": team_size,
+            "is_customer_facing": is_customer_facing,
+            "manager_priorities": manager_priorities,
+            "known_constraints": known_constraints
+        }
+
+        # Static instructions first and the hire's context last, so every request shares a cacheable prefix
+        system_prompt = build_system_prompt(plan_style)
+        user_prompt = build_user_prompt(plan_context)
+        prompt_messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+        prompt_tokens = message_tokens(prompt_messages, model_choice)
+        max_tokens = completion_budget(prompt_messages, model_choice, cap=max_tokens or None)
+
         # Show prompt engineering approach
         with st.expander("🔍 AI Prompt Engineering Strategy"):
             context_points = len([x for x in [role, function, company_stage, manager_priorities, known_constraints, company_name] if x.strip()])
@@ -327,210 +814,67 @@ if submitted:
             
             **Context Variables**: {context_points} data points injected
             **Model Settings**: {model_choice} | Temperature: {temperature} | Max tokens: {max_tokens}
+            **Prompt**: {prompt_tokens:,} tokens ({"counted with tiktoken" if TOKENS_EXACT else "estimated"}), {len(system_prompt):,} characters of static instructions before the hire context
             """)
 
-        # Generate the plan with comprehensive error handling
-        with st.spinner(f"🤖 Generating plan with {model_choice}..."):
-            try:
-                client = openai.OpenAI(api_key=openai_api_key)
-
-                # Enhanced prompt based on style choice
-                style_instructions = {
-                    "Detailed": "Provide comprehensive explanations and context for each element.",
-                    "Concise": "Keep sections brief but actionable. Focus on key points only.",
-                    "Bullet Points": "Use bullet point format for easy scanning and implementation."
-                }
-
-                # Try generating with explicit week-by-week structure
-                system_prompt = f"""You are an expert onboarding architect. You MUST create a complete 12-week plan.
-
-REQUIREMENTS:
-- Write exactly 12 weeks, numbered Week 1 through Week 12
-- Each week must have all 4 sections: Learning Objectives, Milestone Checklist, Red Flag, Manager Coaching Notes
-- Use the emojis: 📚 ✅ 🚩 🧭
-- No shortcuts, placeholders, or "continue this format" text allowed
-- If you start to run out of space, prioritize completing all 12 weeks over lengthy descriptions
-
-CONTEXT:
-Company: {company_name.strip() or "the company"} ({company_stage} stage, {company_size} employees)
-Role: {role.strip()} ({seniority} level in {function})
-Customer-facing: {"Yes" if is_customer_facing else "No"}
-Team size: {team_size}"""
-
-                user_prompt = f"""Create a complete 12-week onboarding plan for this context:
-
-Manager Priorities: {manager_priorities.strip()}
-Known Constraints: {known_constraints.strip() or "None specified"}
-
-MANDATORY STRUCTURE - You must include ALL of these sections:
-- Executive Summary (2 paragraphs)
-- Phase 1: Foundation (Weeks 1-4) 
-- Phase 2: Application (Weeks 5-8)
-- Phase 3: Ownership (Weeks 9-12)
-
-YOU MUST WRITE OUT EVERY SINGLE WEEK (1 through 12) using this exact format:
-
-## Week X: [Specific Theme Name]
-📚 **Learning Objectives**
-- [specific, measurable objective 1]
-- [specific, measurable objective 2]
-
-✅ **Milestone Checklist**  
-- [ ] [concrete deliverable 1]
-- [ ] [concrete deliverable 2]
-- [ ] [concrete deliverable 3]
-
-🚩 **Red Flag**
-[One specific warning sign if goals aren't met]
-
-🧭 **Manager Coaching Notes**
-[Specific guidance for manager's 1:1 this week]
-
-REQUIRED HR/ONBOARDING ELEMENTS (must include in Week 1-2):
-- Complete all new hire paperwork and documentation
-- Enroll in health insurance, 401k, and other benefits
-- Review employee handbook and company policies
-- Complete mandatory compliance training (security, harassment, etc.)
-- Set up IT accounts and equipment
-
-BUSINESS TOOL TRAINING FOCUS - Only include training for business-critical tools:
-For {company_stage} companies, focus training on:
-{
-"HubSpot CRM, specialized support platforms" if company_stage in ["Seed", "Series A"] else
-"Salesforce CRM, Zendesk, Gong, Gainsight" if company_stage in ["Series B", "Growth"] else  
-"Salesforce + Revenue Cloud, ServiceNow, advanced analytics platforms"
-}
-
-DO NOT include basic tool training for:
-- Slack/Teams (assume users know communication tools)
-- Email/Calendar (basic digital literacy assumed)  
-- Basic computer skills or common workplace software
-
-CRITICAL REQUIREMENTS:
-1. Write exactly 12 weeks - do not skip any weeks
-2. Each week must be completely different with unique objectives
-3. Progressive difficulty: Week 1 = HR/basics, Week 12 = advanced leadership
-4. Reference business-critical tools by name, not basic communication tools
-5. No shortcuts, placeholders, or "continue this format" language
-6. Focus on {function} responsibilities and success metrics
-7. Include proper HR onboarding in early weeks
-
-Write all 12 weeks now - do not summarize or use shortcuts."""
-
-                response = client.chat.completions.create(
-                    model=model_choice,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    timeout=60
-                )
-
-                output = response.choices[0].message.content
-                
-                # Validate output quality before displaying
-                week_count = len(re.findall(r'Week \d+', output, re.IGNORECASE))
-                has_shortcuts = any(phrase in output.lower() for phrase in [
-                    'continue this format', 'repeat for weeks', '[note:', 'etc.', '...'
-                ])
-                
-                if not output or len(output.strip()) < 1500:
-                    st.error("⚠️ Generated plan seems too short. Please try again or increase max tokens.")
-                elif week_count < 10:
-                    st.error(f"⚠️ Plan only contains {week_count} weeks instead of 12. Please regenerate.")
-                elif has_shortcuts:
-                    st.error("⚠️ Plan contains shortcuts/placeholders instead of complete weeks. Please regenerate.")
-                elif not any(tool in output for tool in ['Salesforce', 'HubSpot', 'Slack', 'Notion', 'Zendesk', 'Gainsight', 'Teams']):
-                    st.warning("⚠️ Plan may be missing specific tool references. Consider regenerating for more detailed guidance.")
-                    st.markdown("### 🧾 Your AI-Generated 30/60/90-Day Onboarding Plan")
-                    st.markdown(output)
-                else:
-                    # Display the plan
-                    st.markdown("### 🧾 Your AI-Generated 30/60/90-Day Onboarding Plan")
-                    st.markdown(output)
-                    
-                    # Plan quality analysis
-                    with st.expander("📊 Plan Quality Analysis"):
-                        metrics = analyze_plan_quality(output)
-                        if metrics:
-                            # Main metrics
-                            col1, col2, col3, col4, col5, col6 = st.columns(6)
-                            with col1: st.metric("Word Count", metrics["Word Count"])
-                            with col2: st.metric("Weekly Sections", metrics["Weekly Sections"])
-                            with col3: st.metric("Milestones", metrics["Milestones"])  
-                            with col4: st.metric("Red Flags", metrics["Red Flags"])
-                            with col5: st.metric("Coaching Notes", metrics["Coaching Notes"])
-                            with col6: st.metric("Quality Score", metrics["Quality Score"])
-                            
-                            # Quality factors breakdown
-                            st.subheader("Quality Checklist")
-                            for factor, passed in metrics["Quality Factors"].items():
-                                status = "✅" if passed else "❌"
-                                st.write(f"{status} {factor}")
-                    
-                    # Content structure analysis
-                    with st.expander("📋 Content Structure Analysis"):
-                        phases = re.findall(r'(Phase \d+|PHASE \d+).*?(?=Phase \d+|PHASE \d+|$)', output, re.DOTALL | re.IGNORECASE)
-                        st.write(f"**Phases Detected**: {len(phases)}")
-                        
-                        weeks_by_phase = []
-                        for i, phase in enumerate(phases[:3]):  # Max 3 phases
-                            week_count = len(re.findall(r'Week \d+', phase, re.IGNORECASE))
-                            weeks_by_phase.append(week_count)
-                            st.write(f"- Phase {i+1}: {week_count} weeks")
-                        
-                        if len(weeks_by_phase) == 3 and all(w >= 3 for w in weeks_by_phase):
-                            st.success("✅ Well-balanced phase distribution")
-                        else:
-                            st.warning("⚠️ Uneven phase distribution detected")
-                    
-                    # Export options
-                    st.subheader("📤 Export Options")
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        if st.button("📋 Copy to Clipboard"):
-                            st.code(output, language="markdown")
-                            st.success("Plan ready to copy!")
-                    
-                    with col2:
-                        if st.button("📧 Email Template"):
-                            email_body = f"""Subject: Onboarding Plan for {role}
-
-Hi [Manager Name],
-
-Here's the AI-generated onboarding plan for our new {role}:
-
-{output}
-
-This plan is customized for our {company_stage} stage company and includes weekly milestones, red flags to watch for, and coaching guidance.
-
-Best regards,
-[Your Name]"""
-                            st.text_area("Email Draft:", email_body, height=200)
-                    
-                    with col3:
-                        if st.button("🔄 Generate Variation"):
-                            st.info("Tip: Try adjusting the creativity level or style in Advanced Options above, then regenerate!")
-
-                    # Technical implementation details
-                    with st.expander("⚙️ Technical Implementation Details"):
-                        st.write("**AI Integration**: OpenAI API with structured prompting and context management")
-                        st.write("**Prompt Engineering**: Dynamic assembly based on 8+ user input variables")
-                        st.write("**Quality Validation**: Automated analysis of output completeness and structure")
-                        st.write(f"**Response Time**: Generated in ~{10 + len(output)//100} seconds")
-                        st.write(f"**Token Usage**: ~{len(system_prompt.split()) + len(user_prompt.split()) + len(output.split())} tokens estimated")
-
-            except openai.AuthenticationError:
-                st.error("🔑 **Authentication Error**: Invalid API key. Please check your OpenAI API key.")
-            except openai.RateLimitError:
-                st.error("🚫 **Rate Limit**: Too many requests. Please wait a moment and try again.")
-            except openai.APITimeoutError:
-                st.error("⏱️ **Timeout**: Request took too long. Please try again.")
-            except openai.APIConnectionError:
-                st.error("🌐 **Connection Error**: Cannot reach OpenAI. Check your internet connection.")
-            except Exception as e:
-                st.error(f"❌ **Unexpected Error**: {str(e)}")
-                st.info("💡 **Troubleshooting**: Try using a demo scenario or check your API key. Contact support if the issue persists.")
+        # Identical inputs produce identical prompts, so reuse a previous plan when we have one
+        cache_key = plan_cache_key(system_prompt, user_prompt, model_choice, temperature, max_tokens, plan_style,
+                                   mode=generation_mode)
+        cached_output = None if bypass_cache else plan_cache.get(cache_key)
+        st.session_state["active_plan_id"] = None
+        st.query_params.pop("job", None)
+
+        # Near-identical inputs: offer a saved plan (or a cheap adaptation of it) before paying for a new one
+        similar_plans = []
+        if cached_output is None and not bypass_cache and reuse_action is None:
+            similar_plans = reuse_index.nearest(plan_context)
+        adapt_base = plan_store.get(reuse_action["adapt"]) if reuse_action and reuse_action.get("adapt") else None
+
+        if similar_plans:
+            render_reuse_offer(similar_plans)
+        else:
+            # The plan is generated by the shared job queue, not this script run, so it survives reruns and reloads
+            plan_request = {
+                "context": plan_context, "system_prompt": system_prompt, "user_prompt": user_prompt,
+                "cache_key": cache_key, "cached_output": cached_output, "adapt_base": adapt_base,
+                "model": model_choice, "temperature": temperature, "max_tokens": max_tokens,
+                "mode": generation_mode, "stream": stream_output, "auto_repair": auto_repair, "plan_style": plan_style,
+                "hedge": {
+                    "deadline": hedge_deadline(metrics_store.percentiles("ttft_seconds", quantiles=(HEDGE_QUANTILE,)),
+                                               HEDGE_QUANTILE),
+                    "budget": hedge_budget,
+                    "backup_model": "gpt-3.5-turbo" if hedge_fast_model else None,
+                } if hedge_requests and stream_output else None,
+            }
+            plan_job = job_queue.submit(session_user, run_plan_job, plan_request, get_openai_client(openai_api_key),
+                                        plan_cache, plan_store, reuse_index, metrics_store)
+            st.query_params["job"] = plan_job.id
+
+# --- Current job: polled while it runs, its result redrawn on every rerun until another plan is opened ---
+plan_job = job_queue.get(st.query_params["job"]) if "job" in st.query_params else None
+if plan_job is None and "job" in st.query_params:
+    st.query_params.pop("job")
+    st.info("That generation job has expired. Finished plans stay in the 📚 Plan Library.")
+elif plan_job is not None and not plan_job.finished:
+    render_job_progress(plan_job.id)
+elif plan_job is not None:
+    if st.session_state.get("shown_job_id") != plan_job.id:
+        st.session_state["shown_job_id"] = plan_job.id
+        st.session_state["active_plan_id"] = (plan_job.result or {}).get("plan_id")
+    render_job_result(plan_job)
+
+# --- Active plan: reopened from the store on every rerun, so the export buttons keep working ---
+active_plan = plan_store.get(st.session_state["active_plan_id"]) if st.session_state.get("active_plan_id") else None
+if active_plan is not None:
+    if plan_job is None or (plan_job.result or {}).get("plan_id") != active_plan["id"]:
+        company = f" at {active_plan['company_name']}" if active_plan["company_name"] else ""
+        st.markdown(f"### 🧾 Saved Onboarding Plan: {active_plan['role']}{company}")
+        st.caption(f"Plan #{active_plan['id']} • {active_plan['quality_score']}% quality • "
+                   f"{active_plan['word_count']:,} words • {active_plan['model']} • "
+                   f"saved {datetime.fromtimestamp(active_plan['created_at']).strftime('%b %d, %Y %H:%M')}")
+        st.markdown(active_plan["body"])
+    render_export_options(active_plan)
+
+render_demo_analytics(analytics_panel)
+if STARTUP_AUDIT or st.query_params.get("audit") == "startup":
+    render_startup_audit()
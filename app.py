@@ -1,78 +1,153 @@
 
-import streamlit as st
+import os
+
 import pandas as pd
-import altair as alt
+import streamlit as st
+
+from revops_charts import dashboard_charts, spec_payload
+from revops_cube import build_cube, cube_kpis, forecast_breakdown
+from revops_data import LEADS_CSV, OPPORTUNITIES_CSV, data_version
+from revops_ingest import IncrementalDashboard
+from revops_kpis import LOW_RECENT_AVG, RECENT_DAYS
+from revops_stream import stream_kpis
+from revops_tables import rep_stage_forecast, render_table, stage_forecast
+
+# Exports too large to hold in memory: set REVOPS_OUT_OF_CORE=1 to aggregate them chunk by chunk instead
+OUT_OF_CORE = os.environ.get("REVOPS_OUT_OF_CORE", "") not in ("", "0")
+STREAM_WORKERS = int(os.environ.get("REVOPS_STREAM_WORKERS", "0"))
 
 st.set_page_config(page_title="RevOps Dashboard", layout="wide")
 st.title("📊 AI-Powered RevOps Dashboard")
 st.markdown("This dashboard simulates key RevOps insights using AI-generated data.")
 
 # Load data
-leads = pd.read_csv("data/leads.csv")
-opps = pd.read_csv("data/opportunities.csv")
+@st.cache_resource
+def get_dashboard():
+    """Running aggregates over the CRM exports, shared by every session.
+
+    Each rerun calls refresh(), which parses only rows appended to the CSVs
+    since the last one; a rewritten export is reloaded in full.
+    """
+    return IncrementalDashboard.from_csv()
+
+@st.cache_resource(max_entries=2)
+def streamed_kpis(version, day):
+    """Dashboard aggregates streamed from the CSVs, once per data version and day; no frames are kept.
+
+    The day is part of the key because the recent-activity figures count back from today.
+    """
+    return stream_kpis(workers=STREAM_WORKERS)
+
+if OUT_OF_CORE:
+    kpis = streamed_kpis(data_version(LEADS_CSV, OPPORTUNITIES_CSV), pd.Timestamp.now().date())
+else:
+    dashboard = get_dashboard()
+    refresh = dashboard.refresh()
+    kpis = dashboard.kpis()
+    if refresh["mode"] == "incremental":
+        st.caption(f"Picked up {refresh['rows']:,} new rows in {refresh['seconds'] * 1000:,.0f} ms.")
 
-# Preprocess
-opps["weighted_amount"] = opps["amount"] * (opps["probability"] / 100)
-opps["created_date"] = pd.to_datetime(opps["created_date"], errors="coerce")
-leads["lead_score"] = pd.to_numeric(leads["lead_score"], errors="coerce")
+@st.cache_resource(max_entries=1)
+def dashboard_cube(_dashboard, version):
+    """Rep × stage × source × week cube for the filters, built once per data version"""
+    return build_cube(*_dashboard.frames())
+
+# Filters slice the pre-aggregated cube, never the raw rows
+st.sidebar.header("🔎 Filters")
+filters = {}
+if kpis["created_range"] is not None:
+    first, last = (day.date() for day in kpis["created_range"])
+    picked = st.sidebar.date_input("Created between", value=(first, last), min_value=first, max_value=last)
+    if len(picked) == 2 and tuple(picked) != (first, last):
+        filters["start"], filters["end"] = picked
+for key, label, options in (("reps", "Rep", kpis["by_rep"].index), ("sources", "Lead source", kpis["by_source"].index),
+                            ("stages", "Stage", kpis["by_stage"].index)):
+    selected = st.sidebar.multiselect(label, list(options))
+    if selected:
+        filters[key] = selected
+if filters and OUT_OF_CORE:
+    st.sidebar.info("Filters need the in-memory mode; showing all data.")
+elif filters:
+    kpis = cube_kpis(dashboard_cube(dashboard, dashboard.version), **filters)
+    st.caption(f"Filtered view: {kpis['opportunities']:,} opportunities and {kpis['leads']:,} leads. "
+               "Dates select whole weeks.")
 
 # Key metrics
 st.markdown("### 🚀 Key Metrics")
 col1, col2, col3 = st.columns(3)
-col1.metric("Total Pipeline", f"$11,504,000")
-col2.metric("Avg Lead Score", f"67.6")
-col3.metric("Lead → Opp Conversion", f"50.4%")
+col1.metric("Total Pipeline", f"${kpis['total_pipeline']:,.0f}")
+col2.metric("Avg Lead Score", f"{kpis['avg_lead_score']:.1f}" if kpis["avg_lead_score"] is not None else "—")
+col3.metric("Lead → Opp Conversion", f"{kpis['conversion_rate']:.1%}" if kpis["conversion_rate"] is not None else "—")
 st.markdown("---")
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def chart_specs(version, filter_key, _kpis):
+    """Serialized chart specs, reused while the data version and filters stay the same"""
+    return dashboard_charts(_kpis)
+
+if OUT_OF_CORE:
+    kpis_version = data_version(LEADS_CSV, OPPORTUNITIES_CSV)
+else:
+    kpis_version = dashboard.version
+filter_key = repr(sorted(filters.items()))
+charts = chart_specs(kpis_version, filter_key, kpis)
+
 # Funnel
 st.subheader("🔁 Funnel Overview")
 col4, col5 = st.columns(2)
-col4.bar_chart(leads["status"].value_counts())
-col5.bar_chart(leads["source"].value_counts())
+col4.vega_lite_chart(charts["status"], use_container_width=True)
+col5.vega_lite_chart(charts["source"], use_container_width=True)
 
 # Rep performance
 st.subheader("👤 Rep Pipeline Totals")
-pipeline_by_rep = opps.groupby("assigned_rep")["amount"].sum().reset_index()
-pipeline_by_rep.columns = ["Rep", "Total Pipeline ($)"]
-pipeline_by_rep["Total Pipeline ($)"] = pd.to_numeric(pipeline_by_rep["Total Pipeline ($)"], errors="coerce")
-bar = alt.Chart(pipeline_by_rep).mark_bar().encode(
-    x=alt.X("Rep:N", title="Sales Rep"),
-    y=alt.Y("Total Pipeline ($):Q", title="Pipeline ($)")
-).properties(title="Pipeline by Rep")
-st.altair_chart(bar, use_container_width=True)
+st.vega_lite_chart(charts["rep"], use_container_width=True)
 
 # Stage chart
 st.subheader("📊 Opportunity Stage Breakdown")
-st.bar_chart(opps["stage"].value_counts())
+st.vega_lite_chart(charts["stage"], use_container_width=True)
+
+# Pipeline trend
+st.subheader("📈 New Pipeline Over Time")
+st.vega_lite_chart(charts["trend"], use_container_width=True)
 
 # Forecast table
+@st.cache_data(max_entries=32, show_spinner=False)
+def forecast_tables(version, filter_key, _kpis):
+    """The forecast table as displayed, reused while the data version and filters stay the same"""
+    return stage_forecast(_kpis["by_stage"])
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def breakdown_table(version, filter_key, _cube, _filters):
+    return rep_stage_forecast(forecast_breakdown(_cube, **_filters))
+
 st.subheader("💰 Weighted Forecast by Stage")
-forecast = opps.groupby("stage")["weighted_amount"].sum().reset_index()
-forecast.columns = ["Stage", "Weighted Pipeline ($)"]
-forecast["Weighted Pipeline ($)"] = forecast["Weighted Pipeline ($)"].apply(lambda x: f"${x:,.0f}")
-table_html = forecast.to_html(index=False, justify="right", escape=False)
-table_html = table_html.replace(
-    '<th>Weighted Pipeline ($)</th>',
-    '<th style="text-align:right">Weighted Pipeline ($)</th>'
-).replace(
-    '<td>', '<td style="text-align:right">'
-).replace(
-    '<td style="text-align:right">' + forecast["Stage"].iloc[0],
-    '<td style="text-align:left">' + forecast["Stage"].iloc[0]
-)
-st.markdown(table_html, unsafe_allow_html=True)
+render_table(forecast_tables(kpis_version, filter_key, kpis), "forecast", currency=["Weighted Pipeline ($)"])
+if not OUT_OF_CORE and st.toggle("Break down by rep and month"):
+    breakdown = breakdown_table(dashboard.version, filter_key, dashboard_cube(dashboard, dashboard.version), filters)
+    render_table(breakdown, "forecast_breakdown", currency=["Pipeline ($)", "Weighted Pipeline ($)"])
 
 # Insights
 st.markdown("---")
 st.header("🧠 Strategic Insights")
-st.markdown(f"**🏆 Top Performer:** Sarah Chen leads in total pipeline.")
-st.markdown(f"**🌱 Most Common Lead Source:** Organic Search")
-st.markdown(f"**🎯 Best-Converting Source:** Trade Show — highest opportunity conversion.")
-st.markdown(f"**🐢 Longest Stage Delay:** Discovery takes the longest on average.")
-
-if pd.isna(nan) or True:
-    st.warning("📉 No new opportunities created in the past 30 days — pipeline may be aging.")
-elif nan < 10000:
+if kpis["top_rep"] is not None:
+    st.markdown(f"**🏆 Top Performer:** {kpis['top_rep']} leads in total pipeline.")
+if kpis["top_source"] is not None:
+    st.markdown(f"**🌱 Most Common Lead Source:** {kpis['top_source']}")
+if kpis["best_converting_source"] is not None:
+    st.markdown(f"**🎯 Best-Converting Source:** {kpis['best_converting_source']} — highest opportunity conversion.")
+if kpis["slowest_stage"] is not None:
+    st.markdown(f"**🐢 Longest Stage Delay:** {kpis['slowest_stage']} takes the longest on average.")
+
+recent_avg = kpis["recent"]["avg_amount"]
+if recent_avg is None:
+    st.warning(f"📉 No new opportunities created in the past {RECENT_DAYS} days — pipeline may be aging.")
+elif recent_avg < LOW_RECENT_AVG:
     st.info(f"📉 New opportunities created, but average value is low (${recent_avg:,.0f}).")
 else:
     st.success(f"📈 Healthy recent pipeline activity — average value: ${recent_avg:,.0f}")
+
+with st.expander("🛠 Chart payloads"):
+    payloads = pd.DataFrame([(name, *spec_payload(spec)) for name, spec in charts.items()],
+                            columns=["Chart", "Rows embedded", "Spec size (bytes)"])
+    st.dataframe(payloads, hide_index=True)
+    st.caption(f"Total sent to the browser for charts: {payloads['Spec size (bytes)'].sum() / 1024:,.1f} KB")
@@ -0,0 +1,226 @@
+"""Generate onboarding plans for a whole hiring cohort without the Streamlit UI.
+
+Usage:
+    python batch_generate.py hires.csv --output-dir plans/ --workers 4 --rpm 60 --tpm 80000
+
+Each input row carries the same fields as the app's demo scenarios
+(company_name, role, seniority, function, company_size, company_stage,
+team_size, is_customer_facing, manager_priorities, known_constraints) plus an
+optional `id`. Finished plans are appended to results.jsonl and written to
+<id>.md as soon as they complete; rerunning the same command skips every row
+already recorded as "ok", so a crashed run resumes where it stopped. Repeated
+rows are generated once; an id reused for a different hire is rejected.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+
+from plan_parser import parse_plan
+from plan_phases import generate_plan_by_phase
+from plan_prompts import build_system_prompt, build_user_prompt
+from plan_quality import analyze_plan_quality, plan_validation_error
+from plan_repair import find_plan_defects, repair_plan
+from plan_tokens import completion_budget
+from rate_limiter import RateLimiter, rate_limited_client
+
+CONTEXT_FIELDS = ["company_name", "role", "seniority", "function", "company_size", "company_stage",
+                  "team_size", "is_customer_facing", "manager_priorities", "known_constraints"]
+
+CONTEXT_DEFAULTS = {
+    "company_name": "",
+    "seniority": "Individual Contributor",
+    "function": "Other",
+    "company_size": "26–100",
+    "company_stage": "Series A",
+    "team_size": 5,
+    "is_customer_facing": True,
+    "known_constraints": "",
+}
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def normalize_context(row):
+    """Fill defaults and coerce CSV strings into the types the prompts expect"""
+    ctx = {field: row.get(field) for field in CONTEXT_FIELDS}
+    for field, default in CONTEXT_DEFAULTS.items():
+        if ctx[field] in (None, ""):
+            ctx[field] = default
+    if not ctx["role"] or not ctx["manager_priorities"]:
+        raise ValueError("role and manager_priorities are required")
+    ctx["team_size"] = int(ctx["team_size"])
+    ctx["is_customer_facing"] = _parse_bool(ctx["is_customer_facing"])
+    return ctx
+
+
+def row_id(row, ctx):
+    if row.get("id"):
+        return str(row["id"])
+    digest = hashlib.sha256(json.dumps(ctx, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return digest[:12]
+
+
+def read_rows(path):
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def completed_ids(results_path):
+    """Ids already finished successfully in a previous run"""
+    done = set()
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from a crash mid-write
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+class ResultWriter:
+    """Appends one JSON line per finished row and writes the plan markdown next to it"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.results_path = os.path.join(output_dir, "results.jsonl")
+        self._lock = threading.Lock()
+
+    def write(self, record, plan_text=None):
+        with self._lock:
+            if plan_text:
+                with open(os.path.join(self.output_dir, f"{record['id']}.md"), "w", encoding="utf-8") as f:
+                    f.write(plan_text)
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def generate_one(client, ctx, args):
+    """Run one plan through the same generation, repair and validation steps as the app"""
+    started = time.perf_counter()
+    messages = [
+        {"role": "system", "content": build_system_prompt()},
+        {"role": "user", "content": build_user_prompt(ctx)}
+    ]
+    # Same budget as the app: what the context window leaves after the prompt, capped by --max-tokens
+    max_tokens = completion_budget(messages, args.model, cap=args.max_tokens)
+    if args.mode == "phases":
+        output, _ = generate_plan_by_phase(client, ctx, args.model, args.temperature, max_tokens,
+                                           timeout=args.timeout)
+    else:
+        response = client.chat.completions.create(
+            model=args.model,
+            messages=messages,
+            temperature=args.temperature,
+            max_tokens=max_tokens,
+            timeout=args.timeout
+        )
+        output = response.choices[0].message.content or ""
+    if args.repair and find_plan_defects(output):
+        output, _ = repair_plan(client, ctx, output, args.model, args.temperature, timeout=args.timeout)
+
+    parsed = parse_plan(output)
+    metrics = analyze_plan_quality(parsed)
+    return output, {
+        "seconds": round(time.perf_counter() - started, 2),
+        "validation_error": plan_validation_error(parsed),
+        "quality_score": metrics.get("Quality Score"),
+        "metrics": {k: v for k, v in metrics.items() if k != "Quality Factors"},
+    }
+
+
+def run(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    writer = ResultWriter(args.output_dir)
+    done = completed_ids(writer.results_path)
+
+    pending = []
+    seen = {}
+    for index, row in enumerate(read_rows(args.input)):
+        try:
+            ctx = normalize_context(row)
+        except (TypeError, ValueError) as e:
+            writer.write({"id": str(row.get("id") or f"row-{index}"), "status": "error", "error": f"invalid row: {e}"})
+            continue
+        rid = row_id(row, ctx)
+        if rid in seen:
+            # An exact repeat is generated once; a reused id would make two plans overwrite one file
+            if seen[rid] != ctx:
+                writer.write({"id": rid, "status": "error", "context": ctx,
+                              "error": f"duplicate id: row {index} reuses the id of a different hire"})
+                print(f"✗ {rid}: duplicate id in row {index}", file=sys.stderr)
+            continue
+        seen[rid] = ctx
+        if rid not in done:
+            pending.append((rid, ctx))
+
+    print(f"{len(done)} rows already done, {len(pending)} to generate", file=sys.stderr)
+    limiter = RateLimiter(rpm=args.rpm, tpm=args.tpm)
+    client = rate_limited_client(openai.OpenAI(api_key=args.api_key, base_url=args.base_url), limiter)
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(generate_one, client, ctx, args): (rid, ctx) for rid, ctx in pending}
+        for future in as_completed(futures):
+            rid, ctx = futures[future]
+            try:
+                output, details = future.result()
+            except Exception as e:
+                failures += 1
+                writer.write({"id": rid, "status": "error", "error": f"{type(e).__name__}: {e}", "context": ctx})
+                print(f"✗ {rid}: {e}", file=sys.stderr)
+                continue
+            status = "ok" if details["validation_error"] is None else "invalid"
+            failures += status != "ok"
+            writer.write({"id": rid, "status": status, "context": ctx, **details}, output)
+            print(f"{'✓' if status == 'ok' else '⚠'} {rid} ({details['seconds']}s, {details['quality_score']})",
+                  file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate onboarding plans for a CSV/JSONL of hire contexts.")
+    parser.add_argument("input", help="CSV or JSONL file with one hire context per row")
+    parser.add_argument("--output-dir", default="batch_output")
+    parser.add_argument("--model", default="gpt-4", choices=["gpt-4", "gpt-3.5-turbo"])
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--max-tokens", type=int,
+                        help="Cap on completion tokens per plan (default: whatever the model's context window leaves)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--mode", choices=["single", "phases"], default="single",
+                        help="One request per plan, or the parallel per-phase engine")
+    parser.add_argument("--no-repair", dest="repair", action="store_false",
+                        help="Do not regenerate missing or malformed weeks")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=int, default=60, help="Requests per minute across all workers")
+    parser.add_argument("--tpm", type=int, default=80000, help="Tokens per minute across all workers")
+    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY"))
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"))
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error("set OPENAI_API_KEY or pass --api-key")
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Headless benchmark of the RevOps dashboard's load, preprocess and aggregation path.
+
+Generates seeded synthetic exports with benchmarks/crm_data.py (or uses a
+directory of real ones) and runs each loading strategy the dashboard has in
+a fresh interpreter, so peak RSS is that strategy's own:
+
+- pandas: read_crm_csv both exports, preprocess, compute_kpis
+- feather_cold: CrmTable's first sync, which also writes the Feather cache
+- feather_warm: CrmTable starting from that cache, as after a restart
+- incremental: IncrementalDashboard.refresh(), as app.py runs it, then an
+  unchanged refresh
+- cube: build_cube on the loaded frames and a filtered cube_kpis
+- stream: stream_kpis, the REVOPS_OUT_OF_CORE path
+
+Every strategy also builds the chart specs. Stage timings (wall and CPU),
+peak RSS (and the baseline after imports) and the total pipeline each
+strategy computed are printed (or written with --output) as JSON so runs
+can be diffed to catch regressions:
+
+    python benchmarks/bench_dashboard.py --leads 100k 1M --output dashboard.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+import pandas as pd  # noqa: E402
+
+from benchmarks.crm_data import generate_crm, parse_count, read_manifest  # noqa: E402
+from revops_charts import dashboard_charts  # noqa: E402
+from revops_cube import build_cube, cube_kpis, forecast_breakdown  # noqa: E402
+from revops_data import (LEAD_DATES, LEAD_DTYPES, OPPORTUNITY_DATES, OPPORTUNITY_DTYPES, CrmTable,  # noqa: E402
+                         preprocess_opportunities, read_crm_csv)
+from revops_ingest import IncrementalDashboard  # noqa: E402
+from revops_kpis import compute_kpis  # noqa: E402
+from revops_stream import CHUNK_BYTES, stream_kpis  # noqa: E402
+
+STRATEGIES = ["pandas", "feather_cold", "feather_warm", "incremental", "cube", "stream"]
+
+# Strategies that start from a Feather cache written beforehand, outside the measurement
+WARM_CACHE = {"feather_warm", "cube"}
+
+
+def peak_rss_mb(who="self"):
+    """Peak resident set size of this process (or of its finished children) so far"""
+    if who == "self" and os.path.exists("/proc/self/status"):
+        # Linux: ru_maxrss starts from the parent's peak after fork and exec, VmHWM starts from zero
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class Stages:
+    """Wall and CPU seconds of each named stage of one run"""
+
+    def __init__(self):
+        self.timings = {}
+
+    def run(self, name, fn, *args, **kwargs):
+        started, cpu = time.perf_counter(), time.process_time()
+        result = fn(*args, **kwargs)
+        self.timings[name] = {"wall": time.perf_counter() - started, "cpu": time.process_time() - cpu}
+        return result
+
+
+def _tables(data_dir, cache_dir):
+    return (CrmTable(os.path.join(data_dir, "leads.csv"), LEAD_DTYPES, LEAD_DATES, cache_dir=cache_dir),
+            CrmTable(os.path.join(data_dir, "opportunities.csv"), OPPORTUNITY_DTYPES, OPPORTUNITY_DATES,
+                     preprocess_opportunities, cache_dir=cache_dir))
+
+
+def _load_tables(stages, data_dir, cache_dir):
+    leads, opps = _tables(data_dir, cache_dir)
+    stages.run("load_leads", leads.sync)
+    stages.run("load_opportunities", opps.sync)
+    return stages.run("concat", lambda: (leads.frame, opps.frame))
+
+
+def warm_cache(data_dir, cache_dir):
+    """Write the Feather copies a restarted dashboard would find"""
+    for table in _tables(data_dir, cache_dir):
+        table.sync()
+
+
+def run_strategy(name, data_dir, cache_dir, chunk_bytes, workers):
+    """One strategy, start to finish, in this process; returns its timings and results"""
+    baseline = peak_rss_mb()
+    stages = Stages()
+    if name == "pandas":
+        leads = stages.run("load_leads", read_crm_csv, os.path.join(data_dir, "leads.csv"), LEAD_DTYPES, LEAD_DATES)
+        opps = stages.run("load_opportunities", read_crm_csv, os.path.join(data_dir, "opportunities.csv"),
+                          OPPORTUNITY_DTYPES, OPPORTUNITY_DATES)
+        opps = stages.run("preprocess", preprocess_opportunities, opps)
+        kpis = stages.run("kpis", compute_kpis, leads, opps)
+    elif name in ("feather_cold", "feather_warm"):
+        leads, opps = _load_tables(stages, data_dir, cache_dir)
+        kpis = stages.run("kpis", compute_kpis, leads, opps)
+    elif name == "incremental":
+        dashboard = IncrementalDashboard.from_csv(os.path.join(data_dir, "leads.csv"),
+                                                  os.path.join(data_dir, "opportunities.csv"), cache_dir=cache_dir)
+        stages.run("refresh", dashboard.refresh)
+        kpis = stages.run("kpis", dashboard.kpis)
+        stages.run("refresh_unchanged", dashboard.refresh)
+    elif name == "cube":
+        leads, opps = _load_tables(stages, data_dir, cache_dir)
+        cube = stages.run("build_cube", build_cube, leads, opps)
+        kpis = stages.run("kpis", cube_kpis, cube)
+        top_reps = list(kpis["by_rep"]["amount"].nlargest(3).index)
+        start = kpis["created_range"][1] - pd.Timedelta(days=90) if kpis["created_range"] else None
+        stages.run("filtered_kpis", cube_kpis, cube, start=start, reps=top_reps)
+        stages.run("forecast_breakdown", forecast_breakdown, cube, start=start)
+    elif name == "stream":
+        kpis = stages.run("stream", stream_kpis, os.path.join(data_dir, "leads.csv"),
+                          os.path.join(data_dir, "opportunities.csv"), chunk_bytes=chunk_bytes, workers=workers)
+    else:
+        raise ValueError(f"Unknown strategy: {name}")
+    stages.run("charts", dashboard_charts, kpis)
+
+    return {
+        "stages": stages.timings,
+        "total_seconds": sum(timing["wall"] for timing in stages.timings.values()),
+        "peak_rss_mb": peak_rss_mb(),
+        "baseline_rss_mb": baseline,
+        "children_peak_rss_mb": peak_rss_mb("children") if name == "stream" and workers > 1 else None,
+        "rows": {"leads": kpis["leads"], "opportunities": kpis["opportunities"]},
+        "total_pipeline": kpis["total_pipeline"],
+    }
+
+
+def run_isolated(name, data_dir, cache_dir, chunk_bytes, workers):
+    """run_strategy in a fresh interpreter, so imports are cold and peak RSS is this strategy's alone"""
+    command = [sys.executable, os.path.abspath(__file__), "--run", name, "--data", data_dir, "--cache-dir", cache_dir,
+               "--chunk-bytes", str(chunk_bytes), "--stream-workers", str(workers)]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    return json.loads(result.stdout)
+
+
+def bench_dataset(data_dir, strategies, repeat, chunk_bytes, workers):
+    results = {}
+    for name in strategies:
+        runs = []
+        for _ in range(repeat):
+            cache_dir = tempfile.mkdtemp(prefix="bench-dashboard-cache-")
+            try:
+                if name in WARM_CACHE:
+                    warm_cache(data_dir, cache_dir)
+                runs.append(run_isolated(name, data_dir, cache_dir, chunk_bytes, workers))
+            finally:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+        failed = next((run for run in runs if "error" in run), None)
+        if failed:
+            results[name] = failed
+            continue
+        # The fastest run is the least disturbed by the rest of the machine
+        results[name] = min(runs, key=lambda run: run["total_seconds"])
+        results[name]["runs"] = len(runs)
+
+    totals = {name: run["total_pipeline"] for name, run in results.items() if "error" not in run}
+    reference = next(iter(totals.values()), None)
+    results["pipeline_mismatch"] = sorted(name for name, total in totals.items()
+                                          if abs(total - reference) > 1e-6 * max(1.0, abs(reference)))
+    return results
+
+
+def prepare_dataset(work_dir, leads, args):
+    """Synthetic exports for `leads` leads in work_dir, reused when an earlier run wrote the same ones"""
+    data_dir = os.path.join(work_dir, f"crm-{leads}-seed{args.seed}")
+    manifest = read_manifest(data_dir)
+    config = manifest["config"] if manifest else {}
+    if (config.get("leads"), config.get("opportunities_per_lead"), config.get("dirty_rate")) != (
+            leads, args.opportunities_per_lead, args.dirty_rate):
+        manifest = generate_crm(data_dir, leads, args.opportunities_per_lead, seed=args.seed,
+                                dirty_rate=args.dirty_rate)
+    return data_dir, manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the RevOps dashboard's data path on synthetic exports.")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--leads", type=parse_count, nargs="+", default=[parse_count("100k"), parse_count("1M")],
+                        help="Dataset sizes in leads, e.g. 10k 1M 50M")
+    parser.add_argument("--opportunities-per-lead", type=float, default=0.5)
+    parser.add_argument("--dirty-rate", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", help="Benchmark the exports in this directory instead of generating them")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "bench-dashboard"),
+                        help="Where generated exports are kept between runs")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--chunk-bytes", type=int, default=CHUNK_BYTES, help="stream_kpis chunk size")
+    parser.add_argument("--stream-workers", type=int, default=0, help="stream_kpis process pool size")
+    parser.add_argument("--run", choices=STRATEGIES, help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run:
+        # Child process of run_isolated
+        print(json.dumps(run_strategy(args.run, args.data, args.cache_dir, args.chunk_bytes, args.stream_workers)))
+        return
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "cpus": os.cpu_count(),
+            "config": vars(args),
+        },
+        "datasets": {},
+    }
+    if args.data:
+        datasets = [(args.data, read_manifest(args.data))]
+    else:
+        datasets = [prepare_dataset(args.work_dir, leads, args) for leads in args.leads]
+    for data_dir, manifest in datasets:
+        results["datasets"][data_dir] = {
+            "files_mb": {name: os.path.getsize(os.path.join(data_dir, f"{name}.csv")) / 1e6
+                         for name in ("leads", "opportunities")},
+            "generated": manifest,
+            "strategies": bench_dataset(data_dir, args.strategies, args.repeat, args.chunk_bytes,
+                                        args.stream_workers),
+        }
+
+    payload = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Offline benchmark of the plan generator's own overhead.
+
+Starts the mock OpenAI server, points the real `openai.OpenAI` client at it
+and measures:
+
+- prompt assembly time
+- CPU time of parsing, validation and analyze_plan_quality on synthetic plans
+  from 1k to 50k words
+- end-to-end generation latency (plain and streaming) against a server with
+  known latency, so everything above that latency is our own overhead
+- throughput and latency percentiles under concurrent sessions
+- a full Streamlit script run through AppTest, when streamlit is installed
+
+Results are printed (or written with --output) as JSON so runs can be diffed
+to catch regressions:
+
+    python benchmarks/bench_plan_generator.py --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import openai  # noqa: E402
+
+from benchmarks.mock_openai_server import MockOpenAIServer, synthetic_plan  # noqa: E402
+from plan_metrics import percentiles  # noqa: E402
+from plan_parser import parse_plan  # noqa: E402
+from plan_prompts import build_system_prompt, build_user_prompt  # noqa: E402
+from plan_quality import analyze_plan_quality, mentions_tools, plan_validation_error  # noqa: E402
+from plan_repair import find_plan_defects, repair_plan  # noqa: E402
+from plan_streaming import consume_plan_stream  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app (2).py")
+
+BENCH_CONTEXT = {
+    "company_name": "TechFlow",
+    "role": "Senior Customer Success Manager",
+    "seniority": "Manager",
+    "function": "Customer Success",
+    "company_size": "26–100",
+    "company_stage": "Series A",
+    "team_size": 8,
+    "is_customer_facing": True,
+    "manager_priorities": "Scale customer onboarding process, reduce time-to-value, establish success metrics",
+    "known_constraints": "Growing fast, limited documentation, remote-first culture"
+}
+
+
+def _cpu_time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        fn()
+        samples.append(time.process_time() - started)
+    return percentiles(samples)
+
+
+def bench_prompt_assembly(repeat):
+    def build():
+        build_system_prompt()
+        build_user_prompt(BENCH_CONTEXT)
+    return _cpu_time(build, repeat)
+
+
+def validation_block(plan_text):
+    """The checks the app runs on every output before showing it"""
+    plan = parse_plan(plan_text)
+    find_plan_defects(plan)
+    plan_validation_error(plan)
+    mentions_tools(plan)
+    return plan
+
+
+def bench_analysis(word_counts, repeat):
+    results = {}
+    for words in word_counts:
+        text = synthetic_plan(words)
+        results[str(words)] = {
+            "actual_words": len(text.split()),
+            "parse_plan": _cpu_time(lambda: parse_plan(text), repeat),
+            "validation_block": _cpu_time(lambda: validation_block(text), repeat),
+            "analyze_plan_quality": _cpu_time(lambda: analyze_plan_quality(text), repeat),
+        }
+    return results
+
+
+def generate_once(client, stream=False, max_tokens=8000):
+    """One plan through the app's path: prompts, completion, repair, validation and scoring"""
+    started = time.perf_counter()
+    messages = [
+        {"role": "system", "content": build_system_prompt()},
+        {"role": "user", "content": build_user_prompt(BENCH_CONTEXT)}
+    ]
+    time_to_first_week = None
+    if stream:
+        response = client.chat.completions.create(model="gpt-4", messages=messages, temperature=0.7,
+                                                  max_tokens=max_tokens, timeout=60, stream=True)
+        monitor = consume_plan_stream(response)
+        output = monitor.text
+        time_to_first_week = monitor.time_to_first_week
+    else:
+        response = client.chat.completions.create(model="gpt-4", messages=messages, temperature=0.7,
+                                                  max_tokens=max_tokens, timeout=60)
+        output = response.choices[0].message.content
+    completed = time.perf_counter()
+
+    if find_plan_defects(output):
+        output, _ = repair_plan(client, BENCH_CONTEXT, output, "gpt-4", 0.7)
+    plan = validation_block(output)
+    analyze_plan_quality(plan)
+    finished = time.perf_counter()
+    return {
+        "total": finished - started,
+        "api": completed - started,
+        "post_processing": finished - completed,
+        "time_to_first_week": time_to_first_week,
+        "valid": plan_validation_error(plan) is None,
+    }
+
+
+def bench_end_to_end(client, server, repeat, stream):
+    runs, errors = [], 0
+    for _ in range(repeat):
+        try:
+            runs.append(generate_once(client, stream=stream))
+        except openai.OpenAIError:
+            errors += 1
+    result = {
+        "server_latency": server.config.latency,
+        "errors": errors,
+        "valid_rate": sum(r["valid"] for r in runs) / len(runs) if runs else 0.0,
+    }
+    for key in ("total", "api", "post_processing", "time_to_first_week"):
+        result[key] = percentiles([r[key] for r in runs if r[key] is not None])
+    return result
+
+
+def bench_concurrency(client, sessions_list, plans_per_session):
+    results = {}
+    for sessions in sessions_list:
+        latencies, errors = [], 0
+        lock = threading.Lock()
+
+        def session():
+            nonlocal errors
+            for _ in range(plans_per_session):
+                try:
+                    run = generate_once(client)
+                except openai.OpenAIError:
+                    with lock:
+                        errors += 1
+                    continue
+                with lock:
+                    latencies.append(run["total"])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            for _ in range(sessions):
+                pool.submit(session)
+        elapsed = time.perf_counter() - started
+        results[str(sessions)] = {
+            "plans": len(latencies),
+            "errors": errors,
+            "wall_seconds": elapsed,
+            "plans_per_second": len(latencies) / elapsed if elapsed else 0.0,
+            "latency": percentiles(latencies),
+        }
+    return results
+
+
+def _plan_shown(app):
+    return any("Your AI-Generated" in str(block.value) for block in app.markdown)
+
+
+def bench_app_script(server, repeat):
+    """Full Streamlit script runs (prompt assembly, validation and rendering) via AppTest"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return {"skipped": "streamlit is not installed"}
+
+    os.environ["OPENAI_API_KEY"] = "mock"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    samples = []
+    for _ in range(repeat):
+        app = AppTest.from_file(APP_PATH, default_timeout=120)
+        app.run()
+        submit = next(button for button in app.button if "Generate Plan" in str(button.label))
+        # Each run bypasses the plan cache so the generation path is measured every time
+        next(box for box in app.checkbox if "Bypass cache" in str(box.label)).check()
+        submit.click()
+        started = time.perf_counter()
+        app.run()
+        # Generation runs as a background job: rerun, as the progress fragment would, until it has finished
+        while not app.exception and not app.error and not _plan_shown(app):
+            if time.perf_counter() - started > 120:
+                return {"error": "timed out waiting for the plan"}
+            time.sleep(0.05)
+            app.run()
+        samples.append(time.perf_counter() - started)
+        if app.exception:
+            return {"error": str(app.exception[0].value)}
+        if app.error:
+            return {"error": str(app.error[0].value)}
+    return {"server_latency": server.config.latency, "submit_to_plan": percentiles(samples)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the onboarding plan generator against a mock OpenAI server.")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock server latency before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="Mock server token rate (0 = instant)")
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--words", type=int, nargs="+", default=[1000, 5000, 10000, 25000, 50000])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--plans-per-session", type=int, default=3)
+    parser.add_argument("--skip-app", action="store_true", help="Skip the Streamlit AppTest stage")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "openai": getattr(openai, "__version__", None),
+            "config": vars(args),
+        },
+        "prompt_assembly": bench_prompt_assembly(args.repeat * 10),
+        "analysis": bench_analysis(args.words, args.repeat),
+    }
+
+    with MockOpenAIServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                          truncate_rate=args.truncate_rate, error_rate=args.error_rate) as server:
+        client = openai.OpenAI(api_key="mock", base_url=server.base_url, max_retries=0)
+        results["end_to_end"] = bench_end_to_end(client, server, args.repeat, stream=False)
+        results["end_to_end_streaming"] = bench_end_to_end(client, server, args.repeat, stream=True)
+        results["concurrency"] = bench_concurrency(client, args.sessions, args.plans_per_session)
+        results["app_script"] = {"skipped": "--skip-app"} if args.skip_app else bench_app_script(server, args.repeat)
+        results["mock_requests"] = server.config.requests
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Deterministic synthetic CRM exports for the RevOps dashboard.
+
+Writes `leads.csv` and `opportunities.csv` in the layout `app.py` reads from
+`data/`, with distributions shaped like a real CRM:
+
+- a few reps own most of the book (Zipf-like rep sizes)
+- lead sources differ in volume, lead score, conversion and deal size
+- lead volume grows over the date range and dips at weekends
+- opportunities move down a stage funnel as they age, with stage-driven
+  probabilities, lognormal amounts and days in stage
+- a small share of dirty values (blank, "N/A", "$12,500", impossible dates)
+  so the `errors="coerce"` paths in revops_data are exercised
+
+Rows are generated and written in blocks, so memory stays flat from 10k to
+50M leads, and each block has its own seed: the same arguments always give
+byte-identical files.
+
+    python benchmarks/crm_data.py --leads 1M --out data
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Leads generated per block; part of each block's seed, so changing it changes the output
+BLOCK_ROWS = 250_000
+
+# Written next to the CSVs so a benchmark can tell whether they match the arguments it wants
+MANIFEST = "crm_data.json"
+
+# share of leads, mean lead score, relative conversion, relative deal size
+SOURCES = {
+    "Website": (0.27, 52, 1.0, 0.9),
+    "Paid Search": (0.18, 45, 0.7, 0.8),
+    "LinkedIn": (0.14, 50, 0.9, 1.0),
+    "Outbound": (0.13, 40, 0.5, 1.1),
+    "Referral": (0.11, 68, 1.8, 1.3),
+    "Webinar": (0.10, 58, 1.2, 0.9),
+    "Partner": (0.07, 63, 1.5, 1.6),
+}
+
+OPEN_STAGES = {"Prospecting": 10, "Qualification": 25, "Proposal": 50, "Negotiation": 75}
+STAGE_SHARES = [0.38, 0.27, 0.20, 0.15]
+STAGE_DAYS = [8, 12, 16, 20]  # mean days in each open stage
+WIN_RATE = 0.3
+CLOSE_DAYS = 90  # half the opportunities older than this have closed
+
+LEAD_STATUSES = ["New", "Contacted", "Qualified", "Unqualified"]
+STATUS_SHARES = [0.25, 0.35, 0.15, 0.25]
+
+FIRST_NAMES = ["Sarah", "Marcus", "Priya", "Diego", "Aisha", "Tom", "Mei", "Jonas", "Fatima", "Liam", "Ana", "Kofi",
+               "Elena", "Raj", "Hannah", "Yusuf", "Grace", "Mateo", "Nora", "Sven"]
+LAST_NAMES = ["Chen", "Lee", "Patel", "Garcia", "Khan", "Murphy", "Wang", "Berg", "Okafor", "Rossi", "Silva",
+              "Novak", "Kim", "Haddad", "Schmidt", "Dubois", "Tanaka", "Owusu", "Costa", "Ivanova"]
+
+# Values a hand-edited or badly exported CRM file really contains
+DIRTY_NUMBERS = ["", "N/A", "n/a", "TBD", "-", "$12,500", "1.2.3"]
+DIRTY_DATES = ["", "N/A", "not a date", "2024-02-30", "13/45/2024"]
+
+SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_count(text):
+    """Row count from "10000", "10k" or "50M" """
+    text = str(text).strip().lower().replace("_", "")
+    if text and text[-1] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def rep_names(count):
+    """`count` distinct rep names, the same for every run"""
+    # Each pass over the first names shifts the last names by one, so neighbours never share a surname
+    names = [f"{first} {LAST_NAMES[(index + shift) % len(LAST_NAMES)]}"
+             for shift in range(len(LAST_NAMES)) for index, first in enumerate(FIRST_NAMES)]
+    names += [f"{name} {number}" for number in range(2, count // len(names) + 2) for name in names]
+    return names[:count]
+
+
+def default_reps(leads):
+    """Team size that grows with the book: ~10 reps at 10k leads, ~700 at 50M"""
+    return max(8, int(leads ** 0.5 / 10))
+
+
+def _rep_weights(count):
+    weights = 1 / np.arange(1, count + 1) ** 1.1
+    return weights / weights.sum()
+
+
+def _ids(prefix, start, count):
+    return prefix + pd.Series(np.arange(start, start + count)).astype(str)
+
+
+def _dates(days):
+    return pd.Series(days.astype("datetime64[D]")).dt.strftime("%Y-%m-%d")
+
+
+def _dirty(rng, values, rate, junk):
+    """`values` with roughly `rate` of them replaced by entries of `junk`"""
+    if rate <= 0:
+        return values
+    hit = np.flatnonzero(rng.random(len(values)) < rate)
+    if not len(hit):
+        return values
+    values = pd.Series(values).astype(object)
+    values.iloc[hit] = rng.choice(junk, len(hit))
+    return values
+
+
+def _lead_block(rng, first_id, count, reps, weights, start_day, days):
+    names = list(SOURCES)
+    shares = np.array([SOURCES[name][0] for name in names])
+    source = rng.choice(len(names), count, p=shares / shares.sum())
+    # Volume grows over the range (density ~ t^0.5) and most weekend leads land on Monday
+    created = start_day + (days * rng.random(count) ** (1 / 1.5)).astype("int64")
+    weekday = (created + 3) % 7  # 1970-01-01 was a Thursday
+    weekend = (weekday >= 5) & (rng.random(count) < 0.7)
+    created = np.where(weekend, created + 7 - weekday, created).clip(max=start_day + days - 1)
+    score = rng.normal(np.array([SOURCES[name][1] for name in names])[source], 15).clip(0, 100).round()
+    rep = rng.choice(len(reps), count, p=weights)
+    status = rng.choice(len(LEAD_STATUSES), count, p=STATUS_SHARES)
+    return {"lead_id": _ids("L", first_id, count).to_numpy(), "created": created, "source": source, "score": score,
+            "rep": rep, "status": status}
+
+
+def _opportunity_block(rng, leads, first_id, per_lead, reps, weights, end_day, dirty_rate):
+    names = list(SOURCES)
+    conversion = np.array([SOURCES[name][2] for name in names])
+    shares = np.array([SOURCES[name][0] for name in names])
+    conversion = conversion / (conversion * shares / shares.sum()).sum()
+    counts = rng.poisson(per_lead * conversion[leads["source"]])
+    parent = np.repeat(np.arange(len(counts)), counts)
+    count = len(parent)
+
+    created = (leads["created"][parent] + rng.gamma(2.0, 7.0, count).astype("int64")).clip(max=end_day)
+    age = end_day - created
+    closed = rng.random(count) < 1 - 0.5 ** (age / CLOSE_DAYS)
+    won = closed & (rng.random(count) < WIN_RATE)
+    open_stage = rng.choice(len(OPEN_STAGES), count, p=STAGE_SHARES)
+    stage_names = np.array(list(OPEN_STAGES) + ["Closed Won", "Closed Lost"], dtype=object)
+    stage = np.where(won, 4, np.where(closed, 5, open_stage))
+
+    default_probability = np.array(list(OPEN_STAGES.values()) + [100, 0])[stage]
+    probability = np.where(closed, default_probability,
+                           (default_probability + rng.normal(0, 8, count)).clip(1, 99).round())
+    deal_size = np.array([SOURCES[name][3] for name in names])[leads["source"][parent]]
+    amount = (rng.lognormal(10.2, 0.9, count) * deal_size).round(-1)
+    stage_days = np.array(STAGE_DAYS + [0, 0])[stage]
+    days_in_stage = np.where(closed, 0, np.minimum(rng.exponential(1, count) * stage_days, age)).round()
+    close = np.where(closed, created + (age * rng.random(count)).astype("int64"), end_day)
+
+    # Most opportunities stay with the lead's rep; some are handed over
+    rep = np.where(rng.random(count) < 0.9, leads["rep"][parent], rng.choice(len(reps), count, p=weights))
+    lead_id = _dirty(rng, leads["lead_id"][parent], dirty_rate, ["", "L-unknown"])
+    close_date = _dates(close).where(closed, "")
+    return pd.DataFrame({
+        "opportunity_id": _ids("O", first_id, count),
+        "lead_id": lead_id,
+        "assigned_rep": _dirty(rng, np.asarray(reps, dtype=object)[rep], dirty_rate, [""]),
+        "stage": stage_names[stage],
+        "amount": _dirty(rng, amount.astype("int64"), dirty_rate, DIRTY_NUMBERS),
+        "probability": _dirty(rng, probability.astype("int64"), dirty_rate, DIRTY_NUMBERS),
+        "created_date": _dirty(rng, _dates(created), dirty_rate, DIRTY_DATES),
+        "close_date": _dirty(rng, close_date, dirty_rate, DIRTY_DATES),
+        "days_in_stage": _dirty(rng, days_in_stage.astype("int64"), dirty_rate, DIRTY_NUMBERS),
+    }), counts
+
+
+def generate_crm(out_dir, leads, opportunities_per_lead=0.5, seed=0, dirty_rate=0.001, reps=None, days=730,
+                 end="2025-06-30", progress=None):
+    """Write leads.csv and opportunities.csv for `leads` leads into `out_dir`.
+
+    Each lead turns into Poisson(opportunities_per_lead) opportunities on
+    average, more for the better-converting sources; leads with at least one
+    are marked Converted. Created dates span the `days` days up to `end`.
+    `progress(leads_written)` is called after every block. Returns the
+    manifest, which is also saved as crm_data.json next to the files.
+    """
+    started = time.perf_counter()
+    reps = rep_names(reps or default_reps(leads))
+    weights = _rep_weights(len(reps))
+    end_day = int(np.datetime64(end, "D").astype("int64"))
+    start_day = end_day - days + 1
+    source_names = np.array(list(SOURCES), dtype=object)
+    status_names = np.array(LEAD_STATUSES + ["Converted"], dtype=object)
+
+    os.makedirs(out_dir, exist_ok=True)
+    leads_path = os.path.join(out_dir, "leads.csv")
+    opportunities_path = os.path.join(out_dir, "opportunities.csv")
+    written = {"leads": 0, "opportunities": 0}
+    with open(leads_path, "w", encoding="utf-8", newline="") as leads_file, \
+            open(opportunities_path, "w", encoding="utf-8", newline="") as opportunities_file:
+        for block, first in enumerate(range(0, leads, BLOCK_ROWS)):
+            rng = np.random.default_rng([seed, block])
+            count = min(BLOCK_ROWS, leads - first)
+            lead_rows = _lead_block(rng, first, count, reps, weights, start_day, days)
+            opportunities, per_lead = _opportunity_block(rng, lead_rows, written["opportunities"],
+                                                         opportunities_per_lead, reps, weights, end_day, dirty_rate)
+            status = np.where(per_lead > 0, len(LEAD_STATUSES), lead_rows["status"])
+            source = source_names[lead_rows["source"]]
+            frame = pd.DataFrame({
+                "lead_id": lead_rows["lead_id"],
+                "created_date": _dirty(rng, _dates(lead_rows["created"]), dirty_rate, DIRTY_DATES),
+                "source": _dirty(rng, source, dirty_rate, [""]),
+                "status": status_names[status],
+                "lead_score": _dirty(rng, lead_rows["score"].astype("int64"), dirty_rate, DIRTY_NUMBERS + ["high"]),
+                "assigned_rep": np.asarray(reps, dtype=object)[lead_rows["rep"]],
+            })
+            frame.to_csv(leads_file, header=block == 0, index=False)
+            opportunities.to_csv(opportunities_file, header=block == 0, index=False)
+            written["leads"] += count
+            written["opportunities"] += len(opportunities)
+            if progress:
+                progress(written["leads"])
+
+    manifest = {
+        "config": {"leads": leads, "opportunities_per_lead": opportunities_per_lead, "seed": seed,
+                   "dirty_rate": dirty_rate, "reps": len(reps), "days": days, "end": end, "block_rows": BLOCK_ROWS},
+        "rows": written,
+        "bytes": {"leads": os.path.getsize(leads_path), "opportunities": os.path.getsize(opportunities_path)},
+        "seconds": time.perf_counter() - started,
+    }
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(out_dir):
+    """The manifest of the files in `out_dir`, or None if they were not written by generate_crm"""
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write deterministic synthetic CRM exports for the RevOps dashboard.")
+    parser.add_argument("--leads", type=parse_count, default=parse_count("100k"), help="Lead rows, e.g. 10k or 50M")
+    parser.add_argument("--opportunities-per-lead", type=float, default=0.5)
+    parser.add_argument("--out", default="data", help="Directory for leads.csv and opportunities.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dirty-rate", type=float, default=0.001, help="Share of values that are malformed")
+    parser.add_argument("--reps", type=int, help="Number of sales reps (default grows with --leads)")
+    parser.add_argument("--days", type=int, default=730, help="Days of history")
+    parser.add_argument("--end", default="2025-06-30", help="Last created date")
+    args = parser.parse_args(argv)
+
+    def progress(done):
+        print(f"\r{done:,} / {args.leads:,} leads", end="", file=sys.stderr, flush=True)
+
+    manifest = generate_crm(args.out, args.leads, args.opportunities_per_lead, args.seed, args.dirty_rate,
+                            args.reps, args.days, args.end, progress=progress)
+    print(file=sys.stderr)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Serves POST /v1/chat/completions (plain and streaming) with synthetic
+onboarding plans, so generation can be exercised and benchmarked without
+spending API money. Point a client at it with
+`openai.OpenAI(api_key="mock", base_url=server.base_url)` or by setting
+OPENAI_BASE_URL.
+
+    python benchmarks/mock_openai_server.py --port 8765 --latency 0.5 --tokens-per-second 400
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+
+FILLER = ("Partner with the team lead to review Salesforce dashboards and document the findings "
+          "so the onboarding cohort can reuse them in later weeks").split()
+
+
+def synthetic_plan(words=3000, weeks=12, seed=0):
+    """A well-formed plan of roughly `words` words in the app's exact week format"""
+    rng = random.Random(seed)
+    per_week = max(40, words // (weeks + 1))
+
+    def filler(n):
+        return " ".join(rng.choice(FILLER) for _ in range(n))
+
+    parts = [f"# Executive Summary\n\nThis overview sets out the onboarding philosophy. {filler(per_week)}"]
+    for week in range(1, weeks + 1):
+        if (week - 1) % 4 == 0:
+            number = (week - 1) // 4 + 1
+            parts.append(f"# Phase {number}: {['Foundation', 'Application', 'Ownership'][min(number, 3) - 1]}")
+        chunk = max(5, per_week // 8)
+        parts.append(
+            f"## Week {week}: Theme {week}\n"
+            f"📚 **Learning Objectives**\n- {filler(chunk)}\n- {filler(chunk)}\n\n"
+            f"✅ **Milestone Checklist**\n- [ ] {filler(chunk)}\n- [ ] {filler(chunk)}\n- [ ] {filler(chunk)}\n\n"
+            f"🚩 **Red Flag**\n{filler(chunk)}\n\n"
+            f"🧭 **Manager Coaching Notes**\n{filler(chunk)}"
+        )
+    return "\n\n".join(parts)
+
+
+PHASE_REQUEST_RE = re.compile(r"Write ONLY Phase \d+: \w+ \(Weeks (\d+)-(\d+)\)")
+REPAIR_REQUEST_RE = re.compile(r"Weeks to write: ([\d, ]+)")
+
+
+def _requested_weeks(prompt):
+    """Weeks a phase or repair prompt asks for, so partial requests get partial plans"""
+    match = PHASE_REQUEST_RE.search(prompt)
+    if match:
+        return list(range(int(match.group(1)), int(match.group(2)) + 1))
+    match = REPAIR_REQUEST_RE.search(prompt)
+    if match:
+        return [int(n) for n in match.group(1).split(",")]
+    return None
+
+
+class MockConfig:
+    """Behaviour knobs, adjustable while the server is running"""
+
+    def __init__(self, latency=0.2, tokens_per_second=0, plan_words=2500, truncate_rate=0.0,
+                 error_rate=0.0, error_status=429, seed=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.plan_words = plan_words
+        self.truncate_rate = truncate_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def roll(self, rate):
+        with self.lock:
+            return self.rng.random() < rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        config = self.config
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with config.lock:
+            config.requests += 1
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        if config.roll(config.error_rate):
+            kind = "rate_limit_exceeded" if config.error_status == 429 else "server_error"
+            self._send_json(config.error_status, {"error": {"message": "injected error", "type": kind, "code": kind}},
+                            headers={"retry-after-ms": "200"})
+            return
+
+        messages = request.get("messages", [])
+        prompt = "\n".join(m.get("content") or "" for m in messages)
+        weeks = _requested_weeks(messages[-1].get("content", "") if messages else "")
+        if "ONLY the Executive Summary" in prompt:
+            content = synthetic_plan(config.plan_words // 12, weeks=0)
+        else:
+            content = synthetic_plan(config.plan_words, seed=config.requests)
+            if weeks:
+                sections = re.split(r"(?=^## Week )", content, flags=re.MULTILINE)
+                content = "".join(s for s in sections
+                                  if s.startswith("## Week ") and int(s.split()[2].rstrip(":")) in weeks)
+
+        finish_reason = "stop"
+        max_chars = (request.get("max_tokens") or 10 ** 9) * CHARS_PER_TOKEN
+        if len(content) > max_chars:
+            content, finish_reason = content[:max_chars], "length"
+        elif config.roll(config.truncate_rate):
+            content, finish_reason = content[:len(content) // 2], "length"
+
+        usage = {
+            "prompt_tokens": len(prompt) // CHARS_PER_TOKEN,
+            "completion_tokens": len(content) // CHARS_PER_TOKEN,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = request.get("model", "gpt-4")
+
+        time.sleep(config.latency)
+        if request.get("stream"):
+            self._stream(content, finish_reason, usage, completion_id, created, model, request)
+            return
+
+        if config.tokens_per_second:
+            time.sleep(usage["completion_tokens"] / config.tokens_per_second)
+        self._send_json(200, {
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": finish_reason}],
+            "usage": usage,
+        })
+
+    def _stream(self, content, finish_reason, usage, completion_id, created, model, request):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish=None, chunk_usage=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            if chunk_usage is not None:
+                chunk["choices"], chunk["usage"] = [], chunk_usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk_chars = 4 * CHARS_PER_TOKEN
+        delay = chunk_chars / CHARS_PER_TOKEN / self.config.tokens_per_second if self.config.tokens_per_second else 0
+        try:
+            event({"role": "assistant", "content": ""})
+            for i in range(0, len(content), chunk_chars):
+                event({"content": content[i:i + chunk_chars]})
+                if delay:
+                    time.sleep(delay)
+            event({}, finish_reason)
+            if (request.get("stream_options") or {}).get("include_usage"):
+                event({}, chunk_usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled the stream
+
+
+class MockOpenAIServer:
+    """Threaded mock server; use as a context manager to run it in the background"""
+
+    def __init__(self, host="127.0.0.1", port=0, **config):
+        self.config = MockConfig(**config)
+        handler = type("Handler", (_Handler,), {"config": self.config})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="0 = send the completion at once")
+    parser.add_argument("--plan-words", type=int, default=2500)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server = MockOpenAIServer(args.host, args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                              plan_words=args.plan_words, truncate_rate=args.truncate_rate,
+                              error_rate=args.error_rate, error_status=args.error_status, seed=args.seed)
+    print(f"Mock OpenAI server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
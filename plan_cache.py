@@ -0,0 +1,123 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def plan_cache_key(system_prompt, user_prompt, model, temperature, max_tokens, plan_style, mode="Single request"):
+    """Content hash of everything that influences the generated plan"""
+    payload = json.dumps(
+        [system_prompt, user_prompt, model, float(temperature), int(max_tokens), plan_style, mode],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """Two-tier plan cache: an in-memory LRU in front of an optional SQLite file.
+
+    Entries expire after `ttl_seconds`. The memory tier holds at most
+    `max_entries` plans and the disk tier at most `max_disk_entries`; the
+    least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries=128, ttl_seconds=24 * 3600, db_path=None, max_disk_entries=5000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "evictions": 0}
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "key TEXT PRIMARY KEY, plan TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS plans_accessed_at ON plans (accessed_at)")
+            self._db.commit()
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key, plan, created_at):
+        self._memory[key] = (plan, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key):
+        """Return the cached plan for `key`, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                plan, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return plan
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT plan, created_at FROM plans WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    plan, created_at = row
+                    if not self._expired(created_at, now):
+                        self._db.execute("UPDATE plans SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, plan, created_at)
+                        self.stats["hits"] += 1
+                        self.stats["disk_hits"] += 1
+                        return plan
+                    self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, plan):
+        now = time.time()
+        with self._lock:
+            self._remember(key, plan, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO plans (key, plan, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, plan, now, now),
+                )
+                if self.ttl_seconds is not None:
+                    self._db.execute("DELETE FROM plans WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._db.execute(
+                    "DELETE FROM plans WHERE key NOT IN "
+                    "(SELECT key FROM plans ORDER BY accessed_at DESC LIMIT ?)",
+                    (self.max_disk_entries,),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM plans")
+                self._db.commit()
+
+    def summary(self):
+        """Counters for display, including the current hit rate"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            disk_entries = None
+            if self._db is not None:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
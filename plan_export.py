@@ -0,0 +1,492 @@
+import csv
+import datetime
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+
+from plan_parser import parse_plan
+
+# Bump when any renderer's output changes so cached artifacts are rebuilt
+EXPORT_VERSION = 1
+
+# Artifacts never change for the same plan content, so their zip entries carry a fixed timestamp
+ZIP_DATE = (2024, 1, 1, 0, 0, 0)
+
+SECTION_LABELS = {
+    "objectives": "Learning Objectives",
+    "milestones": "Milestone Checklist",
+    "red_flag": "Red Flag",
+    "coaching_notes": "Manager Coaching Notes",
+}
+
+MARKDOWN_MARKUP_RE = re.compile(r"^\s*#{1,6}\s*|\*\*|__|`")
+SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+def plan_content_hash(plan):
+    """Hash of everything a rendered export depends on; artifacts are cached under it"""
+    payload = json.dumps([EXPORT_VERSION, plan["body"], plan["role"], plan["company_name"]], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def next_monday(today=None):
+    today = today or datetime.date.today()
+    return today + datetime.timedelta(days=(7 - today.weekday()) % 7 or 7)
+
+
+def _plain(line):
+    return MARKDOWN_MARKUP_RE.sub("", line).replace("**", "").strip()
+
+
+def plan_outline(plan):
+    """Title, summary blocks and weeks of a stored plan, from its parsed week structure"""
+    parsed = parse_plan(plan["body"])
+    phase_titles = {phase.number: phase.title for phase in parsed.phases}
+    company = f" at {plan['company_name']}" if plan["company_name"] else ""
+    weeks = []
+    for week in parsed.weeks:
+        sections = {field: getattr(week, field) for field in SECTION_LABELS}
+        if not any(sections.values()):
+            # No section emojis: keep the week's own text rather than an empty heading
+            lines = [_plain(line) for line in week.markdown.splitlines()[1:]]
+            sections["objectives"] = [line.lstrip("-*• ") for line in lines if line]
+        weeks.append({"number": week.number, "title": week.title, "phase": week.phase,
+                      "phase_title": phase_titles.get(week.phase, ""), **sections})
+    return {
+        "title": f"30/60/90-Day Onboarding Plan: {plan['role']}{company}",
+        "summary": [("heading" if line.lstrip().startswith("#") else "paragraph", _plain(line))
+                    for line in parsed.preamble.splitlines() if _plain(line)],
+        "weeks": weeks,
+    }
+
+
+def plan_blocks(outline):
+    """The outline as a flat list of (kind, text) blocks shared by the HTML, DOCX and PDF renderers"""
+    blocks = [("title", outline["title"])]
+    blocks += outline["summary"]
+    phase = object()
+    for week in outline["weeks"]:
+        if week["phase"] != phase:
+            phase = week["phase"]
+            if phase is not None:
+                blocks.append(("heading", f"Phase {phase}: {week['phase_title']}".rstrip(": ")))
+        blocks.append(("subheading", f"Week {week['number']}: {week['title']}".rstrip(": ")))
+        for field, label in SECTION_LABELS.items():
+            content = week[field]
+            if not content:
+                continue
+            blocks.append(("label", label))
+            if field == "milestones":
+                blocks += [("check", item) for item in content]
+            elif isinstance(content, list):
+                blocks += [("bullet", item) for item in content]
+            else:
+                blocks.append(("paragraph", content))
+    return blocks
+
+
+def render_markdown(plan, outline, start_date):
+    return plan["body"].encode("utf-8")
+
+
+HTML_TAGS = {"title": "h1", "heading": "h2", "subheading": "h3", "label": "h4", "paragraph": "p"}
+HTML_STYLE = ("body{font-family:-apple-system,Segoe UI,Helvetica,Arial,sans-serif;max-width:46em;margin:2em auto;"
+              "padding:0 1em;line-height:1.5;color:#222}h2{border-bottom:1px solid #ddd;padding-bottom:.2em}"
+              "h4{margin-bottom:.2em}ul{margin-top:0}ul.check{list-style:none;padding-left:1.2em}"
+              "ul.check li:before{content:'\\2610  '}")
+
+
+def render_html(plan, outline, start_date):
+    parts = [f"<!DOCTYPE html>\n<html lang=\"en\"><head><meta charset=\"utf-8\">"
+             f"<title>{html.escape(outline['title'])}</title><style>{HTML_STYLE}</style></head><body>"]
+    open_list = None
+    for kind, text in plan_blocks(outline):
+        list_class = {"bullet": "", "check": " class=\"check\""}.get(kind)
+        if open_list is not None and list_class != open_list:
+            parts.append("</ul>")
+            open_list = None
+        if list_class is not None:
+            if open_list is None:
+                parts.append(f"<ul{list_class}>")
+                open_list = list_class
+            parts.append(f"<li>{html.escape(text)}</li>")
+        else:
+            tag = HTML_TAGS[kind]
+            parts.append(f"<{tag}>{html.escape(text)}</{tag}>")
+    if open_list is not None:
+        parts.append("</ul>")
+    parts.append("</body></html>\n")
+    return "\n".join(parts).encode("utf-8")
+
+
+def week_dates(start_date, number):
+    """Monday and Friday of plan week `number` when the hire starts on start_date"""
+    first = start_date + datetime.timedelta(weeks=number - 1)
+    return first, first + datetime.timedelta(days=4)
+
+
+def render_csv(plan, outline, start_date):
+    """One row per milestone, due at the end of its week"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["week", "phase", "week_title", "milestone", "due_date", "done"])
+    for week in outline["weeks"]:
+        due = week_dates(start_date, week["number"])[1].isoformat()
+        phase = f"Phase {week['phase']}: {week['phase_title']}".rstrip(": ") if week["phase"] else ""
+        for milestone in week["milestones"]:
+            writer.writerow([week["number"], phase, week["title"], milestone, due, ""])
+    # The BOM makes Excel read the file as UTF-8
+    return ("\ufeff" + out.getvalue()).encode("utf-8")
+
+
+def _ics_text(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_fold(line):
+    """Split a content line into 75-octet pieces, as RFC 5545 requires"""
+    data = line.encode("utf-8")
+    pieces = []
+    while len(data) > 75:
+        cut = 75 if not pieces else 74
+        while cut and (data[cut] & 0xC0) == 0x80:  # never split a UTF-8 character
+            cut -= 1
+        pieces.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    pieces.append(data.decode("utf-8"))
+    return "\r\n ".join(pieces)
+
+
+def render_ics(plan, outline, start_date):
+    """One all-day Monday–Friday event per week, describing its objectives, milestones and red flag"""
+    uid = plan_content_hash(plan)[:16]
+    stamp = start_date.strftime("%Y%m%dT000000Z")
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//onboarding-plan-generator//plan export//EN",
+             "CALSCALE:GREGORIAN", f"X-WR-CALNAME:{_ics_text(outline['title'])}"]
+    for week in outline["weeks"]:
+        first, last = week_dates(start_date, week["number"])
+        description = []
+        for field in ("objectives", "milestones"):
+            if week[field]:
+                description.append(f"{SECTION_LABELS[field]}:\n" + "\n".join(f"- {item}" for item in week[field]))
+        if week["red_flag"]:
+            description.append(f"{SECTION_LABELS['red_flag']}: {week['red_flag']}")
+        description = "\n\n".join(description)
+        summary = f"Onboarding Week {week['number']}: {week['title']}".rstrip(": ")
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{uid}-week-{week['number']}@onboarding-plan-generator",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;VALUE=DATE:{first.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(last + datetime.timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{_ics_text(summary)}",
+            f"DESCRIPTION:{_ics_text(description)}",
+            "TRANSP:TRANSPARENT",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_ics_fold(line) for line in lines) + "\r\n").encode("utf-8")
+
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'officeDocument" Target="word/document.xml"/></Relationships>')
+
+# (bold, half-point size, space before in twentieths of a point, prefix) per block kind
+DOCX_BLOCKS = {
+    "title": (True, 36, 0, ""),
+    "heading": (True, 30, 360, ""),
+    "subheading": (True, 26, 240, ""),
+    "label": (True, 22, 120, ""),
+    "paragraph": (False, 22, 60, ""),
+    "bullet": (False, 22, 0, "•\t"),
+    "check": (False, 22, 0, "☐\t"),
+}
+
+
+def _zip_entry(archive, name, data):
+    info = zipfile.ZipInfo(name, date_time=ZIP_DATE)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    archive.writestr(info, data)
+
+
+def render_docx(plan, outline, start_date):
+    """A Word document written as WordprocessingML directly, so python-docx is not needed"""
+    paragraphs = []
+    for kind, text in plan_blocks(outline):
+        bold, size, before, prefix = DOCX_BLOCKS[kind]
+        indent = '<w:ind w:left="360" w:hanging="360"/>' if prefix else ""
+        run = f"<w:rPr>{'<w:b/>' if bold else ''}<w:sz w:val=\"{size}\"/></w:rPr>"
+        paragraphs.append(f'<w:p><w:pPr><w:spacing w:before="{before}" w:after="60"/>{indent}</w:pPr>'
+                          f'<w:r>{run}<w:t xml:space="preserve">{html.escape(prefix + text, quote=False)}</w:t></w:r>'
+                          '</w:p>')
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+                + "".join(paragraphs) +
+                '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+                '<w:pgMar w:top="1080" w:right="1080" w:bottom="1080" w:left="1080"/></w:sectPr>'
+                '</w:body></w:document>')
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as archive:
+        _zip_entry(archive, "[Content_Types].xml", DOCX_CONTENT_TYPES)
+        _zip_entry(archive, "_rels/.rels", DOCX_RELS)
+        _zip_entry(archive, "word/document.xml", document)
+    return out.getvalue()
+
+
+# Helvetica advance widths for printable ASCII (1/1000 em), from the standard AFM metrics
+HELVETICA_WIDTHS = dict(zip(range(32, 127), [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556, 556, 556,
+    556, 556, 556, 556, 278, 278, 584, 584, 584, 556, 1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667,
+    556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556, 333, 556,
+    556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556, 556, 556, 333, 500, 278, 556, 500, 722,
+    500, 500, 500, 334, 260, 334, 584]))
+
+# (bold, font size, space before, prefix) per block kind
+PDF_BLOCKS = {
+    "title": (True, 18, 0, ""),
+    "heading": (True, 15, 18, ""),
+    "subheading": (True, 13, 12, ""),
+    "label": (True, 11, 6, ""),
+    "paragraph": (False, 10.5, 3, ""),
+    "bullet": (False, 10.5, 0, "- "),
+    "check": (False, 10.5, 0, "[  ] "),
+}
+PDF_PAGE = (612, 792)  # US Letter, in points
+PDF_MARGIN = 54
+
+
+def _pdf_width(text, size, bold):
+    # Bold glyphs run about 5% wider; other characters are counted as a digit
+    return sum(HELVETICA_WIDTHS.get(ord(char), 556) for char in text) * size / 1000 * (1.05 if bold else 1)
+
+
+def _pdf_wrap(text, size, bold, width):
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and _pdf_width(candidate, size, bold) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    return lines + [line] if line else lines
+
+
+def _pdf_string(text):
+    # The standard fonts only cover WinAnsi: anything else (emoji, arrows) becomes "?"
+    data = text.encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def render_pdf(plan, outline, start_date):
+    """A paginated PDF written directly with the built-in Helvetica fonts, so no PDF library is needed"""
+    page_width, page_height = PDF_PAGE
+    pages, commands = [], []
+    y = page_height - PDF_MARGIN
+    for kind, text in plan_blocks(outline):
+        bold, size, before, prefix = PDF_BLOCKS[kind]
+        indent = _pdf_width(prefix, size, bold)
+        leading = size * 1.35
+        y -= before
+        for number, line in enumerate(_pdf_wrap(text, size, bold, page_width - 2 * PDF_MARGIN - indent)):
+            if y - leading < PDF_MARGIN:
+                pages.append(commands)
+                commands, y = [], page_height - PDF_MARGIN
+            y -= leading
+            x = PDF_MARGIN + (0 if number == 0 or not prefix else indent)
+            line = prefix + line if number == 0 else line
+            commands.append(b"BT /%s %g Tf %.2f %.2f Td %s Tj ET" % (b"F2" if bold else b"F1", size, x, y,
+                                                                     _pdf_string(line)))
+    pages.append(commands)
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for commands in pages:
+        stream = b"\n".join(commands)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (page_width, page_height, len(objects)))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+# format -> (button label, file extension, mime type, renderer)
+EXPORT_FORMATS = {
+    "docx": ("Word", "docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", render_docx),
+    "pdf": ("PDF", "pdf", "application/pdf", render_pdf),
+    "html": ("HTML", "html", "text/html", render_html),
+    "csv": ("Milestones CSV", "csv", "text/csv", render_csv),
+    "ics": ("Calendar", "ics", "text/calendar", render_ics),
+    "md": ("Markdown", "md", "text/markdown", render_markdown),
+}
+
+# Formats whose output depends on the hire's start date
+DATED_FORMATS = {"csv", "ics"}
+
+
+def export_key(content_hash, fmt, start_date):
+    return (content_hash, fmt, start_date.isoformat() if fmt in DATED_FORMATS else None)
+
+
+def export_filename(plan, fmt):
+    slug = SLUG_RE.sub("-", f"{plan['role']} {plan['company_name'] or ''}".lower()).strip("-")[:60]
+    return f"onboarding-plan-{plan['id']}-{slug}.{EXPORT_FORMATS[fmt][1]}"
+
+
+class ExportCache:
+    """Rendered export artifacts in memory, keyed by plan content hash, format and start date.
+
+    Least recently used artifacts are evicted once they total more than
+    `max_bytes`. Shared by every session, so a plan is rendered once
+    however many people download it.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "renders": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self.bytes += len(data)
+            self.stats["renders"] += 1
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def summary(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "bytes": self.bytes}
+
+
+def render_exports(plan, formats, start_date, cache=None, cache_renders=True, on_format=None):
+    """{format: bytes} for a stored plan, taking what `cache` already has and caching what it renders"""
+    content_hash = plan_content_hash(plan)
+    artifacts, outline = {}, None
+    for fmt in formats:
+        key = export_key(content_hash, fmt, start_date)
+        data = cache.get(key) if cache is not None else None
+        if data is None:
+            if outline is None:
+                outline = plan_outline(plan)
+            data = EXPORT_FORMATS[fmt][3](plan, outline, start_date)
+            if cache is not None and cache_renders:
+                cache.put(key, data)
+        artifacts[fmt] = data
+        if on_format:
+            on_format(fmt)
+    return artifacts
+
+
+def run_export_job(job, plan, formats, start_date, cache):
+    """JobQueue work function: render every format of one plan into the cache off the request path.
+
+    The artifacts are returned as well, for when the cache is too small to keep them all.
+    """
+    done = []
+
+    def rendered(fmt):
+        done.append(EXPORT_FORMATS[fmt][0])
+        job.report(f"📄 Rendered {', '.join(done)}")
+
+    artifacts = render_exports(plan, formats, start_date, cache, on_format=rendered)
+    return {"content_hash": plan_content_hash(plan), "formats": list(formats), "artifacts": artifacts}
+
+
+def write_plans_zip(plans, fileobj, formats, start_date, cache=None, on_plan=None):
+    """Write every plan from the iterable `plans` into a zip on `fileobj`, one folder per plan.
+
+    Plans are pulled and rendered one at a time and each entry is written as
+    soon as it is ready, so memory holds one plan's artifacts whatever the
+    number of plans; `fileobj` need not be seekable. Cached artifacts are
+    reused but bulk renders are not cached, so they cannot evict the ones
+    interactive downloads are using. Returns the number of plans written.
+    """
+    count = 0
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as archive:
+        for plan in plans:
+            artifacts = render_exports(plan, formats, start_date, cache, cache_renders=False)
+            folder = export_filename(plan, "md")[:-3]
+            for fmt, data in artifacts.items():
+                _zip_entry(archive, f"{folder}/{export_filename(plan, fmt)}", data)
+            count += 1
+            if on_plan:
+                on_plan(count)
+    return count
+
+
+def run_bulk_export_job(job, plan_store, plan_ids, formats, start_date, cache, path):
+    """JobQueue work function: stream the stored plans `plan_ids` into a zip file at `path`"""
+    def plans():
+        for plan_id in plan_ids:
+            plan = plan_store.get(plan_id)
+            if plan is not None:
+                yield plan
+
+    def written(count):
+        job.report(f"📦 Exported {count} of {len(plan_ids)} plans")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Written under a temporary name so a download never sees a half-written archive
+    with open(path + ".tmp", "wb") as f:
+        count = write_plans_zip(plans(), f, formats, start_date, cache, on_plan=written)
+    os.replace(path + ".tmp", path)
+    return {"path": path, "plans": count, "bytes": os.path.getsize(path)}
+
+
+def purge_exports(directory, max_age_seconds):
+    """Delete bulk export archives in `directory` older than max_age_seconds"""
+    if not os.path.isdir(directory):
+        return
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith((".zip", ".zip.tmp")) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+
+from plan_metrics import add_usage
+from plan_streaming import consume_plan_stream
+from plan_tokens import MAX_COMPLETION_TOKENS, count_tokens, message_tokens
+from rate_limiter import admitted_request
+
+# Hedge when the first token is later than this share of recent requests saw theirs
+HEDGE_QUANTILE = 0.95
+
+# Bounds on the hedge deadline; the default applies until there are enough samples
+MIN_HEDGE_DEADLINE = 3.0
+MAX_HEDGE_DEADLINE = 30.0
+DEFAULT_HEDGE_DEADLINE = 10.0
+MIN_DEADLINE_SAMPLES = 20
+
+
+def hedge_deadline(ttft_percentiles, quantile=HEDGE_QUANTILE):
+    """Seconds to wait for a first token before hedging, from MetricsStore.percentiles("ttft_seconds")"""
+    key = f"p{quantile * 100:g}"
+    if ttft_percentiles.get("n", 0) < MIN_DEADLINE_SAMPLES or key not in ttft_percentiles:
+        return DEFAULT_HEDGE_DEADLINE
+    return min(MAX_HEDGE_DEADLINE, max(MIN_HEDGE_DEADLINE, ttft_percentiles[key]))
+
+
+class HedgeBudget:
+    """Caps backup requests at `max_fraction` of the requests that were eligible for one.
+
+    Shared by every session, so hedging adds at most that share of extra
+    calls however slow the API gets.
+    """
+
+    def __init__(self, max_fraction=0.05):
+        self.max_fraction = max_fraction
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self):
+        """Take one hedge from the budget; False when it would exceed max_fraction"""
+        with self._lock:
+            if self.hedges + 1 > self.max_fraction * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def summary(self):
+        with self._lock:
+            return {"requests": self.requests, "hedges": self.hedges, "max_fraction": self.max_fraction}
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _Attempt:
+    """One streamed request of a hedged call, run on its own thread"""
+
+    def __init__(self, label, model):
+        self.label = label
+        self.model = model
+        self.max_tokens = None
+        self.first_token = threading.Event()
+        self.done = False
+        self.cancelled = False
+        self.stream = None
+        self.live = None
+        self.monitor = None
+        self.error = None
+
+    def cancel(self):
+        """Stop reading and close the HTTP stream so no more tokens are generated or billed"""
+        self.cancelled = True
+        stream = self.stream
+        if stream is not None and not self.done:
+            close = getattr(stream, "close", None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass  # the reader thread sees the closed stream and exits
+
+    def run(self, client, kwargs, on_section, on_progress, finished):
+        try:
+            request = {**kwargs, "model": self.model}
+            self.max_tokens = request.get("max_tokens")
+            self.stream = client.chat.completions.create(**request, stream=True,
+                                                         stream_options={"include_usage": True})
+            # The rate limiter may have sent it on a fallback model
+            self.model, self.max_tokens = admitted_request(self.stream, request)
+            if self.cancelled:
+                raise _Cancelled()
+
+            def progress(monitor):
+                self.live = monitor
+                self.first_token.set()
+                if self.cancelled:
+                    raise _Cancelled()
+                on_progress(self, monitor)
+
+            self.monitor = consume_plan_stream(self.stream, on_section=lambda text: on_section(self, text),
+                                               on_progress=progress)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done = True
+            self.first_token.set()
+            finished.put(self)
+
+
+def hedged_plan_stream(client, kwargs, deadline, budget, backup_model=None, is_valid=None, on_section=None,
+                       on_progress=None):
+    """Stream a plan, sending a backup request if the first token is late.
+
+    The primary request starts at once. If no token has arrived after
+    `deadline` seconds and `budget` allows, a backup is sent (on
+    `backup_model` if given) and both race: the first to finish with output
+    that passes `is_valid` wins and the other is cancelled. Live sections and
+    progress come from whichever request streamed first. Returns the
+    winner's StreamingPlanMonitor and a report; if every request fails, the
+    primary's error is raised. The report names the model and max_tokens the
+    winner was sent with, and splits the losers' tokens by the model each ran
+    on ("wasted_by_model") so they can be priced correctly.
+    """
+    started = time.perf_counter()
+    finished = queue.Queue()
+    leader = []
+    lock = threading.Lock()
+
+    def leads(attempt):
+        with lock:
+            if not leader:
+                leader.append(attempt)
+            return leader[0] is attempt
+
+    def section(attempt, text):
+        if leads(attempt) and on_section:
+            on_section(text)
+
+    def progress(attempt, monitor):
+        if leads(attempt) and on_progress:
+            on_progress(monitor)
+
+    def launch(label, model):
+        attempt = _Attempt(label, model)
+        request = kwargs
+        if MAX_COMPLETION_TOKENS.get(model) and kwargs.get("max_tokens"):
+            request = {**kwargs, "max_tokens": min(kwargs["max_tokens"], MAX_COMPLETION_TOKENS[model])}
+        threading.Thread(target=attempt.run, args=(client, request, section, progress, finished),
+                         name=f"plan-hedge-{label}", daemon=True).start()
+        return attempt
+
+    budget.record_request()
+    attempts = [launch("primary", kwargs["model"])]
+    report = {"deadline": deadline, "hedged": False, "winner": None, "winner_model": None,
+              "winner_max_tokens": None, "first_token_seconds": None, "cancelled": []}
+    wasted = {"prompt_tokens": 0, "completion_tokens": 0}
+    if not attempts[0].first_token.wait(deadline) and budget.try_hedge():
+        report["hedged"] = True
+        attempts.append(launch("backup", backup_model or kwargs["model"]))
+
+    winner = None
+    completed = []
+    try:
+        while len(completed) < len(attempts):
+            attempt = finished.get()
+            completed.append(attempt)
+            if attempt.error is None and (is_valid is None or is_valid(attempt.monitor.text)):
+                winner = attempt
+                break
+    finally:
+        for attempt in attempts:
+            if attempt is not winner and not attempt.done:
+                attempt.cancel()
+                report["cancelled"].append(attempt.label)
+                # A cancelled stream never reports usage: estimate what it was billed for
+                add_usage(wasted, {"prompt_tokens": message_tokens(kwargs["messages"], attempt.model),
+                                   "completion_tokens": count_tokens(attempt.live.text, attempt.model)
+                                   if attempt.live is not None else 0}, attempt.model)
+
+    if winner is None:
+        # Nothing valid: fall back to any output at all (repair may still save it), else the primary's error
+        winner = next((attempt for attempt in completed if attempt.error is None), None)
+        if winner is None:
+            raise attempts[0].error
+    for attempt in completed:
+        if attempt is not winner and attempt.monitor is not None:
+            add_usage(wasted, attempt.monitor.usage, attempt.monitor.model or attempt.model)
+    report.update(winner=winner.label, winner_model=winner.model, winner_max_tokens=winner.max_tokens,
+                  wasted_prompt_tokens=wasted["prompt_tokens"], wasted_completion_tokens=wasted["completion_tokens"],
+                  wasted_by_model=wasted.get("by_model", {}))
+    if winner.monitor.first_token_at is not None:
+        report["first_token_seconds"] = winner.monitor.first_token_at - started
+    return winner.monitor, report
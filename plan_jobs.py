@@ -0,0 +1,350 @@
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+
+from plan_metrics import add_usage, billed_model
+from plan_parser import parse_plan
+from plan_hedging import hedged_plan_stream
+from plan_phases import generate_plan_by_phase
+from plan_quality import analyze_plan_quality, mentions_tools, phase_distribution, plan_validation_error
+from plan_repair import find_plan_defects, repair_plan
+from plan_reuse import adapt_plan
+from plan_store import quality_score
+from plan_streaming import PlanStreamAborted, consume_plan_stream
+from rate_limiter import admitted_request
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work function once the job has been cancelled"""
+
+
+class Job:
+    """One unit of work in a JobQueue, read by the UI while a worker runs it.
+
+    The work function publishes progress through report(); `sections` only
+    ever grows, so a reader can render it while the worker appends.
+    """
+
+    def __init__(self, user, fn, args, kwargs):
+        self.id = uuid.uuid4().hex[:12]
+        self.user = user
+        self.status = QUEUED
+        self.progress = ""
+        self.sections = []
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        self._call = (fn, args, kwargs)
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    def report(self, progress=None, section=None):
+        """Publish a progress line and/or a finished chunk of output; raises JobCancelled after cancel()"""
+        if self.cancel_requested:
+            raise JobCancelled()
+        if progress is not None:
+            self.progress = progress
+        if section is not None:
+            self.sections.append(section)
+
+
+class JobQueue:
+    """Runs submitted jobs on a fixed pool of worker threads, fairly across users.
+
+    The pool size is the global concurrency cap. Each user has their own
+    FIFO; a free worker serves users round-robin and skips anyone already
+    running `max_running_per_user` jobs, so one user queueing many plans
+    cannot starve the others. Finished jobs are kept for `keep_seconds` so
+    their results survive reruns and page reloads.
+    """
+
+    def __init__(self, workers=4, max_running_per_user=1, keep_seconds=3600):
+        self.workers = workers
+        self.max_running_per_user = max_running_per_user
+        self.keep_seconds = keep_seconds
+        self._cond = threading.Condition()
+        self._queued = OrderedDict()  # user -> deque of jobs, in round-robin order
+        self._running = Counter()
+        self._jobs = {}
+        for number in range(workers):
+            threading.Thread(target=self._work, name=f"plan-job-{number}", daemon=True).start()
+
+    def submit(self, user, fn, *args, **kwargs):
+        """Queue fn(job, *args, **kwargs) for `user`; returns the Job"""
+        job = Job(user, fn, args, kwargs)
+        with self._cond:
+            self._purge()
+            self._jobs[job.id] = job
+            self._queued.setdefault(user, deque()).append(job)
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs_for(self, user):
+        """The user's jobs still known to the queue, newest first"""
+        with self._cond:
+            jobs = [job for job in self._jobs.values() if job.user == user]
+        return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
+
+    def position(self, job):
+        """Roughly how many queued jobs start before this one, with users served round-robin; 0 once it runs"""
+        with self._cond:
+            own = self._queued.get(job.user)
+            if job.status != QUEUED or own is None:
+                return 0
+            turn = own.index(job)
+            return turn + sum(min(len(queue), turn + 1) for user, queue in self._queued.items() if user != job.user)
+
+    def stats(self):
+        with self._cond:
+            return {"workers": self.workers, "running": sum(self._running.values()),
+                    "queued": sum(len(queue) for queue in self._queued.values()), "users": len(self._queued)}
+
+    def cancel(self, job_id):
+        """Drop a queued job or ask a running one to stop at its next report(); False if already finished"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                queue = self._queued[job.user]
+                queue.remove(job)
+                if not queue:
+                    del self._queued[job.user]
+                job.status, job.finished_at = CANCELLED, time.time()
+            return True
+
+    def _purge(self):
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _next_job(self):
+        for user in list(self._queued):
+            if self._running[user] < self.max_running_per_user:
+                queue = self._queued.pop(user)
+                job = queue.popleft()
+                if queue:
+                    # Back of the line: the next free worker serves another user first
+                    self._queued[user] = queue
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                self._running[job.user] += 1
+                job.status, job.started_at = RUNNING, time.time()
+
+            fn, args, kwargs = job._call
+            try:
+                job.result = fn(job, *args, **kwargs)
+                status = DONE
+            except JobCancelled:
+                status = CANCELLED
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                status = FAILED
+
+            with self._cond:
+                job.status, job.finished_at = status, time.time()
+                self._running[job.user] -= 1
+                # Another of this user's jobs may be eligible now
+                self._cond.notify_all()
+
+
+def _main_model(usage, default):
+    """The model that wrote most of the output, by completion tokens"""
+    by_model = usage.get("by_model")
+    return max(by_model, key=lambda model: by_model[model]["completion_tokens"]) if by_model else default
+
+
+def run_plan_job(job, request, client, plan_cache, plan_store, reuse_index, metrics_store):
+    """Work function for one plan submission: generate (or adapt), repair, validate, save, record.
+
+    Runs on a JobQueue worker, so it never touches Streamlit: progress and
+    finished weeks go through job.report(), and everything the page shows
+    afterwards is in the returned dict. `request` holds the prompts and the
+    form settings; API errors come back as the result's "outcome". The
+    result's "model" and "max_tokens" are what was actually sent, which the
+    rate limiter may have swapped for a fallback; a plan written partly or
+    wholly by another model is "downgraded" and is saved without the
+    request's cache key, so identical inputs never get it from the cache.
+    """
+    import openai
+
+    ctx = request["context"]
+    started = time.perf_counter()
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    result = {"outcome": "error", "usage": usage, "cache_hit": request["cached_output"] is not None,
+              "adapt_base_id": request["adapt_base"]["id"] if request["adapt_base"] else None,
+              "adapt_report": None, "phase_report": None, "repair_report": None, "hedge_report": None, "repaired": [],
+              "stream": None, "plan_id": None, "output": None, "model": request["model"],
+              "max_tokens": request["max_tokens"], "downgraded": False}
+    served = set()  # every model whose text ended up in the plan
+    parsed = None
+    try:
+        output = request["cached_output"]
+        if result["cache_hit"]:
+            job.report("⚡ Served from plan cache")
+        elif request["adapt_base"] is not None:
+            job.report(f"♻️ Adapting saved plan #{request['adapt_base']['id']}...")
+            output, result["adapt_report"] = adapt_plan(client, request["adapt_base"]["context"],
+                                                        request["adapt_base"]["body"], ctx, request["model"],
+                                                        request["temperature"], style=request["plan_style"])
+            add_usage(usage, result["adapt_report"])
+            result["model"] = result["adapt_report"]["model"]
+            served.add(result["model"])
+        elif request["mode"] == "Parallel phases":
+            parts_done = []
+
+            def part_done(label):
+                parts_done.append(label)
+                job.report(f"✍️ Finished {len(parts_done)} of 4 parts: {', '.join(parts_done)}")
+
+            job.report("✍️ Writing the summary and all three phases in parallel...")
+            output, result["phase_report"] = generate_plan_by_phase(
+                client, ctx, request["model"], request["temperature"], request["max_tokens"], on_part_done=part_done,
+                style=request["plan_style"], check=job.report)
+            for part in result["phase_report"]["parts"].values():
+                add_usage(usage, part)
+            result["model"] = _main_model(usage, request["model"])
+            served.update(part["model"] for part in result["phase_report"]["parts"].values())
+        elif request["stream"]:
+            job.report("⏳ Waiting for the first week...")
+            completion = dict(
+                model=request["model"],
+                messages=[
+                    {"role": "system", "content": request["system_prompt"]},
+                    {"role": "user", "content": request["user_prompt"]}
+                ],
+                temperature=request["temperature"],
+                max_tokens=request["max_tokens"],
+                timeout=60
+            )
+
+            def progress(monitor):
+                counts = " • ".join(f"{label}: {count}" for label, count in monitor.counts.items())
+                job.report(f"✍️ Writing Week {monitor.current_week or 1} of 12 — {counts}")
+
+            def section(text):
+                job.report(section=text)
+
+            if request["hedge"] is not None:
+                hedge = request["hedge"]
+                stream_monitor, hedge_report = hedged_plan_stream(
+                    client, completion, hedge["deadline"], hedge["budget"], backup_model=hedge["backup_model"],
+                    is_valid=lambda text: plan_validation_error(parse_plan(text)) is None,
+                    on_section=section, on_progress=progress)
+                add_usage(usage, {"prompt_tokens": hedge_report["wasted_prompt_tokens"],
+                                  "completion_tokens": hedge_report["wasted_completion_tokens"],
+                                  "by_model": hedge_report["wasted_by_model"]})
+                result["model"], result["max_tokens"] = hedge_report["winner_model"], hedge_report["winner_max_tokens"]
+                result["hedge_report"] = hedge_report
+            else:
+                stream = client.chat.completions.create(**completion, stream=True,
+                                                        stream_options={"include_usage": True})
+                stream_monitor = consume_plan_stream(stream, on_section=section, on_progress=progress)
+                result["model"], result["max_tokens"] = admitted_request(stream, completion)
+            output = stream_monitor.text
+            served.add(result["model"])
+            add_usage(usage, stream_monitor.usage, stream_monitor.model or result["model"])
+            result["stream"] = {"ttft": stream_monitor.time_to_first_token,
+                                "first_week": stream_monitor.time_to_first_week}
+            if result["hedge_report"] is not None:
+                # The winner's first token, timed from the start of the hedged call (when the primary was sent),
+                # so a backup that won still counts the deadline the user waited through
+                result["stream"]["ttft"] = result["hedge_report"]["first_token_seconds"]
+        else:
+            job.report(f"🤖 Generating plan with {request['model']}...")
+            response = client.chat.completions.create(
+                model=request["model"],
+                messages=[
+                    {"role": "system", "content": request["system_prompt"]},
+                    {"role": "user", "content": request["user_prompt"]}
+                ],
+                temperature=request["temperature"],
+                max_tokens=request["max_tokens"],
+                timeout=60
+            )
+            output = response.choices[0].message.content
+            result["model"], result["max_tokens"] = admitted_request(response, request)
+            served.add(result["model"])
+            add_usage(usage, response.usage, billed_model(response, result["model"]))
+
+        # Fix missing or malformed weeks in place rather than throwing the whole plan away
+        if request["auto_repair"] and not result["cache_hit"] and output and find_plan_defects(output):
+            job.report("🩹 Repairing incomplete weeks...")
+            output, repair_report = repair_plan(client, ctx, output, request["model"], request["temperature"],
+                                                style=request["plan_style"])
+            add_usage(usage, repair_report)
+            served.update(repair_report.get("by_model", ()))
+            result["repair_report"] = repair_report
+            result["repaired"] = sorted(set(repair_report["defects"]) - set(repair_report["remaining"]))
+
+        parsed = parse_plan(output)
+        result["output"] = output
+        result["validation_error"] = plan_validation_error(parsed)
+        result["outcome"] = "invalid" if result["validation_error"] else "ok"
+        result["seconds"] = time.perf_counter() - started
+
+        result["downgraded"] = bool(served - {request["model"]}) or (
+            (result["max_tokens"] or 0) < (request["max_tokens"] or 0))
+        if not result["validation_error"]:
+            metrics = analyze_plan_quality(parsed)
+            cache_key = None if result["downgraded"] else request["cache_key"]
+            plan_id = plan_store.latest_for_cache_key(request["cache_key"]) if result["cache_hit"] else None
+            if plan_id is None:
+                plan_id = plan_store.save(ctx, output, parsed, metrics, model=result["model"],
+                                          mode=request["mode"], cache_key=cache_key)
+                reuse_index.add(plan_id, quality_score(metrics), ctx)
+            if cache_key is not None:
+                plan_cache.put(cache_key, output)
+            weeks_by_phase, balanced = phase_distribution(parsed)
+            result.update(plan_id=plan_id, metrics=metrics, mentions_tools=mentions_tools(parsed),
+                          phases=len(parsed.phases), weeks_by_phase=weeks_by_phase, balanced=balanced)
+    except PlanStreamAborted as e:
+        result.update(outcome="aborted", error=e.reason, partial_text=e.partial_text)
+    except openai.AuthenticationError:
+        result["outcome"] = "auth_error"
+    except openai.RateLimitError:
+        result["outcome"] = "rate_limited"
+    except openai.APITimeoutError:
+        result["outcome"] = "timeout"
+    except openai.APIConnectionError:
+        result["outcome"] = "connection_error"
+    except JobCancelled:
+        result["outcome"] = "cancelled"
+        raise
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        phase_report, repair_report = result["phase_report"], result["repair_report"]
+        retries = (repair_report["requests"] if repair_report else 0) + (
+            sum(part["attempts"] - 1 for part in phase_report["parts"].values()) if phase_report else 0) + (
+            bool(result["hedge_report"] and result["hedge_report"]["hedged"]))
+        metrics_store.record(
+            result["model"], result["outcome"], time.perf_counter() - started,
+            ttft_seconds=result["stream"]["ttft"] if result["stream"] else None,
+            retries=retries, cache_hit=result["cache_hit"],
+            mode="Adapted" if request["adapt_base"] is not None else request["mode"],
+            word_count=parsed.word_count if parsed else None,
+            role=ctx["role"].strip(), function=ctx["function"], **usage
+        )
+    return result
@@ -0,0 +1,251 @@
+import json
+import re
+import sqlite3
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+# USD per 1K tokens: (prompt, completion)
+MODEL_PRICING = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+# Share of the prompt price charged for tokens served from the provider's prompt cache
+CACHED_PROMPT_PRICE_FACTOR = 0.5
+
+RECORD_FIELDS = ["ts", "model", "mode", "role", "function", "outcome", "cache_hit", "wall_seconds",
+                 "ttft_seconds", "prompt_tokens", "completion_tokens", "cost_usd", "retries", "word_count",
+                 "cached_tokens", "by_model"]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    prompt_price, completion_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    billed_prompt = (prompt_tokens or 0) - (cached_tokens or 0) * (1 - CACHED_PROMPT_PRICE_FACTOR)
+    return billed_prompt / 1000 * prompt_price + (completion_tokens or 0) / 1000 * completion_price
+
+
+def billed_model(response, sent_model):
+    """Model a response was served (and billed) by, without the snapshot suffix: "gpt-4-0613" -> "gpt-4".
+
+    Falls back to the model the rate limiter admitted, then to `sent_model`, when the response does not say.
+    """
+    model = getattr(response, "model", None)
+    if not isinstance(model, str) or not model:
+        return (getattr(response, "admitted", None) or {}).get("model") or sent_model
+    return re.sub(r"-\d{4}(-\d{2}-\d{2})?$", "", model)
+
+
+def usage_by_model(model, usage):
+    """[(model, prompt, completion, cached tokens)] of accumulated `usage`: its "by_model" entries, the rest under `model`"""
+    by_model = usage.get("by_model") or {}
+    parts = [(name, part.get("prompt_tokens", 0), part.get("completion_tokens", 0), part.get("cached_tokens", 0))
+             for name, part in by_model.items()]
+    rest = [(usage.get(key) or 0) - sum(part.get(key, 0) for part in by_model.values())
+            for key in ("prompt_tokens", "completion_tokens", "cached_tokens")]
+    if any(rest) or not parts:
+        parts.append((model, *rest))
+    return parts
+
+
+def cached_tokens(usage):
+    """Prompt tokens served from the provider's prompt cache, from a `usage` object or dict"""
+    if usage is None:
+        return 0
+    if isinstance(usage, dict):
+        return usage.get("cached_tokens", 0) or 0
+    return getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+
+
+def add_usage(totals, usage, model=None):
+    """Accumulate an OpenAI `usage` object (or a dict with the same keys) into `totals`.
+
+    With `model` the usage is also counted under totals["by_model"][model], so
+    a job whose calls ran on different models is priced correctly; a `usage`
+    dict that already has a "by_model" breakdown is merged as it is.
+    """
+    if usage is None:
+        return totals
+    for key in ("prompt_tokens", "completion_tokens"):
+        value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+        totals[key] = totals.get(key, 0) + (value or 0)
+    totals["cached_tokens"] = totals.get("cached_tokens", 0) + cached_tokens(usage)
+    by_model = usage.get("by_model") if isinstance(usage, dict) else None
+    if by_model:
+        for name, part in by_model.items():
+            add_usage(totals.setdefault("by_model", {}).setdefault(name, {}), part)
+    elif model:
+        add_usage(totals.setdefault("by_model", {}).setdefault(model, {}), usage)
+    return totals
+
+
+def percentiles(samples, quantiles=QUANTILES):
+    """Nearest-rank percentiles of `samples`, keyed "p50", "p95", ..."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {"n": len(ordered), "mean": statistics.fmean(ordered), "max": ordered[-1]}
+    for q in quantiles:
+        result[f"p{q * 100:g}"] = ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return result
+
+
+class MetricsStore:
+    """Per-request generation metrics with rolling percentiles.
+
+    The most recent `window` requests are kept in memory for percentiles and
+    the analytics panel; lifetime counters feed the Prometheus export. With a
+    `db_path` every record is also written to SQLite and reloaded on start,
+    so numbers survive restarts.
+    """
+
+    def __init__(self, db_path=None, window=5000):
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._requests = Counter()
+        self._tokens = Counter()
+        self._cost = Counter()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS requests ({', '.join(RECORD_FIELDS)})")
+            existing = {row[1] for row in self._db.execute("PRAGMA table_info(requests)")}
+            for field in RECORD_FIELDS:
+                if field not in existing:
+                    # Databases written before a field existed get it as an empty column
+                    self._db.execute(f"ALTER TABLE requests ADD COLUMN {field}")
+            self._db.execute("CREATE INDEX IF NOT EXISTS requests_ts ON requests (ts)")
+            self._db.commit()
+            rows = self._db.execute(
+                f"SELECT {', '.join(RECORD_FIELDS)} FROM requests ORDER BY ts DESC LIMIT ?", (window,)
+            ).fetchall()
+            for row in reversed(rows):
+                self._recent.append(dict(zip(RECORD_FIELDS, row)))
+            for model, outcome, count, prompt, completion, cost, cached in self._db.execute(
+                "SELECT model, outcome, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd), "
+                "SUM(cached_tokens) FROM requests WHERE by_model IS NULL GROUP BY model, outcome"
+            ):
+                self._count(model, outcome, count, [(model, prompt or 0, completion or 0, cached or 0, cost or 0.0)])
+            # Requests whose calls ran on several models are booked per model, one row at a time
+            for model, outcome, prompt, completion, cached, by_model in self._db.execute(
+                "SELECT model, outcome, prompt_tokens, completion_tokens, cached_tokens, by_model FROM requests "
+                "WHERE by_model IS NOT NULL"
+            ):
+                usage = {"prompt_tokens": prompt, "completion_tokens": completion, "cached_tokens": cached,
+                         "by_model": json.loads(by_model)}
+                self._count(model, outcome, 1, [(*part, estimate_cost(*part)) for part in usage_by_model(model, usage)])
+
+    def _count(self, model, outcome, requests, parts):
+        """Count `requests` under the plan's model and each (model, prompt, completion, cached, cost) part's tokens
+        and cost under the model that ran it"""
+        self._requests[(model, outcome)] += requests
+        for name, prompt_tokens, completion_tokens, cached_tokens, cost in parts:
+            self._tokens[(name, "prompt")] += prompt_tokens
+            self._tokens[(name, "completion")] += completion_tokens
+            self._tokens[(name, "cached")] += cached_tokens
+            self._cost[name] += cost
+
+    def record(self, model, outcome, wall_seconds, ttft_seconds=None, prompt_tokens=0, completion_tokens=0,
+               retries=0, cache_hit=False, word_count=None, mode=None, role=None, function=None, cached_tokens=0,
+               by_model=None):
+        """Store one generation attempt; returns the stored record.
+
+        `model` is the model that wrote the plan. When the attempt's calls
+        ran on several models, `by_model` ({model: usage}) splits the tokens
+        and cost between them; the rest is booked under `model`.
+        """
+        usage = {"prompt_tokens": prompt_tokens or 0, "completion_tokens": completion_tokens or 0,
+                 "cached_tokens": cached_tokens or 0, "by_model": by_model}
+        parts = [(*part, estimate_cost(*part)) for part in usage_by_model(model, usage)]
+        entry = {
+            "ts": time.time(), "model": model, "mode": mode, "role": role, "function": function,
+            "outcome": outcome, "cache_hit": bool(cache_hit), "wall_seconds": wall_seconds,
+            "ttft_seconds": ttft_seconds, "prompt_tokens": prompt_tokens or 0,
+            "completion_tokens": completion_tokens or 0,
+            "cost_usd": sum(part[-1] for part in parts),
+            "retries": retries, "word_count": word_count, "cached_tokens": cached_tokens or 0,
+            "by_model": json.dumps(by_model) if by_model else None,
+        }
+        with self._lock:
+            self._recent.append(entry)
+            self._count(model, outcome, 1, parts)
+            if self._db is not None:
+                self._db.execute(f"INSERT INTO requests VALUES ({', '.join('?' * len(RECORD_FIELDS))})",
+                                 [entry[field] for field in RECORD_FIELDS])
+                self._db.commit()
+        return entry
+
+    def _snapshot(self, since=None):
+        with self._lock:
+            records = list(self._recent)
+        return [r for r in records if since is None or r["ts"] >= since]
+
+    def percentiles(self, field, since=None, include_cache_hits=False, quantiles=QUANTILES):
+        samples = [r[field] for r in self._snapshot(since)
+                   if r[field] is not None and (include_cache_hits or not r["cache_hit"])]
+        return percentiles(samples, quantiles)
+
+    def dashboard(self, now=None):
+        """Numbers for the Demo Analytics panel"""
+        now = now or datetime.now()
+        midnight = datetime(now.year, now.month, now.day)
+        today_start = midnight.timestamp()
+        yesterday_start = (midnight - timedelta(days=1)).timestamp()
+
+        records = self._snapshot(yesterday_start)
+        today = [r for r in records if r["ts"] >= today_start]
+        yesterday = [r for r in records if r["ts"] < today_start]
+        plans_today = [r for r in today if r["outcome"] == "ok"]
+        functions = Counter(r["function"] or "Other" for r in plans_today)
+        lengths = [r["word_count"] for r in plans_today if r["word_count"]]
+        generated = [r for r in today if not r["cache_hit"]]
+        prompt_tokens = sum(r["prompt_tokens"] for r in generated)
+        return {
+            "plans_today": len(plans_today),
+            "plans_yesterday": sum(r["outcome"] == "ok" for r in yesterday),
+            "requests_today": len(today),
+            "failures_today": sum(r["outcome"] != "ok" for r in today),
+            "cache_hits_today": sum(r["cache_hit"] for r in today),
+            "top_function": functions.most_common(1)[0][0] if functions else None,
+            "function_counts": dict(functions),
+            "avg_words": statistics.fmean(lengths) if lengths else None,
+            "cost_today": sum(r["cost_usd"] for r in today),
+            "latency": percentiles([r["wall_seconds"] for r in generated]),
+            "ttft": percentiles([r["ttft_seconds"] for r in generated if r["ttft_seconds"] is not None]),
+            "cached_share": sum(r["cached_tokens"] or 0 for r in generated) / prompt_tokens if prompt_tokens else None,
+        }
+
+    def prometheus_text(self):
+        """Prometheus text exposition of the lifetime counters and rolling latency summaries"""
+        lines = []
+        with self._lock:
+            requests = sorted(self._requests.items())
+            tokens = sorted(self._tokens.items())
+            cost = sorted(self._cost.items())
+
+        lines += ["# HELP onboarding_plan_requests_total Plan generation attempts by model and outcome.",
+                  "# TYPE onboarding_plan_requests_total counter"]
+        lines += [f'onboarding_plan_requests_total{{model="{m}",outcome="{o}"}} {n}' for (m, o), n in requests]
+        lines += ["# HELP onboarding_plan_tokens_total Tokens reported by the API.",
+                  "# TYPE onboarding_plan_tokens_total counter"]
+        lines += [f'onboarding_plan_tokens_total{{model="{m}",kind="{k}"}} {n}' for (m, k), n in tokens]
+        lines += ["# HELP onboarding_plan_cost_usd_total Estimated spend from list prices.",
+                  "# TYPE onboarding_plan_cost_usd_total counter"]
+        lines += [f'onboarding_plan_cost_usd_total{{model="{m}"}} {c:.6f}' for m, c in cost]
+
+        for name, field, help_text in (
+            ("onboarding_plan_request_seconds", "wall_seconds", "Wall time per generated plan (rolling window)."),
+            ("onboarding_plan_time_to_first_token_seconds", "ttft_seconds", "Time to first streamed token (rolling window)."),
+        ):
+            samples = [r[field] for r in self._snapshot() if r[field] is not None and not r["cache_hit"]]
+            stats = percentiles(samples)
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+            for q in QUANTILES:
+                if stats:
+                    lines.append(f'{name}{{quantile="{q}"}} {stats[f"p{q * 100:g}"]:.6f}')
+            lines += [f"{name}_sum {sum(samples):.6f}", f"{name}_count {len(samples)}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,237 @@
+import re
+
+from plan_streaming import SECTION_EMOJIS, SHORTCUT_PHRASES
+
+# Tools counted for the quality score, plus "Teams" which only the validation check accepts
+QUALITY_TOOLS = ['Salesforce', 'HubSpot', 'Slack', 'Notion', 'Zendesk', 'Gainsight']
+TOOL_NAMES = QUALITY_TOOLS + ['Teams']
+
+SUMMARY_PHRASES = ['executive summary', 'philosophy', 'overview']
+# Lowercase phrases parse_plan looks for on every line
+TALLIED_PHRASES = list(dict.fromkeys(SUMMARY_PHRASES + SHORTCUT_PHRASES))
+
+# A phase or week header: a markdown heading or a bold line starting with "Phase N" / "Week N".
+# The lookahead lets the regex engine skip every line that does not start with "#" or "*".
+HEADER_RE = re.compile(
+    r'^(?=[#*])(?:#{1,6}[ \t]*(?:\*\*)?|\*\*)[ \t]*(?P<kind>(?i:phase|week))[ \t]+(?P<number>\d+)\b[^\n]*',
+    re.MULTILINE,
+)
+
+SECTION_EMOJI_RE = re.compile('[' + ''.join(SECTION_EMOJIS) + ']')
+WEEK_MENTION_RE = re.compile(r'Week (\d+)', re.IGNORECASE)
+PHASE_MENTION_RE = re.compile(r'Phase \d+|PHASE \d+')
+
+SECTION_FIELDS = {"📚": "objectives", "✅": "milestones", "🚩": "red_flag", "🧭": "coaching_notes"}
+
+SECTION_LABEL_RE = re.compile(r'^\s*\*\*[^*\n]*\*\*\s*:?')
+BULLET_RE = re.compile(r'^\s*(?:[-*•]|\d+\.)\s*(?:\[[ xX]?\]\s*)?')
+
+
+class _Tally:
+    """What parse_plan counts in one block of lines: a week, or all the text outside weeks"""
+    __slots__ = ("emoji_counts", "word_count", "week_mentions", "phase_mentions", "tools", "phrases",
+                 "week_1", "week_12")
+
+    def __init__(self):
+        self.emoji_counts = dict.fromkeys(SECTION_EMOJIS, 0)
+        self.word_count = 0
+        self.week_mentions = 0
+        self.phase_mentions = 0
+        self.tools = set()
+        self.phrases = set()
+        self.week_1 = False
+        self.week_12 = False
+
+    def add(self, line):
+        """Count one line; section emojis are counted by the caller, which also records their offsets"""
+        self.word_count += len(line.split())
+        lowered = line.lower()
+        if "week " in lowered:
+            self.week_mentions += len(WEEK_MENTION_RE.findall(line))
+            if "Week 1" in line:
+                self.week_1 = True
+                self.week_12 = self.week_12 or "Week 12" in line
+        if "Phase " in line or "PHASE " in line:
+            self.phase_mentions += len(PHASE_MENTION_RE.findall(line))
+        for tool in TOOL_NAMES:
+            if tool in line:
+                self.tools.add(tool)
+        for phrase in TALLIED_PHRASES:
+            if phrase in lowered:
+                self.phrases.add(phrase)
+
+
+class Week:
+    __slots__ = ("number", "title", "phase", "start", "end", "_text", "_markers", "_sections", "_tally")
+
+    def __init__(self, number, title, phase, start, text):
+        self.number = number
+        self.title = title
+        self.phase = phase
+        self.start = start
+        self.end = start
+        self._text = text
+        self._markers = []
+        self._sections = None
+        self._tally = _Tally()
+
+    @property
+    def emoji_counts(self):
+        return self._tally.emoji_counts
+
+    @property
+    def word_count(self):
+        return self._tally.word_count
+
+    @property
+    def shortcuts(self):
+        return {phrase for phrase in SHORTCUT_PHRASES if phrase in self._tally.phrases}
+
+    @property
+    def missing_sections(self):
+        return [label for emoji, label in SECTION_EMOJIS.items() if not self.emoji_counts[emoji]]
+
+    @property
+    def markdown(self):
+        return self._text[self.start:self.end]
+
+    def _section(self, field):
+        # Section bodies are only cut out when first asked for, so bulk scoring never pays for them
+        if self._sections is None:
+            self._sections = _split_sections(self._text, self.end, self._markers)
+        return self._sections[field]
+
+    @property
+    def objectives(self):
+        return self._section("objectives")
+
+    @property
+    def milestones(self):
+        return self._section("milestones")
+
+    @property
+    def red_flag(self):
+        return self._section("red_flag")
+
+    @property
+    def coaching_notes(self):
+        return self._section("coaching_notes")
+
+    def __repr__(self):
+        return f"Week({self.number}, {self.title!r})"
+
+
+class Phase:
+    __slots__ = ("number", "title", "start", "weeks")
+
+    def __init__(self, number, title, start):
+        self.number = number
+        self.title = title
+        self.start = start
+        self.weeks = []
+
+    def __repr__(self):
+        return f"Phase({self.number}, {self.title!r}, {len(self.weeks)} weeks)"
+
+
+class Plan:
+    __slots__ = ("text", "preamble", "phases", "weeks", "word_count", "emoji_counts", "week_mentions",
+                 "phase_mentions", "tools", "shortcuts", "has_summary_language", "has_week_1", "has_week_12")
+
+    def __init__(self, text):
+        self.text = text
+        self.preamble = ""
+        self.phases = []
+        self.weeks = []
+        self.word_count = 0
+        self.emoji_counts = dict.fromkeys(SECTION_EMOJIS, 0)
+        self.week_mentions = 0
+        self.phase_mentions = 0
+        self.tools = set()
+        self.shortcuts = set()
+        self.has_summary_language = False
+        self.has_week_1 = False
+        self.has_week_12 = False
+
+    def week(self, number):
+        """First week section with this number, or None"""
+        return next((week for week in self.weeks if week.number == number), None)
+
+    def __repr__(self):
+        return f"Plan({len(self.phases)} phases, {len(self.weeks)} weeks, {self.word_count} words)"
+
+
+def _split_sections(text, end, markers):
+    """Split a week's text at its section emojis and return the cleaned content of each section"""
+    sections = {"objectives": [], "milestones": [], "red_flag": "", "coaching_notes": ""}
+    for i, (emoji, position) in enumerate(markers):
+        section_end = markers[i + 1][1] if i + 1 < len(markers) else end
+        body = SECTION_LABEL_RE.sub("", text[position + 1:section_end], count=1)
+        lines = [BULLET_RE.sub("", line).strip() for line in body.splitlines()]
+        lines = [line for line in lines if line]
+        field = SECTION_FIELDS[emoji]
+        if field in ("objectives", "milestones"):
+            sections[field].extend(lines)
+        elif lines:
+            sections[field] = " ".join([sections[field]] + lines if sections[field] else lines)
+    return sections
+
+
+def parse_plan(text):
+    """Parse the plan markdown once into the phase → week → section model.
+
+    One pass over the lines finds the headers and, line by line, tallies the
+    section emojis (with their offsets, for cutting sections later), words,
+    week and phase mentions, tools and summary or shortcut language into the
+    week the line belongs to, or into the text outside every week. The plan's
+    totals are the sum of those tallies, so every metric can be read off the
+    returned model without touching the text again.
+    """
+    plan = Plan(text or "")
+    text = plan.text
+    outside = _Tally()
+    tally, phase, week = outside, None, None
+    first_header = None
+    position = 0
+
+    for line in text.split("\n"):
+        header = HEADER_RE.match(line) if line.startswith(("#", "*")) else None
+        if header:
+            if first_header is None:
+                first_header = position
+            if week is not None:
+                week.end = position
+                tally, week = outside, None
+            title = line[header.end("number"):header.end()].strip(" \t\r*:-–—")
+            number = int(header.group("number"))
+            if header.group("kind").lower() == "phase":
+                phase = Phase(number, title, position)
+                plan.phases.append(phase)
+            else:
+                week = Week(number, title, phase.number if phase else None, position, text)
+                plan.weeks.append(week)
+                if phase is not None:
+                    phase.weeks.append(week)
+                tally = week._tally
+        for marker in SECTION_EMOJI_RE.finditer(line):
+            tally.emoji_counts[marker.group()] += 1
+            if week is not None:
+                week._markers.append((marker.group(), position + marker.start()))
+        tally.add(line)
+        position += len(line) + 1
+    if week is not None:
+        week.end = len(text)
+
+    plan.preamble = text[:first_header] if first_header is not None else text
+    tallies = [outside] + [week._tally for week in plan.weeks]
+    plan.word_count = sum(t.word_count for t in tallies)
+    plan.emoji_counts = {emoji: sum(t.emoji_counts[emoji] for t in tallies) for emoji in SECTION_EMOJIS}
+    plan.week_mentions = sum(t.week_mentions for t in tallies)
+    plan.phase_mentions = sum(t.phase_mentions for t in tallies)
+    plan.has_week_1 = any(t.week_1 for t in tallies)
+    plan.has_week_12 = any(t.week_12 for t in tallies)
+    plan.tools = set().union(*(t.tools for t in tallies))
+    phrases = set().union(*(t.phrases for t in tallies))
+    plan.has_summary_language = any(phrase in phrases for phrase in SUMMARY_PHRASES)
+    plan.shortcuts = {phrase for phrase in SHORTCUT_PHRASES if phrase in phrases}
+    return plan
@@ -0,0 +1,132 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from plan_metrics import add_usage, billed_model
+from plan_parser import parse_plan
+from plan_prompts import PHASES, build_phase_prompt, build_summary_prompt, build_system_prompt, build_user_prompt
+from plan_tokens import completion_budget
+
+SUMMARY_MAX_TOKENS = 600
+
+# How often a running plan calls its `check` while waiting on the parts
+CHECK_INTERVAL_SECONDS = 0.5
+
+RETRY_NOTE = ("\n\nIMPORTANT: A previous attempt was cut off before finishing. "
+              "Keep each section short so that every week fits.")
+
+
+def _count_weeks(text, first, last):
+    found = {week.number for week in parse_plan(text).weeks if not week.missing_sections}
+    return len(found & set(range(first, last + 1)))
+
+
+def _generate_part(client, system_prompt, user_prompt, expected_weeks, model, temperature,
+                   max_tokens, max_retries, timeout, check=None):
+    """Generate one part of the plan, retrying only this part if it comes back truncated"""
+    attempts = []
+    content = ""
+    for attempt in range(max_retries + 1):
+        if attempt and check:
+            check()
+        started = time.perf_counter()
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt + (RETRY_NOTE if attempt else "")}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+        choice = response.choices[0]
+        content = choice.message.content or ""
+        truncated = getattr(choice, "finish_reason", None) == "length"
+        if expected_weeks:
+            truncated = truncated or _count_weeks(content, *expected_weeks) < expected_weeks[1] - expected_weeks[0] + 1
+        attempts.append({
+            "seconds": time.perf_counter() - started,
+            "truncated": truncated,
+            "usage": getattr(response, "usage", None),
+            "model": billed_model(response, model),
+        })
+        if not truncated:
+            break
+    return content, attempts
+
+
+def _phase_budget(max_tokens, first, last, system_prompt, user_prompt, model):
+    """This phase's share of the plan's `max_tokens`, in proportion to the weeks it covers"""
+    total_weeks = PHASES[-1][3]
+    share = max(max_tokens - SUMMARY_MAX_TOKENS, 0) * (last - first + 1) // total_weeks
+    messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+    return completion_budget(messages, model, cap=share)
+
+
+def generate_plan_by_phase(client, ctx, model, temperature, max_tokens, max_retries=2,
+                           timeout=60, on_part_done=None, style=None, check=None):
+    """Generate the executive summary and each phase concurrently, then stitch them in order.
+
+    Every part shares the same system prompt and ends with the same hire
+    context, so the phases stay consistent with each other. `max_tokens` is
+    the budget for the whole plan (when falsy, what the context window leaves
+    after the single-request prompt): the summary gets SUMMARY_MAX_TOKENS and
+    each phase a share of the rest by weeks covered. A part that is cut off or
+    misses weeks is retried on its own, up to `max_retries` times. Returns
+    the stitched markdown and a per-part report.
+
+    `check` is called regularly while parts run; an exception it (or
+    `on_part_done`) raises cancels the parts not yet started and propagates
+    at once, without waiting for the requests in flight or stitching.
+    """
+    system_prompt = build_system_prompt(style)
+    if not max_tokens:
+        # Giving every phase the whole remainder would reserve several plans' worth of tokens at once
+        max_tokens = completion_budget([{"role": "system", "content": system_prompt},
+                                        {"role": "user", "content": build_user_prompt(ctx)}], model)
+    parts = [("Executive Summary", build_summary_prompt(ctx), None, SUMMARY_MAX_TOKENS)]
+    for phase in PHASES:
+        number, name, first, last = phase
+        user_prompt = build_phase_prompt(ctx, phase)
+        part_tokens = _phase_budget(max_tokens, first, last, system_prompt, user_prompt, model)
+        parts.append((f"Phase {number}: {name}", user_prompt, (first, last), part_tokens))
+
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=len(parts))
+    try:
+        futures = {
+            pool.submit(_generate_part, client, system_prompt, user_prompt, expected_weeks,
+                        model, temperature, part_tokens, max_retries, timeout, check): label
+            for label, user_prompt, expected_weeks, part_tokens in parts
+        }
+        # Callbacks run on the calling thread so they can safely update the UI
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=CHECK_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+                if on_part_done:
+                    on_part_done(futures[future])
+            if pending and check:
+                check()
+        results = [future.result() for future in futures]
+    except BaseException:
+        # Parts in flight finish in the background; their retries stop at the next check
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    report = {"seconds": time.perf_counter() - started, "parts": {}}
+    sections = []
+    for (label, _, expected_weeks, _), (content, attempts) in zip(parts, results):
+        sections.append(content.strip())
+        part = report["parts"][label] = {
+            "attempts": len(attempts),
+            "seconds": sum(a["seconds"] for a in attempts),
+            "complete": not attempts[-1]["truncated"],
+            "model": attempts[-1]["model"],
+            "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+        }
+        for attempt in attempts:
+            add_usage(part, attempt["usage"], attempt["model"])
+    return "\n\n".join(sections), report
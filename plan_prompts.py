@@ -0,0 +1,156 @@
+# One line per "Plan Style" option, appended after the shared system prompt so the long prefix stays cacheable
+STYLE_INSTRUCTIONS = {
+    "Detailed": "Provide comprehensive explanations and context for each element.",
+    "Concise": "Keep sections brief but actionable. Focus on key points only.",
+    "Bullet Points": "Use bullet point format for easy scanning and implementation."
+}
+
+# The three phases named in the plan structure: (number, name, first week, last week)
+PHASES = [
+    (1, "Foundation", 1, 4),
+    (2, "Application", 5, 8),
+    (3, "Ownership", 9, 12),
+]
+
+WEEK_FORMAT = """## Week X: [Specific Theme Name]
+📚 **Learning Objectives**
+- [specific, measurable objective 1]
+- [specific, measurable objective 2]
+
+✅ **Milestone Checklist**
+- [ ] [concrete deliverable 1]
+- [ ] [concrete deliverable 2]
+- [ ] [concrete deliverable 3]
+
+🚩 **Red Flag**
+[One specific warning sign if goals aren't met]
+
+🧭 **Manager Coaching Notes**
+[Specific guidance for manager's 1:1 this week]"""
+
+HR_ELEMENTS = """REQUIRED HR/ONBOARDING ELEMENTS (must include in Week 1-2):
+- Complete all new hire paperwork and documentation
+- Enroll in health insurance, 401k, and other benefits
+- Review employee handbook and company policies
+- Complete mandatory compliance training (security, harassment, etc.)
+- Set up IT accounts and equipment"""
+
+
+def tool_focus(company_stage):
+    """Business-critical tools worth training on at each company stage"""
+    if company_stage in ["Seed", "Series A"]:
+        return "HubSpot CRM, specialized support platforms"
+    if company_stage in ["Series B", "Growth"]:
+        return "Salesforce CRM, Zendesk, Gong, Gainsight"
+    return "Salesforce + Revenue Cloud, ServiceNow, advanced analytics platforms"
+
+
+def _plan_overview():
+    return "\n".join(f"- Phase {number}: {name} (Weeks {first}-{last})" for number, name, first, last in PHASES)
+
+
+# Every request starts with this exact text and nothing hire-specific, so the provider can cache the
+# prefix across users (OpenAI caches prompts of 1024+ tokens); task and context come after it
+SYSTEM_PROMPT = f"""You are an expert onboarding architect. You write 12-week onboarding plans, or the parts of one you are asked for.
+
+REQUIREMENTS:
+- A complete plan has exactly 12 weeks, numbered Week 1 through Week 12
+- Each week must have all 4 sections: Learning Objectives, Milestone Checklist, Red Flag, Manager Coaching Notes
+- Use the emojis: 📚 ✅ 🚩 🧭
+- No shortcuts, placeholders, or "continue this format" text allowed
+- If you start to run out of space, prioritize completing every requested week over lengthy descriptions
+
+PLAN STRUCTURE:
+- Executive Summary (2 paragraphs)
+{_plan_overview()}
+
+WEEK FORMAT - write every week using this exact format:
+
+{WEEK_FORMAT}
+
+{HR_ELEMENTS}
+
+BUSINESS TOOL TRAINING - Only include training for the business-critical tools named in the hire context.
+DO NOT include basic tool training for:
+- Slack/Teams (assume users know communication tools)
+- Email/Calendar (basic digital literacy assumed)
+- Basic computer skills or common workplace software
+
+GENERAL RULES:
+1. Each week must be completely different with unique objectives
+2. Progressive difficulty across the whole plan: Week 1 = HR/basics, Week 12 = advanced leadership
+3. Reference business-critical tools by name, not basic communication tools
+4. No shortcuts, placeholders, or "continue this format" language
+5. Focus on the hire's function, its responsibilities and success metrics
+
+The task comes next and the hire's context last; follow the task exactly."""
+
+
+def build_system_prompt(style=None):
+    """The static, byte-identical system prompt shared by every request, ending with the plan style if given"""
+    if style is None:
+        return SYSTEM_PROMPT
+    return f"{SYSTEM_PROMPT}\n\nSTYLE: {STYLE_INSTRUCTIONS[style]}"
+
+
+def context_block(ctx):
+    """The hire-specific part of a prompt, always placed at the very end; `ctx` uses the demo scenario keys"""
+    return f"""HIRE CONTEXT:
+Company: {ctx["company_name"].strip() or "the company"} ({ctx["company_stage"]} stage, {ctx["company_size"]} employees)
+Role: {ctx["role"].strip()} ({ctx["seniority"]} level in {ctx["function"]})
+Customer-facing: {"Yes" if ctx["is_customer_facing"] else "No"}
+Team size: {ctx["team_size"]}
+Manager Priorities: {ctx["manager_priorities"].strip()}
+Known Constraints: {ctx["known_constraints"].strip() or "None specified"}
+Business-critical tools for a {ctx["company_stage"]} company: {tool_focus(ctx["company_stage"])}
+Function focus: {ctx["function"]} responsibilities and success metrics"""
+
+
+FULL_PLAN_TASK = """TASK: Write the complete 12-week onboarding plan for the hire below.
+
+MANDATORY STRUCTURE - You must include ALL of these sections:
+- Executive Summary (2 paragraphs)
+- Phase 1: Foundation (Weeks 1-4)
+- Phase 2: Application (Weeks 5-8)
+- Phase 3: Ownership (Weeks 9-12)
+
+CRITICAL REQUIREMENTS:
+1. Write exactly 12 weeks - do not skip any weeks
+2. Include proper HR onboarding in early weeks
+3. Write all 12 weeks - do not summarize or use shortcuts"""
+
+SUMMARY_TASK = """TASK: We are writing a 12-week onboarding plan in separate parts. Write ONLY the Executive Summary for the hire below.
+
+Start with the heading "# Executive Summary" and write exactly 2 paragraphs describing the onboarding philosophy and what success looks like by Week 12.
+Do not write any weeks."""
+
+
+def _phase_task(phase):
+    number, name, first, last = phase
+    hr_note = "\nInclude the required HR/onboarding elements in Weeks 1-2." if first <= 2 else ""
+    return f"""TASK: We are writing a 12-week onboarding plan in separate parts. Write ONLY Phase {number}: {name} (Weeks {first}-{last}) for the hire below.
+
+Start with the heading "# Phase {number}: {name} (Weeks {first}-{last})", then write EVERY week from Week {first} through Week {last}.{hr_note}
+
+CRITICAL REQUIREMENTS:
+1. Write exactly weeks {first} to {last} - do not skip any weeks and do not write other phases
+2. Write all {last - first + 1} weeks - do not summarize or use shortcuts"""
+
+
+# Task text per phase, built once per process
+PHASE_TASKS = {phase: _phase_task(phase) for phase in PHASES}
+
+
+def build_user_prompt(ctx):
+    """Single-request prompt asking for the complete 12-week plan"""
+    return f"{FULL_PLAN_TASK}\n\n{context_block(ctx)}"
+
+
+def build_summary_prompt(ctx):
+    """Prompt for only the executive summary of a phase-by-phase plan"""
+    return f"{SUMMARY_TASK}\n\n{context_block(ctx)}"
+
+
+def build_phase_prompt(ctx, phase):
+    """Prompt for the weeks of a single phase; `phase` is one of PHASES"""
+    return f"{PHASE_TASKS[phase]}\n\n{context_block(ctx)}"
@@ -0,0 +1,84 @@
+from plan_parser import QUALITY_TOOLS, TOOL_NAMES, Plan, parse_plan
+
+MIN_PLAN_CHARS = 1500
+MIN_WEEK_MENTIONS = 10
+
+
+def _as_plan(plan):
+    return plan if isinstance(plan, Plan) else parse_plan(plan)
+
+
+def analyze_plan_quality(plan_text):
+    """Comprehensive analysis of the generated plan quality (accepts plan text or a parsed Plan)"""
+    if not plan_text:
+        return {}
+    plan = _as_plan(plan_text)
+    if not plan.text:
+        return {}
+
+    # Basic metrics
+    word_count = plan.word_count
+    milestones = plan.emoji_counts['✅']
+    red_flags = plan.emoji_counts['🚩']
+    coaching_notes = plan.emoji_counts['🧭']
+    learning_objectives = plan.emoji_counts['📚']
+    weekly_sections = plan.week_mentions
+
+    # Content quality checks
+    has_executive_summary = plan.has_summary_language
+    has_phase_headers = plan.phase_mentions >= 3
+    has_specific_tools = any(tool in plan.tools for tool in QUALITY_TOOLS)
+    has_progression = plan.has_week_1 and plan.has_week_12
+
+    # Calculate quality score
+    quality_factors = {
+        "Has 12 weekly sections": weekly_sections >= 12,
+        "Sufficient milestones": milestones >= 24,  # 2+ per week
+        "Red flags present": red_flags >= 12,  # 1 per week
+        "Coaching guidance": coaching_notes >= 12,  # 1 per week
+        "Learning objectives": learning_objectives >= 12,  # 1 per week
+        "Executive summary": has_executive_summary,
+        "Phase structure": has_phase_headers,
+        "Specific tools mentioned": has_specific_tools,
+        "Shows progression": has_progression,
+        "Adequate length": word_count >= 2000
+    }
+
+    quality_score = sum(quality_factors.values()) / len(quality_factors) * 100
+
+    metrics = {
+        "Word Count": word_count,
+        "Weekly Sections": weekly_sections,
+        "Milestones": milestones,
+        "Red Flags": red_flags,
+        "Coaching Notes": coaching_notes,
+        "Learning Objectives": learning_objectives,
+        "Quality Score": f"{quality_score:.0f}%",
+        "Quality Factors": quality_factors
+    }
+
+    return metrics
+
+
+def phase_distribution(plan_text):
+    """Weeks per phase for the first three phases, and whether they are balanced"""
+    plan = _as_plan(plan_text)
+    weeks_by_phase = [len(phase.weeks) for phase in plan.phases[:3]]  # Max 3 phases
+    balanced = len(weeks_by_phase) == 3 and all(w >= 3 for w in weeks_by_phase)
+    return weeks_by_phase, balanced
+
+
+def mentions_tools(plan_text):
+    return any(tool in _as_plan(plan_text).tools for tool in TOOL_NAMES)
+
+
+def plan_validation_error(plan_text):
+    """Reason the plan is unusable as generated, or None if it passes the hard checks"""
+    plan = _as_plan(plan_text)
+    if len(plan.text.strip()) < MIN_PLAN_CHARS:
+        return "Generated plan seems too short. Please try again or increase max tokens."
+    if plan.week_mentions < MIN_WEEK_MENTIONS:
+        return f"Plan only contains {plan.week_mentions} weeks instead of 12. Please regenerate."
+    if plan.shortcuts:
+        return "Plan contains shortcuts/placeholders instead of complete weeks. Please regenerate."
+    return None
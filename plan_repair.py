@@ -0,0 +1,163 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from plan_metrics import add_usage, billed_model
+from plan_parser import HEADER_RE, Plan, parse_plan
+from plan_prompts import PHASES, build_system_prompt, context_block
+
+TOTAL_WEEKS = 12
+
+# Weeks requested per repair call; small groups keep each call well inside max_tokens
+WEEKS_PER_REQUEST = 4
+TOKENS_PER_WEEK = 450
+
+PHASE_FIRST_WEEK = {number: first for number, _, first, _ in PHASES}
+
+
+def split_plan_blocks(plan_text):
+    """Split a plan into ordered blocks: ("preamble", None, text), ("phase", n, text) and ("week", n, text)"""
+    blocks = []
+    matches = list(HEADER_RE.finditer(plan_text))
+    first_start = matches[0].start() if matches else len(plan_text)
+    if plan_text[:first_start].strip():
+        blocks.append(("preamble", None, plan_text[:first_start]))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(plan_text)
+        kind = match.group(1).lower()
+        blocks.append((kind, int(match.group(2)), plan_text[match.start():end]))
+    return blocks
+
+
+def week_defect(week):
+    """Reason a parsed week is unusable, or None if it is complete"""
+    if week.missing_sections:
+        return "missing " + ", ".join(week.missing_sections)
+    if week.shortcuts:
+        return f'contains "{min(week.shortcuts)}"'
+    return None
+
+
+def find_plan_defects(plan_text):
+    """Work out which weeks have to be (re)written.
+
+    Returns {week_number: reason} for weeks that are missing, missing one of
+    the four emoji sections, or that contain shortcut/placeholder text.
+    """
+    plan = plan_text if isinstance(plan_text, Plan) else parse_plan(plan_text)
+    weeks = {}
+    for week in plan.weeks:
+        if 1 <= week.number <= TOTAL_WEEKS:
+            # A repeated week header is treated as one week; keep the first copy
+            weeks.setdefault(week.number, week)
+
+    defects = {}
+    for number in range(1, TOTAL_WEEKS + 1):
+        reason = "missing" if number not in weeks else week_defect(weeks[number])
+        if reason:
+            defects[number] = reason
+    return defects
+
+
+REPAIR_TASK = """TASK: An existing 12-week onboarding plan is missing some weeks. Write ONLY the weeks requested below.
+
+CRITICAL REQUIREMENTS:
+1. Write every requested week and nothing else - no introduction, summary or phase headers
+2. Each week must have all 4 sections: 📚 ✅ 🚩 🧭
+3. Keep the difficulty appropriate for the week's position in the plan (Week 1 = HR/basics, Week 12 = advanced leadership)
+4. Do not repeat the themes of the weeks that already exist"""
+
+
+def build_repair_prompt(ctx, week_numbers, existing_themes):
+    """Prompt asking for only the given weeks, with the rest of the plan's themes as context"""
+    weeks = ", ".join(str(n) for n in week_numbers)
+    themes = "\n".join(f"- {theme}" for theme in existing_themes) or "- (none yet)"
+    return f"""{REPAIR_TASK}
+
+Weeks to write: {weeks}
+
+Weeks that already exist:
+{themes}
+
+{context_block(ctx)}"""
+
+
+def merge_weeks(plan_text, new_weeks):
+    """Replace or insert week sections in place, keeping phase headers in front of their weeks"""
+    blocks = split_plan_blocks(plan_text)
+    pending = dict(new_weeks)
+    merged = []
+    for kind, number, text in blocks:
+        if kind == "week" and number in pending:
+            merged.append(pending.pop(number).rstrip() + "\n\n")
+            continue
+        if kind == "week" and number in new_weeks:
+            continue  # duplicate copy of a week we just replaced
+        # Missing weeks go in front of the first later week or the header of a later phase
+        boundary = number if kind == "week" else PHASE_FIRST_WEEK.get(number, 0) if kind == "phase" else 0
+        for missing in sorted(n for n in pending if n < boundary):
+            merged.append(pending.pop(missing).rstrip() + "\n\n")
+        merged.append(text if text.endswith("\n") else text + "\n\n")
+    for missing in sorted(pending):
+        merged.append(pending.pop(missing).rstrip() + "\n\n")
+    return "".join(merged).rstrip() + "\n"
+
+
+def _request_weeks(client, system_prompt, ctx, week_numbers, themes, model, temperature, timeout):
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": build_repair_prompt(ctx, week_numbers, themes)}
+        ],
+        temperature=temperature,
+        max_tokens=TOKENS_PER_WEEK * len(week_numbers) + 200,
+        timeout=timeout
+    )
+    written = {}
+    plan = parse_plan(response.choices[0].message.content or "")
+    for week in plan.weeks:
+        # Keep weeks that are structurally complete; any leftover shortcut text is caught next round
+        if week.number in week_numbers and not week.missing_sections:
+            written.setdefault(week.number, plan.text[week.start:week.end])
+    return written, getattr(response, "usage", None), billed_model(response, model)
+
+
+def repair_plan(client, ctx, plan_text, model, temperature, max_retries=2, timeout=60, style=None):
+    """Regenerate only the defective weeks of a plan and merge them back in place.
+
+    Weeks are requested in small concurrent batches; weeks that are still
+    defective after a round are requested again, at most `max_retries` more
+    times. Returns the repaired plan and a report of what was done.
+    """
+    system_prompt = build_system_prompt(style)
+    defects = find_plan_defects(plan_text)
+    report = {"defects": dict(defects), "rounds": 0, "requests": 0,
+              "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "seconds": 0.0}
+    started = time.perf_counter()
+
+    for _ in range(max_retries + 1):
+        if not defects:
+            break
+        themes = [f"Week {week.number}: {week.title}" for week in parse_plan(plan_text).weeks
+                  if week.number not in defects]
+        todo = sorted(defects)
+        batches = [todo[i:i + WEEKS_PER_REQUEST] for i in range(0, len(todo), WEEKS_PER_REQUEST)]
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            results = list(pool.map(
+                lambda batch: _request_weeks(client, system_prompt, ctx, batch, themes, model, temperature, timeout),
+                batches
+            ))
+
+        new_weeks = {}
+        for written, usage, served_by in results:
+            new_weeks.update(written)
+            add_usage(report, usage, served_by)
+        report["rounds"] += 1
+        report["requests"] += len(batches)
+
+        plan_text = merge_weeks(plan_text, new_weeks)
+        defects = find_plan_defects(plan_text)
+
+    report["remaining"] = defects
+    report["seconds"] = time.perf_counter() - started
+    return plan_text, report
@@ -0,0 +1,284 @@
+import threading
+import time
+
+import numpy as np
+
+from plan_metrics import add_usage, billed_model
+from plan_parser import parse_plan
+from plan_prompts import build_system_prompt, context_block
+from plan_repair import TOKENS_PER_WEEK, merge_weeks, split_plan_blocks
+
+# Text fields compared by similarity, with their weight in the combined vector
+TEXT_FIELDS = {"role": 1.0, "manager_priorities": 2.0, "known_constraints": 1.0}
+
+# Fields that must match exactly for a stored plan to be considered at all
+PARTITION_FIELDS = ("seniority", "function", "company_stage")
+
+NGRAM_SIZES = (3, 4)
+DIM = 256
+DF_BITS = 20
+
+# Offer stored plans at or above this cosine similarity
+SIMILARITY_THRESHOLD = 0.75
+MIN_REUSE_QUALITY = 70
+
+# The adaptation rewrites at most this many weeks; the rest are kept verbatim
+ADAPT_MAX_WEEKS = 6
+
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _normalize(text):
+    return " " + " ".join((text or "").lower().split()) + " "
+
+
+def _ngram_hashes(texts):
+    """Hashed character n-grams of a batch of texts as (doc index, hash) arrays.
+
+    All texts are encoded into one byte buffer separated by NUL bytes, so the
+    n-grams of a whole batch come out of a few vectorized numpy operations.
+    """
+    encoded = [_normalize(t).encode("utf-8") for t in texts]
+    data = np.frombuffer(b"\0".join(encoded) + b"\0", dtype=np.uint8).astype(np.uint64)
+    lengths = np.array([len(e) + 1 for e in encoded], dtype=np.int64)
+    doc_of = np.repeat(np.arange(len(texts)), lengths)
+
+    docs, hashes = [], []
+    for n in NGRAM_SIZES:
+        count = len(data) - n + 1
+        if count <= 0:
+            continue
+        codes = np.full(count, n, dtype=np.uint64)
+        valid = np.ones(count, dtype=bool)
+        for offset in range(n):
+            window = data[offset:offset + count]
+            codes = (codes << np.uint64(8)) | window
+            valid &= window != 0
+        docs.append(doc_of[:count][valid])
+        hashes.append(codes[valid] * _HASH_MULTIPLIER)
+    if not docs:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+    return np.concatenate(docs), np.concatenate(hashes)
+
+
+def _df_buckets(hashes):
+    return (hashes >> np.uint64(64 - DF_BITS)).astype(np.int64)
+
+
+class ContextIndex:
+    """Nearest-neighbour search over the input contexts of stored plans.
+
+    Each context becomes a TF-IDF vector of character 3/4-grams over role,
+    priorities and constraints, projected to DIM dimensions with signed
+    feature hashing (which preserves cosine similarity on average). Vectors
+    are grouped by exact (seniority, function, company_stage), so a lookup is
+    one matrix-vector product over a single partition.
+
+    IDF weights are taken from the document frequencies at the time a
+    context is added; rebuild the index to re-weight old entries.
+    """
+
+    def __init__(self, dim=DIM):
+        self.dim = dim
+        self._df = np.zeros(1 << DF_BITS, dtype=np.int32)
+        self._docs = 0
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._docs
+
+    def _vectorize(self, contexts):
+        """Combined, L2-normalised context vectors for a batch of contexts"""
+        combined = np.zeros((len(contexts), self.dim), dtype=np.float32)
+        for field, weight in TEXT_FIELDS.items():
+            docs, hashes = _ngram_hashes([ctx.get(field) or "" for ctx in contexts])
+            idf = np.log((1.0 + self._docs) / (1.0 + self._df[_df_buckets(hashes)])) + 1.0
+            bucket = ((hashes >> np.uint64(24)) % np.uint64(self.dim)).astype(np.int64)
+            sign = np.where((hashes >> np.uint64(23)) & np.uint64(1), 1.0, -1.0)
+            vectors = np.bincount(docs * self.dim + bucket, weights=sign * idf,
+                                  minlength=len(contexts) * self.dim).reshape(len(contexts), self.dim)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            combined += (weight * vectors / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+        norms = np.linalg.norm(combined, axis=1, keepdims=True)
+        return combined / np.where(norms > 0, norms, 1.0)
+
+    def _count_documents(self, contexts):
+        for field in TEXT_FIELDS:
+            docs, hashes = _ngram_hashes([ctx.get(field) or "" for ctx in contexts])
+            # Each n-gram counts once per document: sort (doc, bucket) keys and drop repeats
+            pairs = np.sort(docs.astype(np.uint64) << np.uint64(DF_BITS) | _df_buckets(hashes).astype(np.uint64))
+            pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))] if len(pairs) else pairs
+            self._df += np.bincount((pairs & np.uint64((1 << DF_BITS) - 1)).astype(np.int64),
+                                    minlength=1 << DF_BITS).astype(np.int32)
+        self._docs += len(contexts)
+
+    def add_many(self, entries, batch_size=20000):
+        """Index (plan_id, quality_score, ctx) tuples"""
+        entries = list(entries)
+        with self._lock:
+            # Document frequencies first, so a freshly built index weights every entry alike
+            for start in range(0, len(entries), batch_size):
+                self._count_documents([ctx for _, _, ctx in entries[start:start + batch_size]])
+            for start in range(0, len(entries), batch_size):
+                batch = entries[start:start + batch_size]
+                vectors = self._vectorize([ctx for _, _, ctx in batch])
+                groups = {}
+                for row, (_, _, ctx) in enumerate(batch):
+                    groups.setdefault(tuple(ctx.get(field) for field in PARTITION_FIELDS), []).append(row)
+                for key, rows in groups.items():
+                    if key not in self._partitions:
+                        self._partitions[key] = _Partition(self.dim)
+                    self._partitions[key].extend([batch[r][0] for r in rows], [batch[r][1] for r in rows],
+                                                 vectors[rows])
+
+    def add(self, plan_id, quality_score, ctx):
+        self.add_many([(plan_id, quality_score, ctx)])
+
+    def nearest(self, ctx, k=3, min_similarity=SIMILARITY_THRESHOLD, min_quality=MIN_REUSE_QUALITY):
+        """Most similar stored contexts with the same seniority, function and stage.
+
+        Returns up to `k` dicts with id, similarity and quality_score, best first.
+        """
+        key = tuple(ctx.get(field) for field in PARTITION_FIELDS)
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None or not partition.size:
+                return []
+            query = self._vectorize([ctx])[0]
+            ids, scores, similarities = partition.search(query)
+
+        eligible = similarities >= min_similarity
+        if min_quality is not None:
+            eligible &= scores >= min_quality
+        candidates = np.flatnonzero(eligible)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-similarities[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-similarities[candidates], kind="stable")]
+        return [{"id": int(ids[i]), "similarity": float(similarities[i]), "quality_score": int(scores[i])}
+                for i in candidates]
+
+
+class _Partition:
+    """Growable arrays of ids, quality scores and vectors for one exact-match group"""
+
+    def __init__(self, dim):
+        self.size = 0
+        self.ids = np.zeros(16, dtype=np.int64)
+        self.scores = np.zeros(16, dtype=np.int32)
+        self.vectors = np.zeros((16, dim), dtype=np.float32)
+
+    def extend(self, ids, scores, vectors):
+        needed = self.size + len(ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids))
+            self.ids = np.resize(self.ids, capacity)
+            self.scores = np.resize(self.scores, capacity)
+            self.vectors = np.resize(self.vectors, (capacity, self.vectors.shape[1]))
+        self.ids[self.size:needed] = ids
+        self.scores[self.size:needed] = [-1 if score is None else score for score in scores]
+        self.vectors[self.size:needed] = vectors
+        self.size = needed
+
+    def search(self, query):
+        n = self.size
+        return self.ids[:n], self.scores[:n], self.vectors[:n] @ query
+
+
+def index_from_store(store):
+    """Build a ContextIndex over every plan in a PlanStore"""
+    started = time.perf_counter()
+    index = ContextIndex()
+    index.add_many(store.contexts())
+    index.build_seconds = time.perf_counter() - started
+    return index
+
+
+def context_differences(base_ctx, ctx):
+    """Human-readable list of the fields that changed between two contexts"""
+    labels = {"company_name": "Company", "role": "Role", "company_size": "Company size", "team_size": "Team size",
+              "is_customer_facing": "Customer-facing", "manager_priorities": "Manager priorities",
+              "known_constraints": "Known constraints"}
+    changes = []
+    for field, label in labels.items():
+        old, new = base_ctx.get(field), ctx.get(field)
+        if isinstance(new, str):
+            old, new = (old or "").strip(), new.strip()
+        if old != new:
+            changes.append(f"- {label}: was \"{old}\", now \"{new}\"")
+    return changes
+
+
+ADAPT_TASK = f"""TASK: An existing 12-week onboarding plan was written for a very similar hire. Adapt it to the hire below.
+
+Write:
+1. A new "# Executive Summary" (2 paragraphs) for the new context
+2. ONLY the weeks whose content must change because of the differences listed below - at most {ADAPT_MAX_WEEKS} weeks
+
+CRITICAL REQUIREMENTS:
+1. Do not write weeks that can stay as they are - they are kept from the existing plan
+2. Each rewritten week must have all 4 sections: 📚 ✅ 🚩 🧭
+3. Keep each week's position in the plan (Week 1 = HR/basics, Week 12 = advanced leadership)"""
+
+
+def build_adaptation_prompt(ctx, base_ctx, base_themes):
+    """Prompt asking for only the parts of a similar plan that must change for the new hire"""
+    changes = "\n".join(context_differences(base_ctx, ctx)) or "- Only minor wording changes"
+    themes = "\n".join(f"- {theme}" for theme in base_themes)
+    return f"""{ADAPT_TASK}
+
+What changed for the new hire:
+{changes}
+
+The existing plan's weeks:
+{themes}
+
+{context_block(ctx)}"""
+
+
+def adapt_plan(client, base_ctx, base_text, ctx, model, temperature, timeout=60, style=None):
+    """Turn a stored plan into one for `ctx` by rewriting only what differs.
+
+    One request returns a new executive summary plus the changed weeks,
+    which are merged into the stored plan in place. Returns the adapted plan
+    and a report with the rewritten weeks and token usage.
+    """
+    started = time.perf_counter()
+    base_name, new_name = (base_ctx.get("company_name") or "").strip(), (ctx.get("company_name") or "").strip()
+    if base_name and new_name and base_name != new_name:
+        base_text = base_text.replace(base_name, new_name)
+
+    themes = [f"Week {week.number}: {week.title}" for week in parse_plan(base_text).weeks]
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": build_system_prompt(style)},
+            {"role": "user", "content": build_adaptation_prompt(ctx, base_ctx, themes)}
+        ],
+        temperature=temperature,
+        max_tokens=TOKENS_PER_WEEK * ADAPT_MAX_WEEKS + 600,
+        timeout=timeout
+    )
+    rewrite = parse_plan(response.choices[0].message.content or "")
+    new_weeks = {}
+    for week in rewrite.weeks:
+        if 1 <= week.number <= 12 and not week.missing_sections:
+            new_weeks.setdefault(week.number, rewrite.text[week.start:week.end])
+
+    adapted = merge_weeks(base_text, new_weeks)
+    summary = rewrite.preamble.strip()
+    if summary:
+        blocks = split_plan_blocks(adapted)
+        if blocks and blocks[0][0] == "preamble":
+            adapted = summary + "\n\n" + adapted[len(blocks[0][2]):]
+        else:
+            adapted = summary + "\n\n" + adapted
+
+    report = {
+        "rewritten_weeks": sorted(new_weeks),
+        "summary_rewritten": bool(summary),
+        "model": billed_model(response, model),
+        "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+        "seconds": time.perf_counter() - started,
+    }
+    return adapted, add_usage(report, getattr(response, "usage", None), report["model"])
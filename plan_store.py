@@ -0,0 +1,202 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+
+CONTEXT_FIELDS = ["company_name", "role", "seniority", "function", "company_size", "company_stage",
+                  "team_size", "is_customer_facing", "manager_priorities", "known_constraints"]
+
+# Columns returned by listings; the plan body and week JSON are only read by get()
+SUMMARY_FIELDS = ["id", "created_at", "company_name", "role", "seniority", "function", "company_stage",
+                  "model", "mode", "quality_score", "word_count", "weeks"]
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS plans ("
+    "id INTEGER PRIMARY KEY, created_at REAL NOT NULL, cache_key TEXT, "
+    "company_name TEXT, role TEXT, seniority TEXT, function TEXT, company_size TEXT, company_stage TEXT, "
+    "team_size INTEGER, is_customer_facing INTEGER, manager_priorities TEXT, known_constraints TEXT, "
+    "model TEXT, mode TEXT, quality_score INTEGER, word_count INTEGER, weeks INTEGER, "
+    "structure TEXT, metrics TEXT, body TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS plans_role ON plans (role COLLATE NOCASE, quality_score DESC)",
+    "CREATE INDEX IF NOT EXISTS plans_function ON plans (function, quality_score DESC)",
+    "CREATE INDEX IF NOT EXISTS plans_stage ON plans (company_stage, quality_score DESC)",
+    "CREATE INDEX IF NOT EXISTS plans_score ON plans (quality_score DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS plans_cache_key ON plans (cache_key)",
+]
+
+# External-content FTS index kept in sync by triggers, so plan bodies are stored once
+FTS_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS plans_fts USING fts5("
+    "role, manager_priorities, body, content='plans', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS plans_ai AFTER INSERT ON plans BEGIN "
+    "INSERT INTO plans_fts (rowid, role, manager_priorities, body) "
+    "VALUES (new.id, new.role, new.manager_priorities, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS plans_ad AFTER DELETE ON plans BEGIN "
+    "INSERT INTO plans_fts (plans_fts, rowid, role, manager_priorities, body) "
+    "VALUES ('delete', old.id, old.role, old.manager_priorities, old.body); END",
+]
+
+# How many of the most recent full-text matches are ranked by relevance
+RANK_CANDIDATES = 2000
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    tokens = TOKEN_RE.findall(text or "")
+    if not tokens:
+        return None
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def quality_score(metrics):
+    """analyze_plan_quality reports the score as "85%"; store it as a number so it can be indexed"""
+    score = metrics.get("Quality Score")
+    return int(str(score).rstrip("%")) if score is not None else None
+
+
+def plan_structure(parsed):
+    """Compact week outline of a parsed plan, stored alongside the markdown"""
+    return [
+        {"week": week.number, "title": week.title, "phase": week.phase, "words": week.word_count,
+         "missing": week.missing_sections}
+        for week in parsed.weeks
+    ]
+
+
+class PlanStore:
+    """Every generated plan with its input context, week outline and quality metrics.
+
+    Listings are served from the composite (filter column, quality_score)
+    indexes and full-text search from an FTS5 index over role, priorities and
+    the plan body, so both stay index lookups as the table grows. Listings
+    never read the plan body; get() fetches one plan by id.
+    """
+
+    def __init__(self, db_path="plans.sqlite3"):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        try:
+            for statement in FTS_SCHEMA:
+                self._db.execute(statement)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to LIKE over role and priorities
+            self.has_fts = False
+        self._db.commit()
+
+    def save(self, ctx, text, parsed=None, metrics=None, model=None, mode=None, cache_key=None):
+        """Store one plan; returns its id"""
+        metrics = metrics or {}
+        row = {field: ctx.get(field) for field in CONTEXT_FIELDS}
+        row["is_customer_facing"] = int(bool(row["is_customer_facing"]))
+        row.update({
+            "created_at": time.time(), "cache_key": cache_key, "model": model, "mode": mode,
+            "quality_score": quality_score(metrics),
+            "word_count": parsed.word_count if parsed is not None else len(text.split()),
+            "weeks": len(parsed.weeks) if parsed is not None else None,
+            "structure": json.dumps(plan_structure(parsed)) if parsed is not None else None,
+            "metrics": json.dumps({k: v for k, v in metrics.items() if k != "Quality Factors"}),
+            "body": text,
+        })
+        columns = list(row)
+        with self._lock:
+            cursor = self._db.execute(
+                f"INSERT INTO plans ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [row[c] for c in columns],
+            )
+            self._db.commit()
+        return cursor.lastrowid
+
+    def get(self, plan_id):
+        """The full stored plan (context, markdown, outline and metrics), or None"""
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM plans WHERE id = ?", (plan_id,))
+            row = cursor.fetchone()
+            names = [d[0] for d in cursor.description]
+        if row is None:
+            return None
+        plan = dict(zip(names, row))
+        plan["is_customer_facing"] = bool(plan["is_customer_facing"])
+        plan["structure"] = json.loads(plan["structure"]) if plan["structure"] else []
+        plan["metrics"] = json.loads(plan["metrics"]) if plan["metrics"] else {}
+        plan["context"] = {field: plan[field] for field in CONTEXT_FIELDS}
+        return plan
+
+    def contexts(self, after_id=0):
+        """(id, quality_score, context) for every stored plan, oldest first; used to build the reuse index"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, quality_score, {', '.join(CONTEXT_FIELDS)} FROM plans WHERE id > ? ORDER BY id",
+                (after_id,),
+            ).fetchall()
+        return [(row[0], row[1], dict(zip(CONTEXT_FIELDS, row[2:]))) for row in rows]
+
+    def latest_for_cache_key(self, cache_key):
+        with self._lock:
+            row = self._db.execute("SELECT id FROM plans WHERE cache_key = ? ORDER BY id DESC LIMIT 1",
+                                   (cache_key,)).fetchone()
+        return row[0] if row else None
+
+    def _where(self, role, function, company_stage, min_score):
+        clauses, params = [], []
+        if role:
+            clauses.append("p.role = ? COLLATE NOCASE")
+            params.append(role)
+        if function:
+            clauses.append("p.function = ?")
+            params.append(function)
+        if company_stage:
+            clauses.append("p.company_stage = ?")
+            params.append(company_stage)
+        if min_score is not None:
+            clauses.append("p.quality_score >= ?")
+            params.append(min_score)
+        return clauses, params
+
+    def search(self, query=None, role=None, function=None, company_stage=None, min_score=None, limit=20, offset=0):
+        """Plan summaries matching the filters, best first.
+
+        With a text query results are ranked by FTS relevance, otherwise by
+        quality score. Returns dicts with SUMMARY_FIELDS.
+        """
+        clauses, params = self._where(role, function, company_stage, min_score)
+        columns = ", ".join(f"p.{field}" for field in SUMMARY_FIELDS)
+        match = fts_query(query)
+
+        if match and self.has_fts:
+            # Rank only the newest RANK_CANDIDATES matches: FTS yields rowids in order, so a common
+            # word costs the same as a rare one instead of scoring every matching plan
+            sql = (f"SELECT {', '.join(SUMMARY_FIELDS)} FROM ("
+                   f"SELECT {columns}, bm25(plans_fts, 4.0, 2.0, 1.0) AS relevance "
+                   f"FROM plans_fts JOIN plans p ON p.id = plans_fts.rowid "
+                   f"WHERE plans_fts MATCH ?{''.join(' AND ' + c for c in clauses)} "
+                   "ORDER BY plans_fts.rowid DESC LIMIT ?) ORDER BY relevance LIMIT ? OFFSET ?")
+            params = [match] + params + [RANK_CANDIDATES]
+        else:
+            if match:
+                clauses.append("(p.role LIKE ? OR p.manager_priorities LIKE ?)")
+                params += [f"%{query.strip()}%"] * 2
+            where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+            sql = f"SELECT {columns} FROM plans p {where}ORDER BY p.quality_score DESC, p.id DESC LIMIT ? OFFSET ?"
+
+        with self._lock:
+            rows = self._db.execute(sql, params + [limit, offset]).fetchall()
+        return [dict(zip(SUMMARY_FIELDS, row)) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def delete(self, plan_id):
+        with self._lock:
+            self._db.execute("DELETE FROM plans WHERE id = ?", (plan_id,))
+            self._db.commit()
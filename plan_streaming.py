@@ -0,0 +1,142 @@
+import re
+import time
+
+from plan_metrics import billed_model
+
+# Placeholders that mean the model stopped writing the plan; only these cancel a stream
+PLACEHOLDER_PHRASES = ['continue this format', 'repeat for weeks', '[note:']
+
+# Shortcut language flagged after generation; the generic ones also turn up in normal prose, so repair handles them
+SHORTCUT_PHRASES = PLACEHOLDER_PHRASES + ['etc.', '...']
+
+SECTION_EMOJIS = {"✅": "Milestones", "🚩": "Red Flags", "🧭": "Coaching Notes", "📚": "Learning Objectives"}
+
+# A week header only counts once its line is complete, so "## Week 1" is never mistaken for "## Week 12"
+WEEK_HEADER_RE = re.compile(r'^#{1,4}\s*Week\s+(\d+)\b[^\n]*\n', re.MULTILINE | re.IGNORECASE)
+
+# Abort if we are this far into the plan and still have not seen a single milestone
+MILESTONE_DEADLINE_WEEK = 6
+
+
+class PlanStreamAborted(Exception):
+    """Raised when a streaming plan is clearly going wrong and the request was cancelled"""
+
+    def __init__(self, reason, partial_text):
+        super().__init__(reason)
+        self.reason = reason
+        self.partial_text = partial_text
+
+
+class StreamingPlanMonitor:
+    """Incrementally splits a streaming plan into week sections and tracks quality signals.
+
+    Each delta is scanned once: emoji counts are updated from the delta alone,
+    placeholder phrases are checked against the delta plus a short tail of the
+    previous text (so phrases split across chunks are still caught), and week
+    headers are searched only from the end of the last completed header.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.counts = {label: 0 for label in SECTION_EMOJIS.values()}
+        self.current_week = 0
+        self.weeks_completed = 0
+        self.abort_reason = None
+        self.usage = None
+        self.model = None
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.first_week_at = None
+        self._section_start = 0
+        self._scan_from = 0
+        self._tail = ""
+        self._tail_len = max(len(p) for p in PLACEHOLDER_PHRASES) - 1
+
+    def feed(self, delta):
+        """Add a chunk of model output; returns the sections completed by it"""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.text += delta
+
+        for emoji, label in SECTION_EMOJIS.items():
+            self.counts[label] += delta.count(emoji)
+
+        window = (self._tail + delta).lower()
+        for phrase in PLACEHOLDER_PHRASES:
+            if phrase in window:
+                self.abort_reason = f'Plan contains placeholder text ("{phrase}") instead of complete weeks'
+                break
+        self._tail = window[-self._tail_len:]
+
+        completed = []
+        for match in WEEK_HEADER_RE.finditer(self.text, self._scan_from):
+            section = self.text[self._section_start:match.start()]
+            if section.strip():
+                completed.append(section)
+                if self.current_week:
+                    self.weeks_completed += 1
+                    if self.first_week_at is None:
+                        self.first_week_at = time.perf_counter()
+            self._section_start = match.start()
+            self._scan_from = match.end()
+            self.current_week = int(match.group(1))
+
+        if (self.abort_reason is None and self.current_week > MILESTONE_DEADLINE_WEEK
+                and self.counts["Milestones"] == 0):
+            self.abort_reason = f"Reached Week {self.current_week} without a single ✅ milestone"
+        return completed
+
+    def finish(self):
+        """Flush the final (still open) section once the stream has ended"""
+        section = self.text[self._section_start:]
+        self._section_start = len(self.text)
+        if section.strip() and self.current_week:
+            self.weeks_completed += 1
+            if self.first_week_at is None:
+                self.first_week_at = time.perf_counter()
+        return section
+
+    @property
+    def time_to_first_token(self):
+        return None if self.first_token_at is None else self.first_token_at - self.started_at
+
+    @property
+    def time_to_first_week(self):
+        return None if self.first_week_at is None else self.first_week_at - self.started_at
+
+
+def consume_plan_stream(stream, on_section=None, on_progress=None):
+    """Drain a streaming chat completion, reporting finished sections as they arrive.
+
+    Raises PlanStreamAborted (after closing the HTTP stream so no more tokens
+    are billed) as soon as the monitor decides the plan is unusable.
+    """
+    monitor = StreamingPlanMonitor()
+    try:
+        for chunk in stream:
+            # With stream_options={"include_usage": True} the final chunk carries the token counts
+            if getattr(chunk, "usage", None) is not None:
+                monitor.usage = chunk.usage
+            if monitor.model is None:
+                monitor.model = billed_model(chunk, None)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            for section in monitor.feed(delta):
+                if on_section:
+                    on_section(section)
+            if on_progress:
+                on_progress(monitor)
+            if monitor.abort_reason:
+                raise PlanStreamAborted(monitor.abort_reason, monitor.text)
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+
+    section = monitor.finish()
+    if section.strip() and on_section:
+        on_section(section)
+    return monitor
@@ -0,0 +1,55 @@
+from functools import lru_cache
+
+from rate_limiter import CHARS_PER_TOKEN, MAX_COMPLETION_TOKENS
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Total tokens (prompt + completion) each model accepts; completion caps are in MAX_COMPLETION_TOKENS
+CONTEXT_WINDOWS = {"gpt-4": 8192, "gpt-3.5-turbo": 16385}
+
+# Chat formatting overhead: tokens per message plus the tokens that prime the reply
+TOKENS_PER_MESSAGE = 3
+REPLY_PRIMING_TOKENS = 3
+
+# Left unused so a miscount of a few tokens never makes the API reject the request
+BUDGET_MARGIN = 64
+
+# A budget below this leaves no room for a useful plan; send the request anyway and let repair fill gaps
+MIN_COMPLETION_TOKENS = 1000
+
+EXACT = tiktoken is not None
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model="gpt-4"):
+    """Tokens in `text` for `model`: exact with tiktoken installed, otherwise a character estimate"""
+    if tiktoken is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(_encoding(model).encode(text))
+
+
+def message_tokens(messages, model="gpt-4"):
+    """Prompt tokens a chat request will be billed for"""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "", model)
+               for message in messages) + REPLY_PRIMING_TOKENS
+
+
+def completion_budget(messages, model, cap=None):
+    """max_tokens that uses what the context window has left after the prompt, limited by `cap`"""
+    limits = [CONTEXT_WINDOWS.get(model, 8192) - message_tokens(messages, model) - BUDGET_MARGIN]
+    if not EXACT:
+        # Character estimates can be well off for emoji-heavy prompts: leave extra headroom
+        limits[0] -= limits[0] // 10
+    limits += [limit for limit in (MAX_COMPLETION_TOKENS.get(model), cap) if limit]
+    return max(MIN_COMPLETION_TOKENS, min(limits))
+
@@ -0,0 +1,293 @@
+import random
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+# Rough size of a token for English prose; good enough to budget requests before sending them
+CHARS_PER_TOKEN = 4
+
+# "model=rpm/tpm" per model; OpenAI's usage-tier-1 quotas, override with the real ones for your org
+DEFAULT_RATE_LIMITS = "gpt-4=500/10000,gpt-3.5-turbo=3500/200000"
+
+# Cheaper model tried when a request would otherwise queue, and the completion cap that model accepts
+FALLBACK_MODELS = {"gpt-4": "gpt-3.5-turbo"}
+MAX_COMPLETION_TOKENS = {"gpt-3.5-turbo": 4096}
+
+
+def estimate_request_tokens(messages, max_tokens, model=None):
+    """Upper-bound token cost of a chat request: prompt tokens plus the completion allowance.
+
+    Prompt tokens are counted with tiktoken when it is installed, otherwise
+    estimated at CHARS_PER_TOKEN.
+    """
+    # plan_tokens imports this module's constants
+    from plan_tokens import message_tokens
+    return message_tokens(messages, model or "gpt-4") + (max_tokens or 0)
+
+
+def admitted_request(response, kwargs):
+    """(model, max_tokens) a call was actually sent with: what the scheduler admitted, else `kwargs` as asked"""
+    admitted = getattr(response, "admitted", None) or kwargs
+    return admitted.get("model"), admitted.get("max_tokens")
+
+
+def parse_rate_limits(text):
+    """{"gpt-4": (rpm, tpm), ...} from "gpt-4=500/10000,gpt-3.5-turbo=3500/200000" (0 means unlimited)"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        model, _, rates = item.partition("=")
+        rpm, _, tpm = rates.partition("/")
+        limits[model.strip()] = (int(rpm or 0) or None, int(tpm or 0) or None)
+    return limits
+
+
+def retry_after_seconds(error):
+    """Server-suggested wait from a rate-limit error's headers, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except ValueError:
+            continue
+        return seconds / 1000 if header == "retry-after-ms" else seconds
+    return None
+
+
+class RateLimiter:
+    """Thread-safe token buckets for requests per minute and tokens per minute.
+
+    `acquire` blocks until both buckets can cover the request. After a
+    rate-limit error, `backoff` pauses every caller and lowers the effective
+    rates; they recover gradually as requests succeed again.
+    """
+
+    def __init__(self, rpm=None, tpm=None, min_rate_factor=0.25):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.min_rate_factor = min_rate_factor
+        self.rate_factor = 1.0
+        self._requests = float(rpm or 0)
+        self._tokens = float(tpm or 0)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm * self.rate_factor / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm * self.rate_factor / 60)
+
+    def _wait_time(self, tokens, now):
+        if now < self._paused_until:
+            return self._paused_until - now
+        waits = [0.0]
+        if self.rpm and self._requests < 1:
+            waits.append((1 - self._requests) * 60 / (self.rpm * self.rate_factor))
+        # A request larger than the whole bucket is admitted once the bucket is full
+        needed = min(tokens, self.tpm) if self.tpm else 0
+        if self.tpm and self._tokens < needed:
+            waits.append((needed - self._tokens) * 60 / (self.tpm * self.rate_factor))
+        return max(waits)
+
+    def wait_estimate(self, tokens=0):
+        """Seconds acquire(tokens) would block right now, not counting callers already waiting"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return self._wait_time(tokens, now)
+
+    def acquire(self, tokens=0):
+        """Block until a request costing `tokens` may be sent; returns the seconds waited"""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._wait_time(tokens, now)
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+        return time.monotonic() - started
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Refund the difference once a response reports its real usage, and ease off any backoff"""
+        with self._cond:
+            if self.tpm and actual_tokens is not None:
+                self._tokens = min(self.tpm, self._tokens + estimated_tokens - actual_tokens)
+            self.rate_factor = min(1.0, self.rate_factor * 1.05)
+            self._cond.notify_all()
+
+    def refund(self, tokens):
+        """Return a reservation whose request failed before the API could bill it"""
+        with self._cond:
+            if self.tpm:
+                self._tokens = min(self.tpm, self._tokens + tokens)
+            if self.rpm:
+                self._requests = min(self.rpm, self._requests + 1)
+            self._cond.notify_all()
+
+    def backoff(self, seconds):
+        """Pause all callers for `seconds` and slow the refill rate after a rate-limit error"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.rate_factor = max(self.min_rate_factor, self.rate_factor * 0.7)
+
+
+class TokenScheduler:
+    """Admission control shared by every chat completion a process sends with one API key.
+
+    OpenAI quotas are per model, so each model in `limits` ({model: (rpm,
+    tpm)}) gets its own RateLimiter; other models use `default`. Before
+    dispatch a request's cost is estimated from its prompt and max_tokens.
+    If admitting it would wait more than `max_wait` seconds, the scheduler
+    tries the model's fallback and only queues the request as sent when that
+    does not fit either. max_tokens is never lowered on its own: a plan cut
+    short is worth less than one that waited.
+    """
+
+    def __init__(self, limits=None, default=None, fallbacks=None, max_wait=5.0):
+        self.limiters = {model: RateLimiter(rpm, tpm) for model, (rpm, tpm) in (limits or {}).items()}
+        self.default = default or RateLimiter()
+        self.fallbacks = FALLBACK_MODELS if fallbacks is None else fallbacks
+        self.max_wait = max_wait
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def limiter(self, model):
+        return self.limiters.get(model, self.default)
+
+    def _candidates(self, kwargs):
+        yield kwargs, None
+        max_tokens = kwargs.get("max_tokens")
+        fallback = self.fallbacks.get(kwargs.get("model"))
+        if fallback:
+            cap = MAX_COMPLETION_TOKENS.get(fallback)
+            tokens = min(max_tokens, cap) if max_tokens and cap else max_tokens
+            yield {**kwargs, "model": fallback, "max_tokens": tokens}, "fallback"
+
+    def admit(self, kwargs):
+        """Pick what to send and reserve budget for it; returns (kwargs, limiter, estimated tokens)"""
+        messages = kwargs.get("messages", [])
+        chosen = None
+        for candidate, change in self._candidates(kwargs):
+            limiter = self.limiter(candidate.get("model"))
+            estimate = estimate_request_tokens(messages, candidate.get("max_tokens"), candidate.get("model"))
+            if limiter.wait_estimate(estimate) <= self.max_wait:
+                chosen = candidate, change, limiter, estimate
+                break
+        if chosen is None:
+            limiter = self.limiter(kwargs.get("model"))
+            chosen = kwargs, None, limiter, estimate_request_tokens(messages, kwargs.get("max_tokens"), kwargs.get("model"))
+        candidate, change, limiter, estimate = chosen
+        waited = limiter.acquire(estimate)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["queued"] += waited > 0.05
+            self._stats["wait_seconds"] += waited
+            if change:
+                self._stats[change] += 1
+        return candidate, limiter, estimate
+
+    def record_retry(self):
+        with self._lock:
+            self._stats["rate_limit_retries"] += 1
+
+    def summary(self):
+        """Requests admitted, how many queued or were downgraded, and total seconds spent waiting"""
+        with self._lock:
+            stats = dict(self._stats)
+        return {key: stats.get(key, 0) for key in ("requests", "queued", "wait_seconds", "fallback",
+                                                   "rate_limit_retries")}
+
+
+class _SettlingStream:
+    """Passes a streamed completion through and settles its estimate when the usage chunk arrives"""
+
+    def __init__(self, stream, limiter, estimate, admitted):
+        self._stream = stream
+        self._limiter = limiter
+        self._estimate = estimate
+        self._settled = False
+        self.admitted = admitted
+
+    def _settle(self, actual_tokens):
+        if not self._settled:
+            self._settled = True
+            self._limiter.settle(self._estimate, actual_tokens)
+
+    def __iter__(self):
+        for chunk in self._stream:
+            usage = getattr(chunk, "usage", None)
+            if usage is not None:
+                self._settle(getattr(usage, "total_tokens", None))
+            yield chunk
+        self._settle(None)
+
+    def close(self):
+        self._settle(None)
+        close = getattr(self._stream, "close", None)
+        if close:
+            close()
+
+
+class _RateLimitedCompletions:
+    def __init__(self, completions, scheduler, max_retries, base_delay):
+        self._completions = completions
+        self._scheduler = scheduler
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+
+    def create(self, **kwargs):
+        import openai
+
+        for attempt in range(self._max_retries + 1):
+            # Re-admitted on every attempt: after a backoff the request may fit again, or need downgrading
+            request, limiter, estimate = self._scheduler.admit(kwargs)
+            admitted = {"model": request.get("model"), "max_tokens": request.get("max_tokens")}
+            try:
+                response = self._completions.create(**request)
+            except openai.RateLimitError as e:
+                limiter.refund(estimate)
+                if attempt == self._max_retries:
+                    raise
+                self._scheduler.record_retry()
+                delay = retry_after_seconds(e) or self._base_delay * 2 ** attempt
+                limiter.backoff(delay * random.uniform(1.0, 1.5))
+                continue
+            except BaseException:
+                limiter.refund(estimate)
+                raise
+            if request.get("stream"):
+                return _SettlingStream(response, limiter, estimate, admitted)
+            usage = getattr(response, "usage", None)
+            limiter.settle(estimate, getattr(usage, "total_tokens", None))
+            # Callers key caches and metrics on what was sent, which a fallback may have changed
+            response.admitted = admitted
+            return response
+
+
+def rate_limited_client(client, limiter, max_retries=6, base_delay=2.0):
+    """Wrap an OpenAI client so every chat completion goes through `limiter`.
+
+    `limiter` is a TokenScheduler, or a single RateLimiter shared by every
+    model. Each response (or stream) carries the model and max_tokens it was
+    sent with as `admitted`; see admitted_request. Rate-limit errors are retried with jittered exponential backoff
+    (or the server's retry-after hint) instead of being raised to the caller.
+    """
+    if not isinstance(limiter, TokenScheduler):
+        # A bare limiter only queues: never swap the model behind the caller's back
+        limiter = TokenScheduler(default=limiter, fallbacks={}, max_wait=float("inf"))
+    completions = _RateLimitedCompletions(client.chat.completions, limiter, max_retries, base_delay)
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
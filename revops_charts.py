@@ -0,0 +1,72 @@
+import json
+
+import altair as alt
+import pandas as pd
+
+# Most rows embedded in any one chart spec; everything sent to the browser is reduced to this first
+MAX_CHART_ROWS = 40
+
+OTHER_LABEL = "Other"
+
+# Tried finest first; the first whose bins fit MAX_CHART_ROWS is used
+TIME_BINS = [("D", "Day"), ("W-MON", "Week"), ("MS", "Month"), ("QS", "Quarter"), ("YS", "Year")]
+
+
+def top_n(series, n=MAX_CHART_ROWS, other=OTHER_LABEL):
+    """The n - 1 largest values plus one bucket summing the rest, so a chart never has more than n bars"""
+    if len(series) <= n:
+        return series
+    ranked = series.sort_values(ascending=False)
+    return pd.concat([ranked.iloc[:n - 1], pd.Series([ranked.iloc[n - 1:].sum()], index=[other])])
+
+
+def bin_time_series(series, max_points=MAX_CHART_ROWS):
+    """Sum a date-indexed series into the finest of day/week/month/quarter/year bins that fit max_points.
+
+    Returns (binned series, bin label).
+    """
+    series = series.sort_index()
+    for frequency, label in TIME_BINS:
+        binned = series.resample(frequency, label="left", closed="left").sum()
+        if len(binned) <= max_points:
+            return binned, label
+    return binned.iloc[-max_points:], label
+
+
+def bar_spec(series, category, value, title=None, sort=None):
+    """Vega-Lite spec for a bar chart of an already reduced Series"""
+    data = top_n(series).rename_axis(category).reset_index(name=value)
+    data[category] = data[category].astype(str)
+    chart = alt.Chart(data).mark_bar().encode(
+        x=alt.X(f"{category}:N", title=category, sort=sort),
+        y=alt.Y(f"{value}:Q", title=value),
+    )
+    return (chart.properties(title=title) if title else chart).to_dict()
+
+
+def trend_spec(series, value, title=None):
+    """Vega-Lite spec for a date-indexed Series, binned to at most MAX_CHART_ROWS points"""
+    binned, label = bin_time_series(series)
+    data = binned.rename_axis(label).reset_index(name=value)
+    chart = alt.Chart(data).mark_bar().encode(
+        x=alt.X(f"{label}:T", title=label),
+        y=alt.Y(f"{value}:Q", title=value),
+    )
+    return (chart.properties(title=title) if title else chart).to_dict()
+
+
+def dashboard_charts(kpis):
+    """Every dashboard chart as a Vega-Lite spec built from the aggregates, never from raw rows"""
+    return {
+        "status": bar_spec(kpis["status_counts"], "Status", "Leads"),
+        "source": bar_spec(kpis["by_source"]["leads"], "Source", "Leads"),
+        "rep": bar_spec(kpis["by_rep"]["amount"], "Sales Rep", "Pipeline ($)", title="Pipeline by Rep"),
+        "stage": bar_spec(kpis["by_stage"]["count"], "Stage", "Opportunities"),
+        "trend": trend_spec(kpis["created_by_day"]["amount"], "New Pipeline ($)"),
+    }
+
+
+def spec_payload(spec):
+    """(rows embedded, bytes of JSON) a spec sends to the browser"""
+    rows = sum(len(values) for values in spec.get("datasets", {}).values())
+    return rows, len(json.dumps(spec, default=str))
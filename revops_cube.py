@@ -0,0 +1,111 @@
+import pandas as pd
+
+from revops_kpis import finalize_kpis, lead_conversion
+
+OPPORTUNITY_MEASURES = ["count", "amount", "weighted_amount", "days_sum", "days_count"]
+LEAD_MEASURES = ["leads", "score_sum", "score_count", "converted"]
+
+
+def week_start(dates):
+    """Monday of each date's week (midnight)"""
+    return (dates - pd.to_timedelta(dates.dt.dayofweek, unit="D")).dt.floor("D")
+
+
+def _flatten(cube):
+    # Dimension values as plain objects so slices group and merge like the partial aggregates
+    cube = cube.reset_index()
+    for column in cube.columns:
+        if isinstance(cube[column].dtype, pd.CategoricalDtype) or cube[column].dtype == "string":
+            cube[column] = cube[column].astype(object)
+    return cube
+
+
+def build_cube(leads, opps):
+    """Pre-aggregate both exports by rep × stage × source × created week.
+
+    Returns {"opportunities": ..., "leads": ...}: one row per non-empty cell
+    with additive measures, typically a few thousand rows however many the
+    exports hold. Opportunities take their source from their lead; leads
+    have no stage, so their cube is keyed by status instead.
+    """
+    opps = opps.assign(
+        week=week_start(opps["created_date"]),
+        _days=opps["days_in_stage"] if "days_in_stage" in opps else float("nan"),
+    )
+    if "lead_id" in leads and "lead_id" in opps:
+        lookup = leads.drop_duplicates("lead_id")
+        position = pd.Index(lookup["lead_id"]).get_indexer(opps["lead_id"])
+        source = lookup["source"].take(position.clip(min=0)).to_numpy()
+        opps["source"] = pd.Series(source, index=opps.index).where(position >= 0)
+    else:
+        opps["source"] = None
+    opportunity_cube = opps.groupby(["assigned_rep", "stage", "source", "week"], observed=True, dropna=False).agg(
+        count=("amount", "size"), amount=("amount", "sum"), weighted_amount=("weighted_amount", "sum"),
+        days_sum=("_days", "sum"), days_count=("_days", "count"))
+
+    converted = lead_conversion(leads, opps)
+    leads = leads.assign(
+        week=week_start(leads["created_date"]) if "created_date" in leads else pd.NaT,
+        assigned_rep=leads["assigned_rep"] if "assigned_rep" in leads else None,
+        converted=converted if converted is not None else 0,
+    )
+    lead_cube = leads.groupby(["assigned_rep", "source", "status", "week"], observed=True, dropna=False).agg(
+        leads=("source", "size"), score_sum=("lead_score", "sum"), score_count=("lead_score", "count"),
+        converted=("converted", "sum"))
+    return {
+        "opportunities": _flatten(opportunity_cube.astype("float64")),
+        "leads": _flatten(lead_cube.astype("float64")),
+        "has_conversion": converted is not None,
+    }
+
+
+def _mask(cells, start, end, reps, sources):
+    mask = pd.Series(True, index=cells.index)
+    if start is not None:
+        start = pd.Timestamp(start)
+        mask &= cells["week"] >= (start - pd.Timedelta(days=start.dayofweek)).floor("D")
+    if end is not None:
+        mask &= cells["week"] <= pd.Timestamp(end)
+    if reps:
+        mask &= cells["assigned_rep"].isin(reps)
+    if sources:
+        mask &= cells["source"].isin(sources)
+    return mask
+
+
+def _opportunity_cells(cube, start, end, reps, sources, stages):
+    opps = cube["opportunities"][_mask(cube["opportunities"], start, end, reps, sources)]
+    return opps[opps["stage"].isin(stages)] if stages else opps
+
+
+def cube_kpis(cube, start=None, end=None, reps=None, sources=None, stages=None, now=None):
+    """compute_kpis for a slice of the cube, in milliseconds.
+
+    Dates select whole created weeks, so recent activity is also counted in
+    whole weeks. The stage filter applies to opportunities only.
+    """
+    opps = _opportunity_cells(cube, start, end, reps, sources, stages)
+    leads = cube["leads"][_mask(cube["leads"], start, end, reps, sources)]
+
+    partials = {
+        "stage": opps.groupby("stage")[OPPORTUNITY_MEASURES].sum(),
+        "rep": opps.groupby("assigned_rep")[["count", "amount", "weighted_amount"]].sum(),
+        "daily": opps.groupby("week")[["count", "amount"]].sum(),
+        "source": leads.groupby("source")[["leads", "score_sum", "score_count"]].sum(),
+        "status": leads.groupby("status")[["leads"]].sum().rename(columns={"leads": "count"}),
+        "rows": {"leads": int(leads["leads"].sum()), "opportunities": int(opps["count"].sum())},
+    }
+    partials["status"] = partials["status"][partials["status"]["count"] > 0]
+    converted = leads.groupby("source")["converted"].sum() if cube["has_conversion"] else None
+    return finalize_kpis(partials, converted, now)
+
+
+def forecast_breakdown(cube, start=None, end=None, reps=None, sources=None, stages=None):
+    """Weighted pipeline by rep × stage × created month for a slice of the cube.
+
+    Weeks are assigned to the month they start in.
+    """
+    opps = _opportunity_cells(cube, start, end, reps, sources, stages)
+    month = opps["week"].dt.to_period("M").dt.start_time.rename("month")
+    table = opps.groupby(["assigned_rep", "stage", month])[["count", "amount", "weighted_amount"]].sum()
+    return table.reset_index().sort_values(["month", "weighted_amount"], ascending=[False, False], ignore_index=True)
@@ -0,0 +1,299 @@
+import hashlib
+import io
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+LEADS_CSV = os.path.join("data", "leads.csv")
+OPPORTUNITIES_CSV = os.path.join("data", "opportunities.csv")
+CACHE_DIR = os.path.join("data", ".cache")
+
+# Bump when preprocessing changes so stale columnar copies are rebuilt
+SCHEMA_VERSION = 2
+
+# Bytes hashed at the start and at the end of the already-read part of a CSV to tell appends from rewrites
+SIGNATURE_BYTES = 4096
+
+# Appended segments are merged into one once there are more than this many
+MAX_SEGMENTS = 8
+
+# Explicit dtypes for the columns the dashboard reads; other columns are loaded as pandas infers them
+LEAD_DTYPES = {
+    "lead_id": "string",
+    "source": "category",
+    "status": "category",
+    "assigned_rep": "category",
+    "lead_score": "float32",
+}
+LEAD_DATES = ["created_date"]
+
+OPPORTUNITY_DTYPES = {
+    "opportunity_id": "string",
+    "lead_id": "string",
+    "assigned_rep": "category",
+    "stage": "category",
+    "amount": "float64",
+    "probability": "float32",
+    "days_in_stage": "float32",
+}
+OPPORTUNITY_DATES = ["created_date", "close_date"]
+
+
+def file_fingerprint(path):
+    """(size, mtime_ns) of a file: cheap to read and changes whenever the export is rewritten or appended to"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def data_version(*paths):
+    """Identifies the current contents of the input files; caches key on this"""
+    return tuple((path, *file_fingerprint(path)) for path in paths)
+
+
+def preprocess_opportunities(opps):
+    opps["weighted_amount"] = opps["amount"] * (opps["probability"] / 100)
+    return opps
+
+
+def read_crm_csv(source, dtypes, date_columns, names=None, columns=None):
+    """Read a CRM export with explicit dtypes, falling back to coercion when a column has bad values.
+
+    `source` is a path or a binary file object; pass the header as `names`
+    when `source` holds only appended rows. `columns` limits parsing to the
+    columns listed (those missing from the file are skipped).
+    """
+    if names is None:
+        header = pd.read_csv(source, nrows=0).columns
+        options = {}
+        if hasattr(source, "seek"):
+            source.seek(0)
+    else:
+        header, options = names, {"names": names, "header": None}
+    if columns is not None:
+        header = [c for c in header if c in columns]
+        options["usecols"] = header
+    present = {c: t for c, t in dtypes.items() if c in header}
+    start = source.tell() if hasattr(source, "tell") else None
+    try:
+        frame = pd.read_csv(source, dtype=present, **options)
+    except (ValueError, TypeError):
+        # A stray non-numeric value in a numeric column: read those columns as text and coerce them below
+        if start is not None:
+            source.seek(start)
+        frame = pd.read_csv(source, dtype={c: t for c, t in present.items() if t in ("string", "category")},
+                            **options)
+    return coerce_frame(frame, dtypes, date_columns)
+
+
+def coerce_frame(frame, dtypes, date_columns):
+    for column in date_columns:
+        if column in frame:
+            frame[column] = pd.to_datetime(frame[column], errors="coerce")
+    for column, dtype in dtypes.items():
+        # Text columns are object or, with pandas' string dtype, str; either way they need coercing
+        if column in frame and dtype.startswith("float") and not pd.api.types.is_numeric_dtype(frame[column]):
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype(dtype)
+    return frame
+
+
+def complete_length(path, size):
+    """Bytes of the first `size` bytes that form whole lines, so a half-written last row is left for later"""
+    with open(path, "rb") as f:
+        position = size
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+    return 0
+
+
+def content_signature(path, offset):
+    """Hash of the first and last SIGNATURE_BYTES before `offset`"""
+    with open(path, "rb") as f:
+        head = f.read(min(SIGNATURE_BYTES, offset))
+        f.seek(max(0, offset - SIGNATURE_BYTES))
+        tail = f.read(offset - max(0, offset - SIGNATURE_BYTES))
+    return hashlib.sha1(head + tail).hexdigest()
+
+
+def read_byte_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return io.BytesIO(f.read(end - start))
+
+
+class CrmTable:
+    """One CRM export, held as typed segments and kept in sync with its CSV.
+
+    The first sync parses the CSV (or memory-maps its Feather copy); later
+    syncs parse only the bytes appended since the last one and keep them as
+    a new segment, so refresh cost follows the number of new rows. A CSV
+    that shrank, or whose already-read bytes changed, is reloaded in full.
+
+    With pyarrow installed every segment is also written to `cache_dir` as a
+    Feather file, so the next process starts from those instead of the CSV.
+    """
+
+    def __init__(self, csv_path, dtypes, date_columns, preprocess=None, cache_dir=CACHE_DIR):
+        self.csv_path = csv_path
+        self.dtypes = dtypes
+        self.date_columns = date_columns
+        self.preprocess = preprocess
+        self.cache_dir = cache_dir
+        self.name = os.path.splitext(os.path.basename(csv_path))[0]
+        self.meta_path = os.path.join(cache_dir, f"{self.name}.meta.json")
+        self.segments = []
+        self.header = None
+        self.offset = 0
+        self.signature = None
+        self.reloaded = False
+        self._segment_files = []
+        self._frame = None
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    @property
+    def frame(self):
+        """All rows as one DataFrame (concatenated on first use after a sync)"""
+        if self._frame is None:
+            if len(self.segments) == 1:
+                self._frame = self.segments[0]
+            else:
+                self._frame = pd.concat(self.segments, ignore_index=True)
+                for column, dtype in self.dtypes.items():
+                    # Segments carry their own categories; concat falls back to object
+                    if dtype == "category" and column in self._frame:
+                        self._frame[column] = self._frame[column].astype("category")
+        return self._frame
+
+    def empty(self):
+        """A zero-row frame with this table's columns"""
+        return self.segments[0].iloc[:0] if self.segments else pd.DataFrame(columns=list(self.dtypes))
+
+    def _prepare(self, frame):
+        return self.preprocess(frame) if self.preprocess is not None else frame
+
+    def _load_cached(self):
+        if feather is None or not os.path.exists(self.meta_path):
+            return False
+        with open(self.meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        offset = meta.get("offset", 0)
+        if (meta.get("schema") != SCHEMA_VERSION or os.path.getsize(self.csv_path) < offset
+                or content_signature(self.csv_path, offset) != meta.get("signature")
+                or not all(os.path.exists(os.path.join(self.cache_dir, name)) for name in meta["segments"])):
+            return False
+        self.segments = [feather.read_feather(os.path.join(self.cache_dir, name), memory_map=True)
+                         for name in meta["segments"]]
+        self._segment_files = list(meta["segments"])
+        self.header, self.offset = meta["header"], offset
+        return True
+
+    def _load_full(self):
+        # Read only whole lines up to the current size, so rows appended meanwhile are picked up by the next sync
+        end = complete_length(self.csv_path, os.path.getsize(self.csv_path))
+        source = read_byte_range(self.csv_path, 0, end)
+        self.header = list(pd.read_csv(source, nrows=0).columns)
+        source.seek(0)
+        self.segments = [self._prepare(read_crm_csv(source, self.dtypes, self.date_columns))]
+        self.offset = end
+        self._replace_segment_files(rewrite=True)
+
+    def _save_segments(self, rewrite=False):
+        if feather is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        first = 0 if rewrite else len(self._segment_files)
+        if rewrite:
+            self._segment_files = []
+        for number in range(first, len(self.segments)):
+            name = f"{self.name}.{number}.feather" if number else f"{self.name}.feather"
+            path = os.path.join(self.cache_dir, name)
+            # Write to a temporary name first so a concurrent reader never sees a half-written file
+            feather.write_feather(self.segments[number], path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self._segment_files.append(name)
+        meta = {"schema": SCHEMA_VERSION, "header": self.header, "offset": self.offset,
+                "signature": content_signature(self.csv_path, self.offset), "segments": self._segment_files,
+                "rows": len(self)}
+        with open(self.meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+
+    def _replace_segment_files(self, rewrite=False):
+        """Save segments after a rebuild or compaction and delete the Feather files no longer listed"""
+        previous = set(os.listdir(self.cache_dir)) if os.path.isdir(self.cache_dir) else set()
+        self._save_segments(rewrite)
+        for name in previous - set(self._segment_files):
+            if name.startswith(f"{self.name}.") and name.endswith(".feather"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def _compact(self):
+        """Merge the appended segments (never the large first one) once they pile up"""
+        if len(self.segments) <= MAX_SEGMENTS:
+            return
+        tail = pd.concat(self.segments[1:], ignore_index=True)
+        for column, dtype in self.dtypes.items():
+            if dtype == "category" and column in tail:
+                tail[column] = tail[column].astype("category")
+        self.segments = [self.segments[0], tail]
+        self._segment_files = self._segment_files[:1]
+        self._replace_segment_files()
+
+    def _read_appended(self):
+        """Parse the whole lines written after `offset` into a new segment; returns them or None"""
+        end = complete_length(self.csv_path, os.path.getsize(self.csv_path))
+        if end <= self.offset:
+            return None
+        appended = self._prepare(read_crm_csv(read_byte_range(self.csv_path, self.offset, end), self.dtypes,
+                                              self.date_columns, names=self.header))
+        self.offset = end
+        self.segments.append(appended)
+        self._save_segments()
+        self._compact()
+        return appended
+
+    def sync(self):
+        """Bring the table up to date with its CSV.
+
+        Returns the rows added by this sync (all rows after a full load) or
+        None when the file has not grown. `reloaded` is True when the table
+        was rebuilt from scratch, so anything derived from it must be too.
+        """
+        self.reloaded = not self.segments
+        if self.reloaded:
+            if not self._load_cached():
+                self._load_full()
+        elif (os.path.getsize(self.csv_path) < self.offset
+              or content_signature(self.csv_path, self.offset) != self.signature):
+            self._load_full()
+            self.reloaded = True
+
+        appended = self._read_appended()
+        self.signature = content_signature(self.csv_path, self.offset)
+        if self.reloaded or appended is not None:
+            self._frame = None
+        return self.frame if self.reloaded else appended
+
+
+def load_leads(path=LEADS_CSV, cache_dir=CACHE_DIR):
+    table = CrmTable(path, LEAD_DTYPES, LEAD_DATES, cache_dir=cache_dir)
+    table.sync()
+    return table.frame
+
+
+def load_opportunities(path=OPPORTUNITIES_CSV, cache_dir=CACHE_DIR):
+    table = CrmTable(path, OPPORTUNITY_DTYPES, OPPORTUNITY_DATES, preprocess_opportunities, cache_dir=cache_dir)
+    table.sync()
+    return table.frame
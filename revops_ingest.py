@@ -0,0 +1,219 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from revops_data import (LEAD_DATES, LEAD_DTYPES, LEADS_CSV, OPPORTUNITIES_CSV, OPPORTUNITY_DATES,
+                         OPPORTUNITY_DTYPES, CrmTable, preprocess_opportunities)
+from revops_kpis import converted_by_source, finalize_kpis, lead_conversion, merge_partials, partial_aggregates
+
+def _grow(array, size, fill):
+    """`array` with room for at least `size` items, doubling so repeated appends stay amortised O(1)"""
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array), 1024), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _GrowingIndex:
+    """Value → position lookup that only ever appends.
+
+    New values go into a trailing pd.Index; neighbouring segments are merged
+    whenever the newer one has grown at least as large as the older, so
+    adding a batch costs about the size of the batch and a lookup probes
+    O(log n) segments.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self.size = 0
+
+    def positions(self, values):
+        """Position of each value, -1 where it has not been added"""
+        found = np.full(len(values), -1, dtype=np.int64)
+        pending = np.arange(len(values))
+        start = 0
+        for segment in self.segments:
+            hits = segment.get_indexer(values[pending])
+            hit = hits >= 0
+            found[pending[hit]] = hits[hit] + start
+            pending = pending[~hit]
+            if not len(pending):
+                break
+            start += len(segment)
+        return found
+
+    def append(self, values):
+        """Add values not present yet (unique, in order); returns their positions"""
+        self.segments.append(pd.Index(values, dtype=object))
+        while len(self.segments) > 1 and len(self.segments[-2]) <= len(self.segments[-1]):
+            newer = self.segments.pop()
+            self.segments[-1] = self.segments[-1].append(newer)
+        first, self.size = self.size, self.size + len(values)
+        return np.arange(first, self.size)
+
+
+def lead_keys(ids):
+    """64-bit hashes of lead ids (nulls dropped).
+
+    Slots are keyed on these rather than the strings: integer hash lookups
+    are several times faster, and the chance of two of a few million ids
+    colliding is negligible.
+    """
+    ids = pd.Series(ids).dropna()
+    return pd.util.hash_array(np.asarray(ids, dtype=object), categorize=False)
+
+
+class ConversionTracker:
+    """Converted lead counts per source, updated from batches of new leads and opportunities.
+
+    A lead counts as converted once any opportunity carries its lead_id, which
+    may arrive before or after the lead itself. Every lead_id seen gets a slot
+    holding its source, its number of lead rows and whether it has converted,
+    so a batch only touches the slots of its own rows. Without lead_id the
+    lead's status is used, as in lead_conversion.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.sources = []
+        self.converted = np.zeros(0, dtype=np.int64)
+        self._keys = _GrowingIndex()
+        self._slot_source = np.zeros(0, dtype=np.int32)
+        self._slot_rows = np.zeros(0, dtype=np.int32)
+        self._slot_converted = np.zeros(0, dtype=bool)
+
+    @classmethod
+    def for_frames(cls, leads, opps):
+        if "lead_id" in leads and "lead_id" in opps:
+            return cls("lead_id")
+        return cls("status" if "status" in leads else None)
+
+    def _source_codes(self, sources):
+        known = set(self.sources)
+        self.sources += [source for source in sources.dropna().unique() if source not in known]
+        self.converted = _grow(self.converted, len(self.sources), 0)
+        return pd.Index(self.sources).get_indexer(sources)
+
+    def _slots(self, keys):
+        slots = self._keys.positions(keys)
+        missing = slots < 0
+        if missing.any():
+            inverse, new_keys = pd.factorize(keys[missing])
+            slots[missing] = self._keys.append(new_keys)[inverse]
+            size = self._keys.size
+            self._slot_source = _grow(self._slot_source, size, -1)
+            self._slot_rows = _grow(self._slot_rows, size, 0)
+            self._slot_converted = _grow(self._slot_converted, size, False)
+        return slots
+
+    def add_leads(self, keys, sources):
+        """Record lead rows given their lead_keys and sources (aligned, no null keys)"""
+        codes = self._source_codes(pd.Series(sources, dtype=object))
+        slots = self._slots(keys)
+        unassigned = self._slot_source[slots] < 0
+        # A lead_id listed twice keeps the source of its first row
+        self._slot_source[slots[unassigned]] = codes[unassigned]
+        np.add.at(self._slot_rows, slots, 1)
+        counted = slots[self._slot_converted[slots]]
+        counted_sources = self._slot_source[counted]
+        np.add.at(self.converted, counted_sources[counted_sources >= 0], 1)
+
+    def add_opportunities(self, keys):
+        """Mark the leads behind these opportunity lead_keys as converted"""
+        slots = pd.unique(self._slots(keys))
+        newly = slots[~self._slot_converted[slots]]
+        self._slot_converted[newly] = True
+        newly = newly[self._slot_source[newly] >= 0]
+        np.add.at(self.converted, self._slot_source[newly], self._slot_rows[newly])
+
+    def add(self, leads, opps):
+        if self.mode is None:
+            return
+        if self.mode == "status":
+            counts = converted_by_source(leads, lead_conversion(leads, opps))
+            codes = self._source_codes(pd.Series(counts.index, dtype=object))
+            self.converted[codes] += counts.to_numpy(dtype=np.int64)
+            return
+        if len(leads):
+            leads = leads[leads["lead_id"].notna()]
+            self.add_leads(lead_keys(leads["lead_id"]), leads["source"])
+        if len(opps):
+            self.add_opportunities(lead_keys(opps["lead_id"].unique()))
+
+    def by_source(self):
+        """Converted lead count per source, or None when the exports cannot tell"""
+        if self.mode is None:
+            return None
+        return pd.Series(self.converted[:len(self.sources)], index=pd.Index(self.sources, dtype=object))
+
+
+class IncrementalDashboard:
+    """Dashboard aggregates kept current as rows are appended to the CRM exports.
+
+    refresh() syncs both tables and folds only the new rows into the running
+    partial aggregates and conversion counts, so its cost follows the number
+    of appended rows. A rewritten export (see CrmTable.sync) triggers a full
+    rebuild. Safe to share between sessions; refresh() and kpis() lock.
+    """
+
+    def __init__(self, leads_table, opps_table):
+        self.leads_table = leads_table
+        self.opps_table = opps_table
+        self.partials = None
+        self.tracker = None
+        self.version = 0
+        self.last_refresh = None
+        self._lock = threading.Lock()
+        self._kpis = None
+        self._kpis_key = None
+
+    @classmethod
+    def from_csv(cls, leads_path=LEADS_CSV, opportunities_path=OPPORTUNITIES_CSV, **table_options):
+        return cls(CrmTable(leads_path, LEAD_DTYPES, LEAD_DATES, **table_options),
+                   CrmTable(opportunities_path, OPPORTUNITY_DTYPES, OPPORTUNITY_DATES, preprocess_opportunities,
+                            **table_options))
+
+    def _rebuild(self):
+        leads, opps = self.leads_table.frame, self.opps_table.frame
+        self.partials = partial_aggregates(leads, opps)
+        self.tracker = ConversionTracker.for_frames(leads, opps)
+        self.tracker.add(leads, opps)
+        return len(leads) + len(opps)
+
+    def refresh(self):
+        """Pick up appended rows; returns a report of what was done"""
+        with self._lock:
+            started = time.perf_counter()
+            new_leads, new_opps = self.leads_table.sync(), self.opps_table.sync()
+            if self.partials is None or self.leads_table.reloaded or self.opps_table.reloaded:
+                mode, rows = "full", self._rebuild()
+            elif new_leads is None and new_opps is None:
+                mode, rows = "unchanged", 0
+            else:
+                leads = new_leads if new_leads is not None else self.leads_table.empty()
+                opps = new_opps if new_opps is not None else self.opps_table.empty()
+                self.partials = merge_partials(self.partials, partial_aggregates(leads, opps))
+                self.tracker.add(leads, opps)
+                mode, rows = "incremental", len(leads) + len(opps)
+            if mode != "unchanged":
+                self.version += 1
+            self.last_refresh = {"mode": mode, "rows": rows, "seconds": time.perf_counter() - started,
+                                 "version": self.version}
+            return self.last_refresh
+
+    def frames(self):
+        """(leads, opportunities) as ingested so far, for views that need more than the aggregates"""
+        with self._lock:
+            return self.leads_table.frame, self.opps_table.frame
+
+    def kpis(self, now=None):
+        """compute_kpis for everything ingested so far; reused until new rows arrive or the day changes"""
+        with self._lock:
+            key = (self.version, pd.Timestamp.now().date() if now is None else pd.Timestamp(now))
+            if key != self._kpis_key:
+                self._kpis = finalize_kpis(self.partials, self.tracker.by_source(), now)
+                self._kpis_key = key
+            return self._kpis
@@ -0,0 +1,170 @@
+import pandas as pd
+
+RECENT_DAYS = 30
+
+# Average value below which recent pipeline activity is flagged as low
+LOW_RECENT_AVG = 10000
+
+
+def _top(series, largest=True):
+    series = series.dropna()
+    if series.empty:
+        return None
+    return series.idxmax() if largest else series.idxmin()
+
+
+def _plain_index(frame):
+    # Categorical group keys from different loads carry different categories; plain labels merge cleanly
+    frame.index = pd.Index(frame.index.to_numpy(dtype=object), name=frame.index.name)
+    return frame
+
+
+def lead_conversion(leads, opps):
+    """Boolean Series: did each lead turn into at least one opportunity?
+
+    Uses lead_id when both exports carry it, otherwise the lead's status.
+    Returns None when neither is available.
+    """
+    if "lead_id" in leads and "lead_id" in opps:
+        # A hash lookup against the unique ids; Series.isin is far slower on Arrow-backed strings
+        opportunity_leads = pd.Index(opps["lead_id"].dropna().unique())
+        return pd.Series(opportunity_leads.get_indexer(leads["lead_id"]) >= 0, index=leads.index)
+    if "status" in leads:
+        return leads["status"].astype("string").str.lower().eq("converted").fillna(False)
+    return None
+
+
+def converted_by_source(leads, converted):
+    """Converted lead counts per source for a boolean mask aligned with `leads`"""
+    counts = pd.Series(converted.to_numpy(), index=leads.index).groupby(leads["source"], observed=True).sum()
+    return _plain_index(counts.to_frame("converted"))["converted"]
+
+
+def opportunity_aggregates(opps):
+    """Additive stage, rep and creation-day aggregates of a batch of opportunities"""
+    opps = opps.assign(_days=opps["days_in_stage"] if "days_in_stage" in opps else float("nan"))
+    stage = opps.groupby("stage", observed=True).agg(
+        count=("amount", "size"), amount=("amount", "sum"), weighted_amount=("weighted_amount", "sum"),
+        days_sum=("_days", "sum"), days_count=("_days", "count"))
+    rep = opps.groupby("assigned_rep", observed=True).agg(
+        count=("amount", "size"), amount=("amount", "sum"), weighted_amount=("weighted_amount", "sum"))
+    if "created_date" in opps:
+        daily = opps.groupby(opps["created_date"].dt.floor("D")).agg(
+            count=("amount", "count"), amount=("amount", "sum"))
+    else:
+        daily = pd.DataFrame({"count": [], "amount": []})
+    return {
+        "stage": _plain_index(stage.astype("float64")),
+        "rep": _plain_index(rep.astype("float64")),
+        "daily": daily.astype("float64"),
+    }
+
+
+def lead_aggregates(leads):
+    """Additive source and status aggregates of a batch of leads"""
+    source = leads.groupby("source", observed=True).agg(
+        leads=("lead_score", "size"), score_sum=("lead_score", "sum"), score_count=("lead_score", "count"))
+    status = leads["status"].value_counts().to_frame("count") if "status" in leads else pd.DataFrame({"count": []})
+    return {
+        "source": _plain_index(source.astype("float64")),
+        "status": _plain_index(status[status["count"] > 0].astype("float64")),
+    }
+
+
+def partial_aggregates(leads, opps):
+    """Additive aggregates of a batch of rows: sums and counts only, so batches can be merged.
+
+    Opportunities are grouped once by stage, once by rep and once by creation
+    day; leads once by source and once by status. Averages are derived from
+    the sums in finalize_kpis.
+    """
+    return {**opportunity_aggregates(opps), **lead_aggregates(leads),
+            "rows": {"leads": len(leads), "opportunities": len(opps)}}
+
+
+def merge_partials(total, batch):
+    """Add one batch's partial aggregates into a running total (returns the merged total).
+
+    Either side may carry only the lead or only the opportunity aggregates.
+    """
+    if total is None:
+        return batch
+    merged = {}
+    for key in ("stage", "rep", "daily", "source", "status"):
+        if key in total and key in batch:
+            merged[key] = total[key].add(batch[key], fill_value=0)
+        elif key in total or key in batch:
+            merged[key] = total.get(key, batch.get(key))
+    merged["rows"] = {name: total["rows"].get(name, 0) + batch["rows"].get(name, 0)
+                      for name in ("leads", "opportunities")}
+    return merged
+
+
+def finalize_kpis(partials, converted=None, now=None):
+    """Turn merged partial aggregates into the numbers the dashboard shows.
+
+    `converted` is the converted lead count per source, or None when the
+    exports carry no way to link leads to opportunities.
+    """
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    stage, rep, source = partials["stage"].copy(), partials["rep"].copy(), partials["source"].copy()
+    leads, opportunities = partials["rows"]["leads"], partials["rows"]["opportunities"]
+
+    stage["count"] = stage["count"].astype("int64")
+    if stage["days_count"].sum() > 0:
+        stage["avg_days_in_stage"] = stage["days_sum"] / stage["days_count"].where(stage["days_count"] > 0)
+    by_stage = stage.drop(columns=["days_sum", "days_count"]).sort_index()
+    rep["count"] = rep["count"].astype("int64")
+    by_rep = rep.sort_index()
+
+    by_source = pd.DataFrame({
+        "leads": source["leads"].astype("int64"),
+        "avg_lead_score": source["score_sum"] / source["score_count"].where(source["score_count"] > 0),
+    }).sort_index()
+    if converted is not None:
+        by_source["converted"] = converted.reindex(by_source.index, fill_value=0).astype("int64")
+        by_source["conversion_rate"] = by_source["converted"] / by_source["leads"]
+        conversion_rate = by_source["converted"].sum() / leads if leads else None
+    else:
+        conversion_rate = opportunities / leads if leads else None
+
+    status_counts = partials["status"]["count"].astype("int64").sort_values(ascending=False)
+    status_counts.index.name, status_counts.name = "status", "count"
+
+    since = now - pd.Timedelta(days=RECENT_DAYS)
+    recent = partials["daily"][partials["daily"].index >= since.floor("D")]
+    recent_count, recent_amount = int(recent["count"].sum()), float(recent["amount"].sum())
+    created = partials["daily"].index[partials["daily"]["count"] > 0]
+    score_count = source["score_count"].sum()
+
+    return {
+        "opportunities": opportunities,
+        "leads": leads,
+        "total_pipeline": float(by_stage["amount"].sum()),
+        "weighted_pipeline": float(by_stage["weighted_amount"].sum()),
+        "avg_lead_score": float(source["score_sum"].sum() / score_count) if score_count else None,
+        "conversion_rate": float(conversion_rate) if conversion_rate is not None else None,
+        "by_stage": by_stage,
+        "by_rep": by_rep,
+        "by_source": by_source,
+        "status_counts": status_counts,
+        "top_rep": _top(by_rep["amount"]),
+        "top_source": _top(by_source["leads"]),
+        "best_converting_source": _top(by_source["conversion_rate"]) if "conversion_rate" in by_source else None,
+        "created_range": (created.min(), created.max()) if len(created) else None,
+        "created_by_day": partials["daily"].sort_index(),
+        "slowest_stage": _top(by_stage["avg_days_in_stage"]) if "avg_days_in_stage" in by_stage else None,
+        "recent": {
+            "since": since,
+            "count": recent_count,
+            "amount": recent_amount,
+            "avg_amount": recent_amount / recent_count if recent_count else None,
+        },
+    }
+
+
+def compute_kpis(leads, opps, now=None):
+    """Every number the RevOps dashboard shows, computed from full frames in one pass"""
+    converted = lead_conversion(leads, opps)
+    return finalize_kpis(partial_aggregates(leads, opps),
+                         converted_by_source(leads, converted) if converted is not None else None, now)
@@ -0,0 +1,108 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from revops_data import (LEAD_DATES, LEAD_DTYPES, LEADS_CSV, OPPORTUNITIES_CSV, OPPORTUNITY_DATES,
+                         OPPORTUNITY_DTYPES, preprocess_opportunities, read_byte_range, read_crm_csv)
+from revops_ingest import ConversionTracker, lead_keys
+from revops_kpis import finalize_kpis, lead_aggregates, merge_partials, opportunity_aggregates
+
+# Bytes of CSV parsed per chunk; peak memory is roughly a few times this per worker
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# Only the columns the dashboard aggregates are parsed
+LEAD_COLUMNS = ["lead_id", "source", "status", "lead_score"]
+OPPORTUNITY_COLUMNS = ["lead_id", "assigned_rep", "stage", "amount", "probability", "created_date",
+                       "days_in_stage"]
+
+TABLES = {
+    "leads": (LEAD_DTYPES, LEAD_DATES, LEAD_COLUMNS, None),
+    "opportunities": (OPPORTUNITY_DTYPES, OPPORTUNITY_DATES, OPPORTUNITY_COLUMNS, preprocess_opportunities),
+}
+
+
+def csv_header(path):
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def csv_ranges(path, chunk_bytes=CHUNK_BYTES):
+    """(start, end) byte ranges covering the data rows of a CSV, each ending on a line boundary"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            if f.tell() < size:
+                f.readline()
+            end = f.tell()
+            yield start, end
+            start = end
+
+
+def aggregate_chunk(path, start, end, header, table, mode):
+    """Parse one byte range of an export and reduce it to partial aggregates.
+
+    Returns (partials, conversion rows): the rows keep only what
+    ConversionTracker needs in `mode`: lead_keys and sources of leads and
+    the unique lead_keys of opportunities, or sources and statuses.
+    Module-level so a process pool can run it.
+    """
+    dtypes, date_columns, columns, preprocess = TABLES[table]
+    frame = read_crm_csv(read_byte_range(path, start, end), dtypes, date_columns, names=header, columns=columns)
+    if preprocess is not None:
+        frame = preprocess(frame)
+    if table == "leads":
+        partials = {**lead_aggregates(frame), "rows": {"leads": len(frame)}}
+        if mode == "lead_id":
+            # Hashing here spreads the work across workers and ships 8 bytes per lead back instead of the id
+            frame = frame[frame["lead_id"].notna()]
+            conversion = pd.DataFrame({"lead_key": lead_keys(frame["lead_id"]), "source": frame["source"].to_numpy()})
+        else:
+            conversion = frame[[c for c in ("source", "status") if c in frame]]
+    else:
+        partials = {**opportunity_aggregates(frame), "rows": {"opportunities": len(frame)}}
+        conversion = pd.DataFrame({"lead_key": pd.unique(lead_keys(frame["lead_id"])) if mode == "lead_id" else []})
+    return partials, conversion
+
+
+def stream_kpis(leads_path=LEADS_CSV, opportunities_path=OPPORTUNITIES_CSV, chunk_bytes=CHUNK_BYTES, workers=0,
+                now=None):
+    """compute_kpis over exports too large to load, reading them chunk by chunk.
+
+    Each chunk is folded into the running partial aggregates as soon as it is
+    parsed, so memory is bounded by the chunk size and the number of distinct
+    groups. Lead conversion is the exception: it needs one small slot per
+    distinct lead_id (see ConversionTracker). With `workers` > 1 chunks are
+    parsed in parallel by a process pool.
+    """
+    headers = {"leads": csv_header(leads_path), "opportunities": csv_header(opportunities_path)}
+    empty = {table: pd.DataFrame(columns=header) for table, header in headers.items()}
+    tracker = ConversionTracker.for_frames(empty["leads"], empty["opportunities"])
+    jobs = [(path, start, end, headers[table], table, tracker.mode)
+            for table, path in (("leads", leads_path), ("opportunities", opportunities_path))
+            for start, end in csv_ranges(path, chunk_bytes)]
+
+    partials = {"rows": {"leads": 0, "opportunities": 0}}
+
+    def fold(result, table):
+        nonlocal partials
+        chunk, conversion = result
+        partials = merge_partials(partials, chunk)
+        if tracker.mode == "lead_id":
+            if table == "leads":
+                tracker.add_leads(conversion["lead_key"].to_numpy(), conversion["source"])
+            else:
+                tracker.add_opportunities(conversion["lead_key"].to_numpy())
+        elif table == "leads":
+            tracker.add(conversion, empty["opportunities"])
+
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for job, result in zip(jobs, pool.map(aggregate_chunk, *zip(*jobs))):
+                fold(result, job[4])
+    else:
+        for job in jobs:
+            fold(aggregate_chunk(*job), job[4])
+    return finalize_kpis(partials, tracker.by_source(), now)
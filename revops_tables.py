@@ -0,0 +1,50 @@
+import math
+
+import streamlit as st
+
+# Rows sent to the browser per page; st.dataframe virtualizes scrolling within a page
+PAGE_SIZE = 500
+
+
+def stage_forecast(by_stage):
+    """Weighted forecast by stage as whole dollars; kept numeric so it sorts and formats in the browser"""
+    return (by_stage["weighted_amount"].round().astype("int64")
+            .rename_axis("Stage").reset_index(name="Weighted Pipeline ($)"))
+
+
+def rep_stage_forecast(breakdown):
+    """forecast_breakdown output with display column names and whole-dollar amounts"""
+    table = breakdown.rename(columns={"assigned_rep": "Rep", "stage": "Stage", "month": "Month",
+                                      "count": "Opportunities", "amount": "Pipeline ($)",
+                                      "weighted_amount": "Weighted Pipeline ($)"})
+    for column in ("Opportunities", "Pipeline ($)", "Weighted Pipeline ($)"):
+        table[column] = table[column].round().astype("int64")
+    return table
+
+
+def render_table(frame, key, currency=(), page_size=PAGE_SIZE):
+    """Show a table with declarative formatting, paging through frames longer than page_size.
+
+    Currency and number columns are formatted by the browser from the
+    numeric values with Streamlit's built-in formats; no per-cell Python
+    formatting or HTML is produced.
+    """
+    config = {}
+    for column in frame.columns:
+        if column in currency:
+            config[column] = st.column_config.NumberColumn(column, format="dollar")
+        elif frame[column].dtype.kind in "iuf":
+            config[column] = st.column_config.NumberColumn(column, format="localized")
+        elif frame[column].dtype.kind == "M":
+            config[column] = st.column_config.DateColumn(column, format="MMM YYYY")
+        else:
+            config[column] = st.column_config.TextColumn(column)
+
+    pages = max(1, math.ceil(len(frame) / page_size))
+    start = 0
+    if pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+        start = (page - 1) * page_size
+        st.caption(f"Rows {start + 1:,}–{min(start + page_size, len(frame)):,} of {len(frame):,}")
+    st.dataframe(frame.iloc[start:start + page_size], column_config=config, hide_index=True,
+                 use_container_width=True)
@@ -0,0 +1,45 @@
+import os
+import re
+import subprocess
+import sys
+
+# "import time: self [us] | cumulative | <indent>module" lines written by python -X importtime
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def parse_importtime(stderr):
+    """Rows of module, self_ms, cumulative_ms and depth (0 = imported directly), in import order"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            rows.append({
+                "module": match.group(4),
+                "self_ms": int(match.group(1)) / 1000,
+                "cumulative_ms": int(match.group(2)) / 1000,
+                "depth": len(match.group(3)) // 2,
+            })
+    return rows
+
+
+def import_times(modules, cwd=None):
+    """Cold-import cost of `modules`, measured in a fresh interpreter with -X importtime.
+
+    The running process already has everything in sys.modules, so only a new
+    interpreter shows what a container pays on a cold start. Returns the
+    parsed rows; modules that fail to import are reported by their error.
+    """
+    code = "\n".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=cwd or os.path.dirname(os.path.abspath(__file__)), timeout=300)
+    rows = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        rows.append({"module": "error", "self_ms": 0.0, "cumulative_ms": 0.0, "depth": 0,
+                     "error": result.stderr.strip().splitlines()[-1]})
+    return rows
+
+
+def slowest_imports(rows, limit=15, max_depth=1):
+    """The most expensive imports at or above max_depth, by cumulative time"""
+    shallow = [row for row in rows if row["depth"] <= max_depth]
+    return sorted(shallow, key=lambda row: row["cumulative_ms"], reverse=True)[:limit]